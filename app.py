@@ -1,8 +1,19 @@
 from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for
 from werkzeug.utils import secure_filename
 import os
+import io
 import json
+import html
 import uuid
+import time
+import bisect
+import hashlib
+import sqlite3
+import threading
+import contextlib
+import concurrent.futures
+from collections import OrderedDict, Counter
+from array import array
 from datetime import datetime
 import logging
 from docx import Document
@@ -10,16 +21,31 @@ from docx.shared import RGBColor
 import difflib
 # Force deployment update - v2.1
 import re
+import zipfile
+import xml.etree.ElementTree as ET
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev-key-change-in-production')
+app.config['EXTRACTION_CACHE_SIZE'] = int(os.environ.get('EXTRACTION_CACHE_SIZE', 32))  # Documents kept in memory
+app.config['EXTRACTION_CACHE_DIR'] = os.environ.get('EXTRACTION_CACHE_DIR')  # Optional on-disk tier
+app.config['EXTRACTION_WORKERS'] = int(os.environ.get('EXTRACTION_WORKERS', 2))  # 0 extracts in-process
+app.config['DIFF_ENGINE'] = os.environ.get('DIFF_ENGINE', 'patience')  # Report table renderer, see DIFF_ENGINES
+app.config['AI_CONCURRENCY'] = int(os.environ.get('AI_CONCURRENCY', 8))  # AI requests in flight per analysis
+app.config['AI_BATCH_SIZE'] = int(os.environ.get('AI_BATCH_SIZE', 1))  # Comments per AI request, 1 sends each alone
+app.config['AI_CACHE_SIZE'] = int(os.environ.get('AI_CACHE_SIZE', 1024))  # AI answers kept in memory
+app.config['AI_CACHE_DB'] = os.environ.get('AI_CACHE_DB')  # Optional SQLite tier for AI answers
+app.config['AI_CACHE_DB_SIZE'] = int(os.environ.get('AI_CACHE_DB_SIZE', 100000))  # AI answers kept on disk
+app.config['AI_CACHE_TTL'] = int(os.environ.get('AI_CACHE_TTL', 7 * 24 * 3600))  # Seconds an AI answer is reused
+app.config['AI_TRIAGE_CONFIDENCE'] = float(os.environ.get('AI_TRIAGE_CONFIDENCE', 0.8))  # Pattern results this sure skip the AI, above 1 none do
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# WordprocessingML namespace in ElementTree's {uri}tag form
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
 try:
     import anthropic
     ANTHROPIC_AVAILABLE = True
@@ -40,6 +66,8 @@ except ImportError as e:
 # Try to get API keys from environment variables
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+ANTHROPIC_MODEL = "claude-3-haiku-20240307"  # Fast and cost-effective
+OPENAI_MODEL = "gpt-4o-mini"  # Fast and cost-effective
 
 # Initialize AI clients if keys are available (lazy initialization)
 anthropic_client = None
@@ -81,46 +109,1716 @@ elif OPENAI_API_KEY and not OPENAI_AVAILABLE:
 else:
     logger.warning("No AI API keys found. Set ANTHROPIC_API_KEY or OPENAI_API_KEY environment variables for AI-powered analysis.")
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+class ParagraphView:
+    """One paragraph of a CompactParagraphs table, readable like the old paragraph dicts"""
+    
+    __slots__ = ('_table', 'index')
+    
+    def __init__(self, table, index):
+        self._table = table
+        self.index = index
+    
+    @property
+    def text(self):
+        table = self._table
+        return table.full_text[table.para_starts[self.index]:table.para_starts[self.index + 1] - 1]
+    
+    @property
+    def runs(self):
+        """Run dicts, materialised only when asked for"""
+        table = self._table
+        start = table.para_starts[self.index]
+        runs = []
+        for i in range(table.run_index[self.index], table.run_index[self.index + 1]):
+            end = table.run_ends[i]
+            runs.append({'text': table.full_text[start:end]})
+            start = end
+        return runs
+    
+    def __getitem__(self, key):
+        if key == 'index':
+            return self.index
+        if key == 'text':
+            return self.text
+        if key == 'runs':
+            return self.runs
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def to_dict(self):
+        return {'index': self.index, 'text': self.text, 'runs': self.runs}
+    
+    def __repr__(self):
+        return f"ParagraphView({self.index}, {self.text[:30]!r})"
+
+class CompactParagraphs:
+    """Paragraphs stored as offset tables into one shared full_text string.
+    
+    Replaces a dict per paragraph and per run: paragraph and run boundaries live in
+    integer arrays, and ParagraphView objects are created on access.
+    """
+    
+    __slots__ = ('full_text', 'para_starts', 'run_ends', 'run_index')
+    
+    def __init__(self, full_text, para_starts, run_ends, run_index):
+        self.full_text = full_text
+        self.para_starts = para_starts  # Start offset of each paragraph, plus len(full_text) + 1
+        self.run_ends = run_ends        # End offset of every run, in document order
+        self.run_index = run_index      # First run of each paragraph in run_ends, plus the total
+    
+    @classmethod
+    def from_runs(cls, paragraph_runs):
+        """Build from an iterable of per-paragraph run text lists"""
+        texts = []
+        para_starts = array('q', [0])
+        run_ends = array('q')
+        run_index = array('q', [0])
+        
+        offset = 0
+        for runs in paragraph_runs:
+            position = offset
+            for run_text in runs:
+                position += len(run_text)
+                run_ends.append(position)
+            run_index.append(len(run_ends))
+            texts.append(''.join(runs))
+            offset = position + 1  # '\n' joins paragraphs in full_text
+            para_starts.append(offset)
+        
+        return cls('\n'.join(texts), para_starts, run_ends, run_index)
+    
+    def __len__(self):
+        return len(self.para_starts) - 1
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('paragraph index out of range')
+        return ParagraphView(self, index)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ParagraphView(self, index)
+    
+    def __eq__(self, other):
+        if isinstance(other, CompactParagraphs):
+            return (self.full_text == other.full_text and self.para_starts == other.para_starts
+                    and self.run_ends == other.run_ends and self.run_index == other.run_index)
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+    
+    def to_list(self):
+        """The old list-of-dicts representation"""
+        return [paragraph.to_dict() for paragraph in self]
+    
+    def to_json(self):
+        """Offset tables for JSON storage; full_text is stored alongside by the caller"""
+        return {
+            'para_starts': self.para_starts.tolist(),
+            'run_ends': self.run_ends.tolist(),
+            'run_index': self.run_index.tolist()
+        }
+    
+    @classmethod
+    def from_json(cls, full_text, tables):
+        return cls(full_text, array('q', tables['para_starts']), array('q', tables['run_ends']),
+                   array('q', tables['run_index']))
+
+class ExtractionCache:
+    """Content-addressed cache of extracted document data, keyed by the SHA-256 of the .docx bytes.
+
+    An in-memory LRU tier is backed by an optional directory of JSON files, so the
+    same manuscript uploaded against many revisions is only extracted once.
+    """
+    
+    def __init__(self, max_entries=32, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def key_for(docx_bytes):
+        return hashlib.sha256(docx_bytes).hexdigest()
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def _remember(self, key, data):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def get(self, key):
+        """Return cached data for key, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+        
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                data['paragraphs'] = CompactParagraphs.from_json(data['full_text'], data['paragraphs'])
+                with self._lock:
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                return data
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable extraction cache entry {key}: {str(e)}")
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        
+        if self.cache_dir:
+            # Write then rename so a crash never leaves a truncated entry behind
+            tmp_path = f"{self._disk_path(key)}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(data, paragraphs=data['paragraphs'].to_json()), f)
+                os.replace(tmp_path, self._disk_path(key))
+            except (OSError, TypeError) as e:
+                logger.warning(f"Could not write extraction cache entry {key}: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_tier': bool(self.cache_dir),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': ((self.memory_hits + self.disk_hits) / lookups * 100) if lookups else 0
+            }
+
+extraction_cache = ExtractionCache(
+    max_entries=app.config['EXTRACTION_CACHE_SIZE'],
+    cache_dir=app.config['EXTRACTION_CACHE_DIR']
+)
+
+class AIResponseCache:
+    """Cache of parsed AI answers, keyed by a fingerprint of everything that goes into the prompt.
+
+    An in-memory LRU tier is backed by an optional SQLite database, so re-analyzing a
+    session or re-uploading the same pair of documents sends no requests. Answers
+    older than ttl seconds are not reused. The database is pruned of expired rows,
+    and down to its newest max_rows, when the cache opens and every prune_every writes.
+    """
+    
+    def __init__(self, max_entries=1024, db_path=None, ttl=7 * 24 * 3600, max_rows=100000, prune_every=100):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._writes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if db_path:
+            try:
+                with contextlib.closing(self._connect()) as db, db:
+                    db.execute('CREATE TABLE IF NOT EXISTS ai_responses '
+                               '(key TEXT PRIMARY KEY, analysis TEXT NOT NULL, created REAL NOT NULL)')
+                    db.execute('CREATE INDEX IF NOT EXISTS ai_responses_created ON ai_responses (created)')
+            except sqlite3.Error as e:
+                logger.warning(f"AI response cache database unavailable, using memory only: {str(e)}")
+                self.db_path = None
+            else:
+                self.prune()
+    
+    @staticmethod
+    def key_for(*parts):
+        """Fingerprint of the model, prompt template and comment inputs of a request"""
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def _connect(self):
+        # One connection per call keeps the cache usable from the analysis worker threads
+        return sqlite3.connect(self.db_path, timeout=10)
+    
+    def _remember(self, key, analysis, created):
+        self._entries[key] = (analysis, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def get(self, key):
+        """Return the cached answer for key, or None on a miss"""
+        expired_before = time.time() - self.ttl
+        with self._lock:
+            if key in self._entries:
+                analysis, created = self._entries[key]
+                if created >= expired_before:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return analysis
+                del self._entries[key]
+        
+        if self.db_path:
+            try:
+                with contextlib.closing(self._connect()) as db, db:
+                    row = db.execute('SELECT analysis, created FROM ai_responses WHERE key = ?', (key,)).fetchone()
+                    if row and row[1] < expired_before:
+                        db.execute('DELETE FROM ai_responses WHERE key = ?', (key,))
+                        row = None
+                if row:
+                    analysis = json.loads(row[0])
+                    with self._lock:
+                        self._remember(key, analysis, row[1])
+                        self.disk_hits += 1
+                    return analysis
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning(f"Ignoring unreadable AI response cache entry {key}: {str(e)}")
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key, analysis):
+        created = time.time()
+        with self._lock:
+            self._remember(key, analysis, created)
+        
+        if self.db_path:
+            try:
+                with contextlib.closing(self._connect()) as db, db:
+                    db.execute('INSERT OR REPLACE INTO ai_responses (key, analysis, created) VALUES (?, ?, ?)',
+                               (key, json.dumps(analysis), created))
+            except (sqlite3.Error, TypeError) as e:
+                logger.warning(f"Could not write AI response cache entry {key}: {str(e)}")
+                return
+            with self._lock:
+                self._writes += 1
+                due = self._writes % self.prune_every == 0
+            if due:
+                self.prune()
+    
+    def prune(self):
+        """Delete expired rows, then all but the newest max_rows"""
+        if not self.db_path:
+            return
+        try:
+            with contextlib.closing(self._connect()) as db, db:
+                db.execute('DELETE FROM ai_responses WHERE created < ?', (time.time() - self.ttl,))
+                db.execute('DELETE FROM ai_responses WHERE key IN '
+                           '(SELECT key FROM ai_responses ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)',
+                           (self.max_rows,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not prune the AI response cache database: {str(e)}")
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_tier': bool(self.db_path),
+                'max_rows': self.max_rows,
+                'ttl': self.ttl,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': ((self.memory_hits + self.disk_hits) / lookups * 100) if lookups else 0
+            }
+
+ai_response_cache = AIResponseCache(
+    max_entries=app.config['AI_CACHE_SIZE'],
+    db_path=app.config['AI_CACHE_DB'],
+    ttl=app.config['AI_CACHE_TTL'],
+    max_rows=app.config['AI_CACHE_DB_SIZE']
+)
+
+# Process pool for document extraction (lazy initialization)
+extraction_pool = None
+
+def get_extraction_pool():
+    """Get the extraction process pool with lazy initialization.
+
+    XML parsing holds the GIL, so documents are extracted in separate processes.
+    """
+    global extraction_pool
+    if extraction_pool is None and app.config['EXTRACTION_WORKERS'] > 0:
+        try:
+            extraction_pool = concurrent.futures.ProcessPoolExecutor(max_workers=app.config['EXTRACTION_WORKERS'])
+            logger.info(f"Extraction process pool started with {app.config['EXTRACTION_WORKERS']} workers")
+        except Exception as e:
+            logger.error(f"Failed to start extraction process pool: {str(e)}")
+            extraction_pool = False  # Mark as failed to avoid retrying
+    return extraction_pool if extraction_pool is not False else None
+
+def discard_extraction_pool():
+    """Drop a broken extraction pool so the next request starts a fresh one"""
+    global extraction_pool
+    if extraction_pool:
+        extraction_pool.shutdown(wait=False, cancel_futures=True)
+    extraction_pool = None
+
+WORD_PATTERN = re.compile(r'\w+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Word's smart quotes and apostrophes, folded to their ASCII forms
+QUOTE_TRANSLATION = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'", '\u2032': "'", '\u02bc': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"', '\u2033': '"',
+})
+
+CONTRACTION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r"\b\w+'\w+\b",  # General pattern: word'word
+    r"\b(?:can't|won't|shouldn't|couldn't|wouldn't|isn't|aren't|wasn't|weren't|don't|doesn't|didn't|haven't|hasn't|hadn't|I'm|you're|he's|she's|it's|we're|they're|I'll|you'll|he'll|she'll|it'll|we'll|they'll|I'd|you'd|he'd|she'd|it'd|we'd|they'd|I've|you've|he's|she's|it's|we've|they've)\b"
+]]
+
+class NormalizedText:
+    """Casefolded, quote-normalised, whitespace-collapsed view of one document.
+
+    Built once per session and shared by the validators. An inverted index maps
+    every word to its offsets in the normalized text, so whole-word counts and
+    locations are postings lookups: single words directly, phrases by checking the
+    postings of their first word. Results are memoized per term.
+    """
+    
+    def __init__(self, raw, terms=()):
+        self.raw = raw
+        self.text = self.normalize(raw)
+        self.postings = self._build_postings()
+        self.locations = {}
+        self._offsets = None
+        self._line_starts = None
+        self._contractions = None
+        self._removed_words = None
+        self.count_terms(terms)
+    
+    @staticmethod
+    def normalize(text):
+        return WHITESPACE_PATTERN.sub(' ', text.translate(QUOTE_TRANSLATION).casefold())
+    
+    def _build_postings(self):
+        postings = {}
+        for word in WORD_PATTERN.finditer(self.text):
+            positions = postings.get(word.group())
+            if positions is None:
+                positions = postings[word.group()] = array('q')
+            positions.append(word.start())
+        return postings
+    
+    def count_terms(self, terms):
+        """Locate every term ahead of the validators that will ask for it"""
+        for term in terms:
+            if term:
+                self.locate(term)
+    
+    def count(self, term):
+        """Case-insensitive, whole-word occurrences of `term`"""
+        return len(self.locate(term))
+    
+    def locate(self, term):
+        """Offsets in the normalized text of the non-overlapping, whole-word occurrences of `term`"""
+        term = self.normalize(term)
+        if term not in self.locations:
+            self.locations[term] = self._find(term)
+        return self.locations[term]
+    
+    def _find(self, term):
+        if not term:
+            return array('q')
+        
+        first_word = WORD_PATTERN.match(term)
+        if first_word and first_word.end() == len(term):
+            return self.postings.get(term, array('q'))
+        
+        if first_word:
+            # Phrases can only start where their first word does
+            found = array('q')
+            last_end = 0
+            for start in self.postings.get(first_word.group(), ()):
+                end = start + len(term)
+                if start >= last_end and self.text.startswith(term, start) and self._ends_word(term, end):
+                    found.append(start)
+                    last_end = end
+            return found
+        
+        # Terms starting with punctuation are not in the index
+        pattern = re.escape(term)
+        if WORD_PATTERN.match(term, len(term) - 1):
+            pattern += r'(?!\w)'
+        return array('q', (match.start() for match in re.finditer(pattern, self.text)))
+    
+    def _ends_word(self, term, end):
+        """A term ending in a word character must not run into the next word"""
+        return not WORD_PATTERN.match(term, len(term) - 1) or not WORD_PATTERN.match(self.text, end)
+    
+    def removed_words(self, revised):
+        """Words of this text that no longer occur in the `revised` view"""
+        if self._removed_words is None or self._removed_words[0] is not revised:
+            self._removed_words = (revised, self.postings.keys() - revised.postings.keys(), None)
+        return self._removed_words[1]
+    
+    def removed_vocabulary(self, revised):
+        """FuzzyVocabulary over removed_words(revised), built once per document pair"""
+        removed_words = self.removed_words(revised)
+        if self._removed_words[2] is None:
+            self._removed_words = (revised, removed_words, FuzzyVocabulary(removed_words))
+        return self._removed_words[2]
+    
+    @property
+    def contractions(self):
+        if self._contractions is None:
+            found = set()
+            for pattern in CONTRACTION_PATTERNS:
+                found.update(pattern.findall(self.text))
+            self._contractions = list(found)
+        return self._contractions
+    
+    def raw_offset(self, index):
+        """Position in the raw text of the character at `index` of the normalized text"""
+        if self._offsets is None:
+            self._offsets = self._build_offsets()
+        return self._offsets[index] if index < len(self._offsets) else len(self.raw)
+    
+    def line_of(self, index):
+        """Line of the raw text, as split on newlines, holding normalized character `index`"""
+        if self._line_starts is None:
+            self._line_starts = array('q', [0])
+            self._line_starts.extend(match.end() for match in re.finditer('\n', self.raw))
+        return bisect.bisect_right(self._line_starts, self.raw_offset(index)) - 1
+    
+    def line_span(self, index, length):
+        """(line, start, end) of the raw text under normalized characters index..index+length
+
+        start and end are offsets within the line, as split on newlines.
+        """
+        line = self.line_of(index)
+        line_start = self._line_starts[line]
+        start = self.raw_offset(index)
+        end = self.raw_offset(index + length - 1) + 1 if length else start
+        return line, start - line_start, end - line_start
+    
+    def _build_offsets(self):
+        offsets = array('q')
+        translated = self.raw.translate(QUOTE_TRANSLATION)
+        position = 0
+        for space in WHITESPACE_PATTERN.finditer(translated):
+            self._extend_offsets(offsets, translated, position, space.start())
+            offsets.append(space.start())
+            position = space.end()
+        self._extend_offsets(offsets, translated, position, len(translated))
+        return offsets
+    
+    @staticmethod
+    def _extend_offsets(offsets, text, start, end):
+        segment = text[start:end]
+        if len(segment.casefold()) == len(segment):
+            offsets.extend(range(start, end))
+        else:
+            # Characters like 'ß' casefold to more than one character
+            for position, char in enumerate(segment, start):
+                offsets.extend([position] * len(char.casefold()))
+
+class FuzzyVocabulary:
+    """Bigram index over a set of words for difflib-style close-match lookups.
+
+    Returns the word difflib.get_close_matches(word, words, n=1, cutoff) would,
+    scoring with the same SequenceMatcher ratio and tie-breaking, but only over
+    words that share a bigram with the query (both padded with '$'). A word sharing
+    no bigram can only reach the cutoff by interleaving single characters ("abc" in
+    "xaybzcx"), which is not a spelling variant.
+
+    Words are indexed by length. Lengths are visited closest first, and a length
+    is skipped once its best possible ratio, 2 * min(a, b) / (a + b), is below the
+    best score so far.
+    """
+    
+    def __init__(self, words):
+        self.size = len(words)
+        self.index = {}
+        for word in words:
+            postings = self.index.setdefault(len(word), {})
+            for bigram in self.bigrams(word):
+                postings.setdefault(bigram, []).append(word)
+    
+    @staticmethod
+    def bigrams(word):
+        padded = f'${word}$'
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+    
+    def close_match(self, word, cutoff=0.6):
+        """Best word scoring at least `cutoff`, or None"""
+        bigrams = self.bigrams(word)
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        best = None
+        threshold = cutoff
+        
+        for length in sorted(self.index, key=lambda length: abs(length - len(word))):
+            if 2.0 * min(length, len(word)) / (length + len(word)) < threshold:
+                continue
+            
+            postings = self.index[length]
+            shared = Counter()
+            for bigram in bigrams:
+                shared.update(postings.get(bigram, ()))
+            
+            # Words sharing the most bigrams usually score best and raise the threshold early
+            for candidate, _ in shared.most_common():
+                matcher.set_seq1(candidate)
+                if matcher.quick_ratio() >= threshold:
+                    score = matcher.ratio()
+                    if score >= threshold and (best is None or (score, candidate) > best):
+                        best = (score, candidate)
+                        threshold = score
+        
+        return best[1] if best else None
+
+class TextAlignment:
+    """Monotone map from original-text offsets to revised-text offsets.
+
+    Anchored on word n-grams that occur exactly once in each text. Of the anchor
+    pairs, the longest chain in the same order in both texts is kept, so an
+    original position maps to its revised position with one binary search,
+    shifted by its distance from the nearest anchor before it.
+    """
+    
+    def __init__(self, original_text, revised_text, ngram_size=4):
+        self.original_length = len(original_text)
+        self.revised_length = len(revised_text)
+        
+        # Pairs of word indices, in original order
+        revised_ngrams = self.unique_ngrams(revised_text, ngram_size)
+        pairs = [
+            (original_index, revised_ngrams[ngram])
+            for ngram, original_index in self.unique_ngrams(original_text, ngram_size).items()
+            if ngram in revised_ngrams
+        ]
+        chain = self.increasing_chain([revised_index for _, revised_index in pairs])
+        
+        original_starts = [match.start() for match in WORD_PATTERN.finditer(original_text)] if chain else []
+        revised_starts = [match.start() for match in WORD_PATTERN.finditer(revised_text)] if chain else []
+        self.original_offsets = array('q', (original_starts[pairs[i][0]] for i in chain))
+        self.revised_offsets = array('q', (revised_starts[pairs[i][1]] for i in chain))
+    
+    @staticmethod
+    def unique_ngrams(text, ngram_size):
+        """Word index of every word n-gram that occurs exactly once"""
+        words = WORD_PATTERN.findall(text)
+        ngrams = list(zip(*(words[i:] for i in range(ngram_size))))
+        counts = Counter(ngrams)
+        return {ngram: i for i, ngram in enumerate(ngrams) if counts[ngram] == 1}
+    
+    @staticmethod
+    def increasing_chain(values):
+        """Indices of a longest strictly increasing subsequence of `values`"""
+        tails = []  # tails[k]: index of the smallest tail of a chain of length k + 1
+        tail_values = []
+        previous = [-1] * len(values)
+        for i, value in enumerate(values):
+            k = bisect.bisect_left(tail_values, value)
+            if k:
+                previous[i] = tails[k - 1]
+            if k == len(tails):
+                tails.append(i)
+                tail_values.append(value)
+            else:
+                tails[k] = i
+                tail_values[k] = value
+        
+        chain = []
+        i = tails[-1] if tails else -1
+        while i != -1:
+            chain.append(i)
+            i = previous[i]
+        return chain[::-1]
+    
+    def map(self, position):
+        """Revised-text offset corresponding to original-text `position`"""
+        if not self.original_offsets:
+            # Nothing in common: fall back to the same relative position
+            return int(position * self.revised_length / max(self.original_length, 1))
+        
+        i = bisect.bisect_right(self.original_offsets, position) - 1
+        if i < 0:
+            return max(0, self.revised_offsets[0] - (self.original_offsets[0] - position))
+        
+        mapped = self.revised_offsets[i] + (position - self.original_offsets[i])
+        if i + 1 < len(self.revised_offsets):
+            mapped = min(mapped, self.revised_offsets[i + 1])
+        return min(mapped, self.revised_length)
+
+class CondensedDiff:
+    """Both documents' lines cut down to what a context diff shows.
+
+    Paragraphs are interned to integer ids, so comparing two lines is one integer
+    comparison. The common prefix and suffix are trimmed first, then the rest is
+    matched, and every run of identical paragraphs keeps only the `context` lines
+    next to a change plus one line standing in for the gap. HtmlDiff on the kept
+    lines shows the same rows as on the full documents (a repeated line that was
+    deleted may be paired with another of its copies); `renumber` puts the
+    document line numbers back into its table.
+    """
+
+    DIFF_HEADER_PATTERN = re.compile(r'<td class="diff_header" id="(from|to)(\d+_)(\d+)">\d+</td>')
+
+    def __init__(self, original_lines, revised_lines, context=3):
+        ids = {}
+        original_ids = [ids.setdefault(line, len(ids)) for line in original_lines]
+        revised_ids = [ids.setdefault(line, len(ids)) for line in revised_lines]
+
+        prefix = 0
+        shortest = min(len(original_ids), len(revised_ids))
+        while prefix < shortest and original_ids[prefix] == revised_ids[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < shortest - prefix
+               and original_ids[-1 - suffix] == revised_ids[-1 - suffix]):
+            suffix += 1
+
+        original_end = len(original_ids) - suffix
+        revised_end = len(revised_ids) - suffix
+        matcher = difflib.SequenceMatcher(
+            None, original_ids[prefix:original_end], revised_ids[prefix:revised_end], autojunk=False)
+
+        # Unchanged runs as (original_start, revised_start, length), prefix and suffix included
+        runs = [(0, 0, prefix)]
+        runs += [(prefix + i, prefix + j, size) for i, j, size in matcher.get_matching_blocks() if size]
+        runs.append((original_end, revised_end, suffix))
+
+        original_keep = []
+        revised_keep = []
+        changed_before = False
+        for (i, j, size), (next_i, next_j, _) in zip(runs, runs[1:] + [(len(original_ids), len(revised_ids), 0)]):
+            changed_after = next_i > i + size or next_j > j + size
+            original_keep.extend(self.kept_offsets(i, size, context, changed_before, changed_after))
+            revised_keep.extend(self.kept_offsets(j, size, context, changed_before, changed_after))
+            # Changed lines are all kept
+            original_keep.extend(range(i + size, next_i))
+            revised_keep.extend(range(j + size, next_j))
+            changed_before = changed_after
+
+        self.changed = bool(matcher.a or matcher.b)
+        if not self.changed:
+            # Identical documents: HtmlDiff reports no differences for empty input too
+            original_keep, revised_keep = [], []
+        self.original_lines = [original_lines[i] for i in original_keep]
+        self.revised_lines = [revised_lines[j] for j in revised_keep]
+        self.original_numbers = array('q', (i + 1 for i in original_keep))
+        self.revised_numbers = array('q', (j + 1 for j in revised_keep))
+
+    @staticmethod
+    def kept_offsets(start, size, context, changed_before, changed_after):
+        """Offsets of an unchanged run that a context diff can show, plus one for the gap"""
+        head = min(size, context) if changed_before else 0
+        tail = min(size - head, context) if changed_after else 0
+        kept = list(range(start, start + head))
+        if head + tail < size:
+            # Stands in for the hidden lines, so the diff still separates the hunks
+            kept.append(start + head)
+        kept.extend(range(start + size - tail, start + size))
+        return kept
+
+    def renumber(self, html_table):
+        """Replace line numbers of the kept lines in an HtmlDiff table with document line numbers"""
+        numbers = {'from': self.original_numbers, 'to': self.revised_numbers}
+
+        def document_number(match):
+            side, prefix, line = match.group(1), match.group(2), int(match.group(3))
+            number = numbers[side][line - 1]
+            return f'<td class="diff_header" id="{side}{prefix}{number}">{number}</td>'
+
+        return self.DIFF_HEADER_PATTERN.sub(document_number, html_table)
+
+class AnnotatedHtmlDiff(difflib.HtmlDiff):
+    """HtmlDiff that highlights spans of the revised lines while it formats them.
+
+    `annotations` maps a revised line index to (start, end, title) spans in that
+    line. Spans are marked with placeholder characters as each line is formatted,
+    the same way HtmlDiff marks changes, and one substitution over the finished
+    table turns them into <span class="missed-instance"> elements. After make_table,
+    `rendered_lines` holds the revised line indexes whose spans the table shows.
+    """
+
+    ANNOTATION_OPEN_PATTERN = re.compile('\x02(\\d+)\x03')
+
+    def __init__(self, annotations=None, **kwargs):
+        super().__init__(**kwargs)
+        self.annotations = annotations or {}
+        self.rendered_lines = set()
+        self._line_annotations = {}
+        self._annotation_titles = []
+        self._annotation_lines = []
+
+    def _prepare_annotations(self, tolines, line_numbers=None):
+        """Key the spans by the line numbers _format_line will see, in tab-expanded columns
+
+        `line_numbers` are the document line numbers of `tolines`, when they are not
+        simply 1, 2, 3...
+        """
+        self._line_annotations = {}
+        self._annotation_titles = []
+        self._annotation_lines = []
+        if not self.annotations:
+            return
+        if line_numbers is None:
+            numbered = ((line, line + 1) for line in self.annotations if line < len(tolines))
+        else:
+            numbered = ((number - 1, position + 1) for position, number in enumerate(line_numbers)
+                        if number - 1 in self.annotations)
+        for line, number in numbered:
+            text = tolines[number - 1]
+            spans = []
+            for start, end, title in sorted(self.annotations[line]):
+                if start >= end or (spans and start < spans[-1][1]):
+                    continue
+                if '\t' in text:
+                    start = len(text[:start].expandtabs(self._tabsize))
+                    end = len(text[:end].expandtabs(self._tabsize))
+                spans.append((start, end, len(self._annotation_titles)))
+                self._annotation_titles.append(title)
+                self._annotation_lines.append(line)
+            self._line_annotations[number] = spans
+
+    def _format_line(self, side, flag, linenum, text):
+        spans = self._line_annotations.get(linenum) if side == 1 else None
+        if spans:
+            text = self._mark_annotations(text, spans)
+        return super()._format_line(side, flag, linenum, text)
+
+    @staticmethod
+    def _mark_annotations(text, spans):
+        """Insert span placeholders into text that may already hold HtmlDiff's change markers
+
+        Offsets count only the line's own characters. An annotation is closed
+        before and reopened after every change marker inside it, so the spans
+        nest properly in the HTML.
+        """
+        parts = []
+        position = 0
+        i = 0
+        k = 0
+        inside = False
+        while True:
+            if inside and position == spans[k][1]:
+                parts.append('\x04')
+                inside = False
+                k += 1
+            if not inside and k < len(spans) and position == spans[k][0]:
+                parts.append(f'\x02{spans[k][2]}\x03')
+                inside = True
+            if i == len(text):
+                break
+            if text[i] in '\0\1':
+                # A change marker: '\0' and the kind of change, or '\1'
+                marker = text[i:i + 2] if text[i] == '\0' else text[i]
+                i += len(marker)
+                if inside:
+                    marker = '\x04' + marker + f'\x02{spans[k][2]}\x03'
+                parts.append(marker)
+                continue
+            parts.append(text[i])
+            position += 1
+            i += 1
+        if inside:
+            parts.append('\x04')
+        return ''.join(parts)
+
+    def _annotation_markup(self, html_table):
+        """Turn the span placeholders of a finished table into HTML"""
+        self.rendered_lines = set()
+        if not self._annotation_titles:
+            return html_table
+        titles = self._annotation_titles
+        
+        # A context table leaves out unchanged lines away from the changes
+        for k in self.ANNOTATION_OPEN_PATTERN.findall(html_table):
+            self.rendered_lines.add(self._annotation_lines[int(k)])
+
+        def open_span(match):
+            title = html.escape(titles[int(match.group(1))], quote=True)
+            return f'<span class="missed-instance" title="{title}">'
+
+        return self.ANNOTATION_OPEN_PATTERN.sub(open_span, html_table).replace('\x04', '</span>')
+
+class CondensedHtmlDiff(AnnotatedHtmlDiff):
+    """difflib.HtmlDiff that only diffs the lines a context table shows"""
+
+    def make_table(self, fromlines, tolines, fromdesc='', todesc='', context=False, numlines=5):
+        if not context:
+            self._prepare_annotations(tolines)
+            html_table = super().make_table(fromlines, tolines, fromdesc, todesc, context, numlines)
+            return self._annotation_markup(html_table)
+        condensed = CondensedDiff(fromlines, tolines, context=numlines)
+        self._prepare_annotations(condensed.revised_lines, condensed.revised_numbers)
+        html_table = super().make_table(
+            condensed.original_lines, condensed.revised_lines, fromdesc, todesc, context, numlines)
+        return self._annotation_markup(condensed.renumber(html_table))
+
+class PatienceMatcher(difflib.SequenceMatcher):
+    """SequenceMatcher with a patience diff for its matching blocks.
+
+    Lines that occur exactly once in both sequences are anchors; the longest chain
+    of anchors in the same order in both is matched, and every gap between them is
+    diffed the same way. A gap with no unique common line falls back to
+    SequenceMatcher, but by then it is usually a few repeated lines such as blanks.
+    Time is close to linear in the number of lines, so opcodes for two long
+    documents cost about as much as reading them.
+    """
+
+    def set_seq2(self, b):
+        # SequenceMatcher indexes every line of b here; patience does not need it
+        if b is self.b:
+            return
+        self.b = b
+        self.matching_blocks = self.opcodes = None
+        self.fullbcount = None
+
+    def get_matching_blocks(self):
+        if self.matching_blocks is not None:
+            return self.matching_blocks
+
+        a, b = self.a, self.b
+        blocks = []
+        queue = [(0, len(a), 0, len(b))]
+        while queue:
+            alo, ahi, blo, bhi = queue.pop()
+
+            # Equal lines at either end of the gap match without anchoring
+            start = 0
+            while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+                start += 1
+            if start:
+                blocks.append((alo, blo, start))
+                alo, blo = alo + start, blo + start
+            end = 0
+            while alo < ahi - end and blo < bhi - end and a[ahi - 1 - end] == b[bhi - 1 - end]:
+                end += 1
+            if end:
+                ahi, bhi = ahi - end, bhi - end
+                blocks.append((ahi, bhi, end))
+            if alo == ahi or blo == bhi:
+                continue
+
+            a_counts = Counter(a[alo:ahi])
+            b_unique = {}
+            for j in range(blo, bhi):
+                b_unique[b[j]] = j if b[j] not in b_unique else -1
+            anchors = [
+                (i, b_unique[a[i]]) for i in range(alo, ahi)
+                if a_counts[a[i]] == 1 and b_unique.get(a[i], -1) >= 0
+            ]
+            if not anchors:
+                matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi])
+                blocks.extend((alo + i, blo + j, size) for i, j, size in matcher.get_matching_blocks() if size)
+                continue
+
+            previous_i, previous_j = alo, blo
+            for k in TextAlignment.increasing_chain([j for _, j in anchors]):
+                i, j = anchors[k]
+                blocks.append((i, j, 1))
+                if previous_i < i or previous_j < j:
+                    queue.append((previous_i, i, previous_j, j))
+                previous_i, previous_j = i + 1, j + 1
+            if previous_i < ahi or previous_j < bhi:
+                queue.append((previous_i, ahi, previous_j, bhi))
+
+        # Collapse adjacent blocks, as SequenceMatcher does
+        blocks.sort()
+        merged = []
+        for i, j, size in blocks:
+            if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+                merged[-1][2] += size
+            else:
+                merged.append([i, j, size])
+        merged.append([len(a), len(b), 0])
+        self.matching_blocks = [difflib.Match(*block) for block in merged]
+        return self.matching_blocks
+
+class SideBySideDiff(AnnotatedHtmlDiff):
+    """The HtmlDiff table, built from a patience line diff and a token intraline diff.
+
+    difflib.HtmlDiff pairs changed lines by character similarity, which is close to
+    quadratic on long documents, and marks changes inside a pair character by
+    character. Here changed lines pair up in order and changes are marked a word
+    at a time, or a character at a time with intraline='char'. Markup, anchors
+    and navigation links are the same as HtmlDiff's. Annotated revised lines are
+    shown in a context table even when they are unchanged.
+    """
+
+    line_matcher = PatienceMatcher
+    token_pattern = re.compile(r'\w+|\s+|[^\w\s]')
+    intraline_modes = ('word', 'char')
+
+    # Below this similarity a pair of lines is shown as removed and added
+    similar_lines_cutoff = 0.5
+
+    # A changed word no longer than this is compared character by character, so a
+    # spelling fix marks the letters that changed rather than the whole word
+    refine_token_length = 20
+
+    def __init__(self, intraline='word', **kwargs):
+        super().__init__(**kwargs)
+        if intraline not in self.intraline_modes:
+            raise ValueError(f"intraline must be one of {self.intraline_modes}, not {intraline!r}")
+        self.intraline = intraline
+
+    def make_table(self, fromlines, tolines, fromdesc='', todesc='', context=False, numlines=5):
+        self._make_prefix()
+        self._prepare_annotations(tolines)
+        fromlines, tolines = self._tab_newline_replace(fromlines, tolines)
+        diffs = self.side_by_side(fromlines, tolines, numlines if context else None)
+        fromlist, tolist, flaglist = self._collect_lines(diffs)
+        fromlist, tolist, flaglist, next_href, next_id = self._convert_flags(
+            fromlist, tolist, flaglist, context, numlines)
+
+        # The rest is HtmlDiff.make_table
+        s = []
+        fmt = '            <tr><td class="diff_next"%s>%s</td>%s' + \
+              '<td class="diff_next">%s</td>%s</tr>\n'
+        for i in range(len(flaglist)):
+            if flaglist[i] is None:
+                if i > 0:
+                    s.append('        </tbody>        \n        <tbody>\n')
+            else:
+                s.append(fmt % (next_id[i], next_href[i], fromlist[i], next_href[i], tolist[i]))
+        if fromdesc or todesc:
+            header_row = '<thead><tr>%s%s%s%s</tr></thead>' % (
+                '<th class="diff_next"><br /></th>',
+                '<th colspan="2" class="diff_header">%s</th>' % fromdesc,
+                '<th class="diff_next"><br /></th>',
+                '<th colspan="2" class="diff_header">%s</th>' % todesc)
+        else:
+            header_row = ''
+
+        table = self._table_template % dict(
+            data_rows=''.join(s),
+            header_row=header_row,
+            prefix=self._prefix[1])
+
+        table = table.replace('\0+', '<span class="diff_add">'). \
+                      replace('\0-', '<span class="diff_sub">'). \
+                      replace('\0^', '<span class="diff_chg">'). \
+                      replace('\1', '</span>'). \
+                      replace('\t', '&nbsp;')
+        return self._annotation_markup(table)
+
+    def side_by_side(self, fromlines, tolines, context_lines=None):
+        """Rows in the form difflib's _mdiff yields them: ((number, text), (number, text), changed)
+
+        With `context_lines`, only changes and that many lines around them, and a
+        (None, None, None) separator between hunks.
+        """
+        matcher = self.line_matcher(None, fromlines, tolines)
+        if self.annotations:
+            # Grouping keeps every opcode that is not 'equal', with its context
+            matcher.opcodes = self.split_annotated_lines(matcher.get_opcodes())
+        if context_lines is None:
+            groups = [matcher.get_opcodes()]
+        elif any(tag != 'equal' for tag, _, _, _, _ in matcher.get_opcodes()):
+            groups = matcher.get_grouped_opcodes(context_lines)
+        else:
+            return
+
+        for group in groups:
+            if context_lines is not None:
+                yield None, None, None
+            for tag, i1, i2, j1, j2 in group:
+                if tag in ('equal', 'annotated'):
+                    for i, j in zip(range(i1, i2), range(j1, j2)):
+                        yield (i + 1, fromlines[i]), (j + 1, tolines[j]), False
+                    continue
+                paired = min(i2 - i1, j2 - j1)
+                for i, j in zip(range(i1, i1 + paired), range(j1, j1 + paired)):
+                    from_text, to_text = self.mark_changes(fromlines[i], tolines[j])
+                    yield (i + 1, from_text), (j + 1, to_text), True
+                for i in range(i1 + paired, i2):
+                    yield (i + 1, '\0-' + fromlines[i] + '\1'), ('', ''), True
+                for j in range(j1 + paired, j2):
+                    yield ('', ''), (j + 1, '\0+' + tolines[j] + '\1'), True
+
+    def split_annotated_lines(self, opcodes):
+        """Opcodes with each annotated, unchanged revised line as its own 'annotated' opcode"""
+        annotated = sorted(self.annotations)
+        split = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag != 'equal':
+                split.append((tag, i1, i2, j1, j2))
+                continue
+            k = bisect.bisect_left(annotated, j1)
+            while k < len(annotated) and annotated[k] < j2:
+                j = annotated[k]
+                i = i1 + (j - j1)
+                if j > j1:
+                    split.append(('equal', i1, i, j1, j))
+                split.append(('annotated', i, i + 1, j, j + 1))
+                i1, j1 = i + 1, j + 1
+                k += 1
+            if j1 < j2:
+                split.append(('equal', i1, i2, j1, j2))
+        return split
+
+    def mark_changes(self, from_line, to_line):
+        """Both lines with HtmlDiff's change markers around the tokens that differ"""
+        if self.intraline == 'char':
+            from_tokens, to_tokens = list(from_line), list(to_line)
+        else:
+            from_tokens = self.token_pattern.findall(from_line)
+            to_tokens = self.token_pattern.findall(to_line)
+        marked = self.mark_tokens(from_tokens, to_tokens, refine=self.intraline == 'word')
+        if marked is None:
+            return '\0-' + from_line + '\1', '\0+' + to_line + '\1'
+        return marked
+
+    def mark_tokens(self, from_tokens, to_tokens, refine=False):
+        """Joined token lists with change markers, or None if they are too different.
+
+        With `refine`, a single short word replaced by another is marked character
+        by character when the two words are similar.
+        """
+        if refine:
+            # Words repeat too often in a long paragraph for SequenceMatcher to be
+            # quick; the patience matcher anchors on the words that do not
+            matcher = self.line_matcher(None, from_tokens, to_tokens)
+        else:
+            matcher = difflib.SequenceMatcher(None, from_tokens, to_tokens, autojunk=False)
+        if matcher.real_quick_ratio() < self.similar_lines_cutoff or matcher.ratio() < self.similar_lines_cutoff:
+            return None
+
+        from_parts = []
+        to_parts = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            from_text = ''.join(from_tokens[i1:i2])
+            to_text = ''.join(to_tokens[j1:j2])
+            if tag == 'equal':
+                from_parts.append(from_text)
+                to_parts.append(to_text)
+            elif tag == 'replace':
+                refined = None
+                if (refine and i2 - i1 == j2 - j1 == 1
+                        and max(len(from_text), len(to_text)) <= self.refine_token_length):
+                    refined = self.mark_tokens(list(from_text), list(to_text))
+                if refined is None:
+                    refined = '\0^' + from_text + '\1', '\0^' + to_text + '\1'
+                from_parts.append(refined[0])
+                to_parts.append(refined[1])
+            elif tag == 'delete':
+                from_parts.append('\0-' + from_text + '\1')
+            else:
+                to_parts.append('\0+' + to_text + '\1')
+        return ''.join(from_parts), ''.join(to_parts)
+
+# Report table renderers, selected with the DIFF_ENGINE setting
+DIFF_ENGINES = {
+    'patience': SideBySideDiff,
+    'difflib': CondensedHtmlDiff,
+}
+
+# Comment intent rules, compiled once at import. Within each table the first
+# matching rule wins, so order matters.
+
+# Only the style rules, which are literal phrases, run on comments longer than
+# COMMENT_PARSE_MAX_LENGTH, and rule matching stops after COMMENT_PARSE_TIME_BUDGET
+# seconds. Either way the comment goes to manual review. The budget is checked between
+# rules, so it only holds because no single rule backtracks: see SeparatorRule.
+COMMENT_PARSE_MAX_LENGTH = 500
+COMMENT_PARSE_TIME_BUDGET = 0.1
+
+# Comments that explicitly name their own change skip context-aware parsing
+CONTEXT_EXPLICIT_PATTERN = re.compile('|'.join([
+    r'change\s+all\s+',
+    r'replace\s+all\s+',
+    r'find\s+and\s+replace',
+    r'everywhere',
+    r'globally',
+    r'throughout'
+]), re.IGNORECASE)
+
+# "His/Her/Their name should be X" when commenting on a specific name
+CONTEXT_NAME_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'(?:his|her|their|the)\s+name\s+should\s+be\s+["\']?([^"\']+)["\']?',
+    r'(?:his|her|their|the)\s+name\s+is\s+["\']?([^"\']+)["\']?',
+    r'name\s+should\s+be\s+["\']?([^"\']+)["\']?',
+    r'should\s+be\s+named\s+["\']?([^"\']+)["\']?',
+    r'call\s+(?:him|her|them|it)\s+["\']?([^"\']+)["\']?',
+    r'(?:the\s+)?(?:character|boy|girl|person)\s+should\s+be\s+called\s+["\']?([^"\']+)["\']?',  # "the character should be called Mike"
+    r'change\s+(?:his|her|their|the)\s+name\s+to\s+["\']?([^"\']+)["\']?',  # "change her name to Diane"
+    r'rename\s+(?:him|her|them|it)\s+to\s+["\']?([^"\']+)["\']?',  # "rename her to Diane"
+]]
+
+# "should be X" when commenting on a specific word (context-dependent)
+CONTEXT_SHOULD_BE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'should\s+be\s+["\']?([^"\']+)["\']?$',  # Simple "should be X" at end
+]]
+
+# Comments that are just instructions without explicit source/target
+CONTEXT_INSTRUCTION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'make\s+(?:it|this)\s+["\']?([^"\']+)["\']?',
+    r'change\s+(?:it|this)\s+to\s+["\']?([^"\']+)["\']?',
+    r'use\s+["\']?([^"\']+)["\']?\s+instead',
+]]
+
+# Single word/phrase comments (likely replacement targets)
+CONTEXT_SINGLE_WORD_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'^["\']?([^"\']+)["\']?$',  # Just a single word/phrase (replacement target)
+]]
+
+# Style/grammar patterns that the fallback system can recognize
+STYLE_RULES = [(re.compile(pattern, re.IGNORECASE), change_type, description) for pattern, change_type, description in [
+    # Contraction-related
+    (r"don'?t\s+use\s+contractions?", 'style_grammar', 'Remove contractions from text'),
+    (r"expand\s+contractions?", 'style_grammar', 'Expand contractions to full forms'),
+    (r"no\s+contractions?", 'style_grammar', 'Remove contractions from text'),
+
+    # Formality
+    (r"make\s+(?:this\s+)?more\s+formal", 'style_grammar', 'Make text more formal'),
+    (r"use\s+formal\s+language", 'style_grammar', 'Use formal language'),
+    (r"less\s+casual", 'style_grammar', 'Make text less casual'),
+
+    # Grammar
+    (r"fix\s+grammar", 'style_grammar', 'Fix grammatical errors'),
+    (r"correct\s+grammar", 'style_grammar', 'Correct grammatical errors'),
+    (r"grammar\s+(?:error|mistake)", 'style_grammar', 'Fix grammatical errors'),
+
+    # General style
+    (r"improve\s+(?:the\s+)?writing", 'style_grammar', 'Improve writing style'),
+    (r"make\s+(?:this\s+)?clearer", 'style_grammar', 'Make text clearer'),
+    (r"simplify\s+(?:this\s+)?(?:text|language)?", 'style_grammar', 'Simplify the language'),
+]]
+
+# One alternation of every style rule: most comments are not style comments, and a
+# single search rules them all out. Matching comments still walk STYLE_RULES in order.
+STYLE_PREFILTER = re.compile('|'.join(f'(?:{rule.pattern})' for rule, _, _ in STYLE_RULES), re.IGNORECASE)
+
+# Rules ending in a scope keyword only run when the comment contains one of them
+GLOBAL_SCOPE_WORDS = ('everywhere', 'globally', 'throughout')
+
+# An optionally quoted value: group 1 holds it up to the first quote after an opening one
+QUOTED_VALUE_PATTERN = re.compile(r'\s*+["\']?+([^"\']*+)["\']?+\s*+')
+
+class SeparatorMatch:
+    """The values a SeparatorRule found, read like the groups of a regex match"""
+    
+    def __init__(self, *values):
+        self.values = values
+    
+    def groups(self):
+        return self.values
+
+class SeparatorRule:
+    """An intent rule of the form `lead X separator Y [tail]`, matched in linear time.
+
+    As one regex, X and Y (runs of anything but quotes) trade characters with the
+    whitespace around the separator, and a search backtracks polynomially: a
+    comment with a few hundred spaces took seconds. Here each part is found by
+    its own scan. The lead is the first match, the tail the last one after it, and
+    X runs to the last separator before the tail, as the greedy regex would have it.
+    X and Y may be wrapped in quotes but not contain them.
+    """
+    
+    def __init__(self, lead, separator, tail=None):
+        self.lead = re.compile(lead, re.IGNORECASE)
+        # Whole words with whitespace either side, so no position is tried twice
+        self.separator = re.compile(rf'(?<=\s)(?:{separator})(?=\s)', re.IGNORECASE)
+        self.tail = re.compile(rf'(?<=\s)(?:{tail})', re.IGNORECASE) if tail else None
+        # The same rule as a single regex, which is how it used to be searched
+        self.pattern = (rf'{lead}["\']?([^"\']+)["\']?\s+(?:{separator})\s+["\']?([^"\']+)["\']?'
+                        + (rf'\s+(?:{tail})' if tail else ''))
+    
+    def search(self, text):
+        lead = self.lead.search(text)
+        if not lead:
+            return None
+        start = lead.end()
+        
+        end = len(text)
+        if self.tail:
+            tails = [match.start() for match in self.tail.finditer(text, start)]
+            if not tails:
+                return None
+            end = tails[-1]
+        
+        # X can only reach its first quote other than an opening one, plus any closing quote
+        reach = QUOTED_VALUE_PATTERN.match(text, start).end()
+        separators = []
+        for separator in self.separator.finditer(text, start, end):
+            if separator.start() > reach:
+                break
+            separators.append(separator)
+        
+        for separator in reversed(separators):
+            from_text = QUOTED_VALUE_PATTERN.match(text, start, separator.start()).group(1).strip()
+            if self.tail:
+                value = QUOTED_VALUE_PATTERN.match(text, separator.end(), end)
+                if value.end() < end:
+                    break  # A quote inside Y, which it also is for every earlier separator
+            else:
+                value = QUOTED_VALUE_PATTERN.match(text, separator.end())
+            to_text = value.group(1).strip()
+            if from_text and to_text:
+                return SeparatorMatch(from_text, to_text)
+        return None
+
+# Enhanced patterns for common change instructions, as (change_type, pattern, required)
+# where `required` lists substrings of the lowercased comment, at least one of which
+# must be present before the pattern is searched. Two-value rules with a separator
+# are SeparatorRules; the rest are regexes that cannot backtrack far.
+INTENT_RULES = [(change_type, re.compile(pattern, re.IGNORECASE) if isinstance(pattern, str) else pattern, required)
+                for change_type, pattern, required in [
+    # Global replacements
+    ('replace_global', SeparatorRule(r'change\s+(?:all\s+)?(?:instances?\s+of\s+)?', r'to|with', r'everywhere|globally|throughout'), GLOBAL_SCOPE_WORDS),
+    ('replace_global', SeparatorRule(r'replace\s+(?:all\s+)?', r'with|to', r'everywhere|globally|throughout'), GLOBAL_SCOPE_WORDS),
+    ('replace_global', SeparatorRule(r'(?:find|search)\s+and\s+replace\s+', r'with|to'), None),
+    ('replace_global', SeparatorRule(r'change\s+all\s+', r'to|with'), None),  # "change all X to Y" (with or without quotes)
+
+    # Character/name change patterns (global by nature)
+    ('replace_global', r'change\s+(?:the\s+)?(?:character|boy|girl|person|name)\'?s?\s+name\s+to\s+["\']?([^"\']+)["\']?', None),  # "change the boy's name to Jimmy"
+    ('replace_global', r'rename\s+(?:the\s+)?(?:character|boy|girl|person)\s+to\s+["\']?([^"\']+)["\']?', None),  # "rename the character to Jimmy"
+
+    # Local replacements - most common patterns
+    ('replace_local', SeparatorRule(r'change\s+(?:this\s+(?!(?:to|with)\s))?', r'to|with'), None),
+    ('replace_local', SeparatorRule(r'replace\s+', r'with|to'), None),
+    ('replace_local', SeparatorRule(r'correct\s+(?:spelling|word)?:?\s*', r'to|should\s+be|->|→'), None),
+    ('replace_local', r'correct\s+(?:spelling|word)?:?\s+([^\s]+)', None),  # "correct spelling: receive"
+    ('replace_local', SeparatorRule(r'should\s+be\s+', r'not|instead\s+of'), None),
+    ('replace_local', SeparatorRule(r'(?:fix|correct):\s*', r'to|->|→'), None),
+    ('replace_local', SeparatorRule(r'(?:typo|error):\s*', r'should\s+be|->|→'), None),
+    # REMOVED the problematic generic pattern that was causing "His name should be Eli" to be parsed incorrectly
+    # Starts only at the beginning of the comment or after a quote or '?', and the groups never give
+    # characters back, so this is linear in the comment length
+    ('replace_local', r'(?<![^"\'?])["\']?([^"\'?]++)["\']?\s*+[?]\s*+["\']?([^"\']++)["\']?', ('?',)),  # "real? reel"
+    ('replace_local', SeparatorRule(r'use\s+', r'instead\s+of|not'), None),
+
+    # Deletions
+    ('delete', r'(?:delete|remove)\s+["\']?([^"\']+)["\']?', None),
+    ('delete', r'(?:cut|omit)\s+["\']?([^"\']+)["\']?', None),
+    ('delete', r'take\s+out\s+["\']?([^"\']+)["\']?', None),
+
+    # Additions
+    ('add', r'(?:add|insert)\s+["\']?([^"\']+)["\']?(?:\s+(?:before|after)\s+["\']?([^"\']+)["\']?)?', None),
+    ('add', r'include\s+["\']?([^"\']+)["\']?', None),
+    ('add', SeparatorRule(r'put\s+', r'before|after'), None),
+
+    # Formatting
+    ('format', SeparatorRule(r'(?:format|style)\s+', r'as'), None),
+    # The value has to end at a quote or a non-space, so no whitespace run is tried twice
+    ('format', r'make\s++["\']?([^"\']+)["\']?(?<!\s)\s++(?:bold|italic|underlined?)', None),
+]]
+
+# Smart fallbacks: "word1 -> word2" replacements and single replacement targets
+SIMPLE_REPLACEMENT_PATTERN = re.compile(r'^["\']?(\w+)["\']?\s*[?/→-]+\s*["\']?(\w+)["\']?$', re.IGNORECASE)
+SINGLE_WORD_PATTERN = re.compile(r'^["\']?(\w+)["\']?$', re.IGNORECASE)
+
+# AI prompts carry excerpts of the documents rather than the documents themselves,
+# so a prompt stays about the same size however long the documents are
+AI_CONTEXT_WINDOW = 600  # Characters each side of a local comment's anchor
+AI_OCCURRENCE_SNIPPETS = 5  # Snippets per term and document for global comments
+AI_SNIPPET_RADIUS = 80  # Characters each side of an occurrence
+AI_PROMPT_TERMS = 3  # Terms located for a global comment
+AI_CHANGED_PARAGRAPHS = 10  # Changed paragraphs sent for a comment with no anchor
+AI_TOKENS_PER_COMMENT = 500  # Response budget for each comment in a request
+AI_PROMPT_VERSION = 1  # Part of every AI cache key; bump when a prompt template changes
+
+# How far a pattern-matching status can be trusted without asking the AI; statuses
+# not listed (unclear, manual_review_required, invalid_comment) always go to the AI.
+# A change that was not found is as likely to be a misread comment as a missed edit.
+PATTERN_STATUS_CONFIDENCE = {
+    'correctly_applied': 0.9,
+    'partially_applied': 0.9,
+    'not_applied': 0.7
+}
+
+# The most a result is trusted when its intent was not read from the comment itself
+# (taken from the associated text, or a type forced by the user's scope) or when it
+# came from the local context check, which only sees whether the commented text changed
+PATTERN_GUESS_CONFIDENCE = 0.5
+
+AI_SCOPE_DESCRIPTIONS = {
+    'global': 'a GLOBAL change (should affect all instances throughout the document)',
+    'local': 'a LOCAL change (should affect only the specific instance being commented on)',
+    'auto': 'automatically determined scope based on the comment intent'
+}
+
+class WordDocumentAnalyzer:
+    def __init__(self):
+        self.session_data = {}
+    
+    def extract_document_data(self, file_path):
+        """Extract text and comments from a Word document (a path or an in-memory file object)"""
+        try:
+            # One ZIP handle shared by every extraction step
+            with zipfile.ZipFile(file_path, 'r') as docx_zip:
+                # Fast path: one streaming pass over each ZIP member
+                data = self.extract_document_data_streaming(docx_zip)
+                if data is not None:
+                    return data
+
+                logger.info("Streaming extraction not possible, falling back to python-docx")
+                if hasattr(file_path, 'seek'):
+                    file_path.seek(0)
+                doc = Document(file_path)
+                
+                # Extract main document text with paragraph tracking
+                paragraphs = CompactParagraphs.from_runs(
+                    [run.text for run in para.runs] for para in doc.paragraphs
+                )
+                
+                # Extract comments (Word comments are stored differently)
+                comments = self.extract_comments(doc, docx_zip)
+                
+                return {
+                    'paragraphs': paragraphs,
+                    'comments': comments,
+                    'full_text': paragraphs.full_text
+                }
+        except Exception as e:
+            logger.error(f"Error extracting document data: {str(e)}")
+            raise e
+
+    def session_copy(self, data):
+        """Copy cached document data for a session"""
+        # Sessions replace the comment list with scoped copies - never share it with the cache
+        session_copy = dict(data)
+        session_copy['comments'] = [dict(comment) for comment in data['comments']]
+        return session_copy
+    
+    def extract_documents_parallel(self, documents):
+        """Extract several documents concurrently from {name: docx_bytes}.
+        
+        Cached documents are served directly; the rest are extracted in the process
+        pool when more than one needs work. Returns ({name: data}, {name: error message}).
+        """
+        results = {}
+        errors = {}
+        pending = {}
+        
+        for name, docx_bytes in documents.items():
+            key = extraction_cache.key_for(docx_bytes)
+            data = extraction_cache.get(key)
+            if data is not None:
+                logger.info(f"Extraction cache hit for {name} document {key[:12]}")
+                results[name] = self.session_copy(data)
+            else:
+                pending[name] = (key, docx_bytes)
+        
+        pool = get_extraction_pool() if len(pending) > 1 else None
+        futures = {}
+        if pool:
+            try:
+                futures = {name: pool.submit(extract_document_bytes, docx_bytes)
+                           for name, (key, docx_bytes) in pending.items()}
+            except Exception as e:
+                logger.error(f"Could not submit to extraction pool, extracting in-process: {str(e)}")
+                discard_extraction_pool()
+                futures = {}
+        
+        for name, (key, docx_bytes) in pending.items():
+            try:
+                if name in futures:
+                    try:
+                        data = futures[name].result()
+                    except concurrent.futures.BrokenExecutor as e:
+                        logger.error(f"Extraction pool failed for {name} document, retrying in-process: {str(e)}")
+                        discard_extraction_pool()
+                        data = self.extract_document_data(io.BytesIO(docx_bytes))
+                else:
+                    data = self.extract_document_data(io.BytesIO(docx_bytes))
+            except Exception as e:
+                logger.error(f"Error extracting {name} document: {str(e)}")
+                errors[name] = str(e)
+                continue
+            
+            extraction_cache.put(key, data)
+            results[name] = self.session_copy(data)
+        
+        return results, errors
+
+    def extract_document_data_streaming(self, source):
+        """Extract paragraphs, full text and comments with a single iterparse pass per ZIP member.
+
+        source is a path, a file object or an already open ZipFile (left open).
+        Produces the same structure as the python-docx path. Returns None when the
+        package layout is unusual, so the caller can fall back to python-docx.
+        """
+        if isinstance(source, zipfile.ZipFile):
+            zip_context = contextlib.nullcontext(source)
+        else:
+            zip_context = zipfile.ZipFile(source, 'r')
+
+        with zip_context as docx_zip:
+            names = set(docx_zip.namelist())
+            if 'word/document.xml' not in names:
+                return None
+
+            with docx_zip.open('word/document.xml') as document_xml:
+                document_part = self.stream_document_part(document_xml)
+
+            comment_bodies = []
+            if 'word/comments.xml' in names:
+                with docx_zip.open('word/comments.xml') as comments_xml:
+                    comment_bodies = self.stream_comments_part(comments_xml)
+            elif document_part['comment_refs']:
+                # Comments live in a non-standard part - let the relationship method find them
+                return None
+
+        paragraphs = CompactParagraphs.from_runs(document_part['paragraph_runs'])
+        full_text = paragraphs.full_text
+
+        comment_ranges = self.build_comment_ranges(
+            document_part['comment_starts'], document_part['comment_ends'],
+            document_part['text_content'], document_part['range_text']
+        )
+        comments = self.assemble_comments(comment_bodies, comment_ranges, document_part['comment_anchors'])
+
+        if not comments:
+            logger.info("No Word comments in package, trying text pattern fallback...")
+            comments = self.extract_comments_from_text(full_text, document_part['comment_refs'])
+
+        logger.info(f"Streaming extraction: {len(paragraphs)} paragraphs, {len(comments)} comments")
+
+        return {
+            'paragraphs': paragraphs,
+            'comments': comments,
+            'full_text': full_text
+        }
+
+    def stream_document_part(self, xml_stream):
+        """Walk word/document.xml once, collecting body paragraphs and comment markers.
+
+        Body paragraphs and runs follow python-docx semantics (direct w:p children of
+        w:body, direct w:r children of each paragraph). Comment markers and text are
+        collected exactly like walk_document_for_comments.
+
+        Each comment also gets an anchor: its paragraph index and absolute character
+        offsets in the paragraph-joined full_text.
+        """
+        paragraph_runs = []  # Run texts of each body paragraph
+        comment_starts = {}
+        comment_ends = {}
+        comment_anchors = {}
+        comment_refs = 0
+
+        # Offset of the current body paragraph in full_text, and characters seen in it so far
+        doc_offset = 0
+        para_len = 0
+
+        # Text-bearing elements get a slot when they open, so document order matches a
+        # pre-order walk; the text itself is only available once the element closes.
+        text_slots = []
+        open_slots = []
+
+        stack = []
+        body = None
+        para_runs = None
+        run_parts = None
+
+        for event, elem in ET.iterparse(xml_stream, events=('start', 'end')):
+            tag = elem.tag
+
+            if event == 'start':
+                depth = len(stack)
+                # Offsets only count body paragraph runs, so markers anywhere else
+                # (tables, text boxes) get no anchor
+                in_body_paragraph = depth == 3 and para_runs is not None
+                if tag.endswith('commentRangeStart'):
+                    comment_id = elem.get(W_NS + 'id')
+                    if comment_id:
+                        comment_starts[comment_id] = len(text_slots)
+                        if in_body_paragraph:
+                            comment_anchors[comment_id] = {
+                                'offset': doc_offset + para_len,
+                                'end_offset': None,
+                                'paragraph_index': len(paragraph_runs)
+                            }
+                elif tag.endswith('commentRangeEnd'):
+                    comment_id = elem.get(W_NS + 'id')
+                    if comment_id:
+                        comment_ends[comment_id] = len(text_slots)
+                        if comment_id in comment_anchors and in_body_paragraph:
+                            comment_anchors[comment_id]['end_offset'] = doc_offset + para_len
+                elif tag.endswith('t'):
+                    open_slots.append(len(text_slots))
+                    text_slots.append('')
+                elif tag == W_NS + 'commentReference' and elem.get(W_NS + 'id'):
+                    comment_refs += 1
+
+                if depth == 1 and tag == W_NS + 'body' and body is None:
+                    body = elem
+                elif depth == 2 and tag == W_NS + 'p' and stack[-1] == W_NS + 'body':
+                    para_runs = []
+                    para_len = 0
+                elif depth == 3 and tag == W_NS + 'r' and para_runs is not None:
+                    run_parts = []
+
+                stack.append(tag)
+                continue
+
+            stack.pop()
+            depth = len(stack)
+
+            if tag.endswith('t') and not tag.endswith(('commentRangeStart', 'commentRangeEnd')):
+                text_slots[open_slots.pop()] = elem.text or ''
+
+            if depth == 4 and run_parts is not None:
+                # Direct children of a body-level run, mapped like python-docx Run.text
+                if tag == W_NS + 't':
+                    run_parts.append(elem.text or '')
+                    para_len += len(run_parts[-1])
+                elif tag == W_NS + 'tab':
+                    run_parts.append('\t')
+                    para_len += 1
+                elif tag in (W_NS + 'br', W_NS + 'cr'):
+                    run_parts.append('\n')
+                    para_len += 1
+            elif depth == 3 and run_parts is not None and tag == W_NS + 'r':
+                para_runs.append(''.join(run_parts))
+                run_parts = None
+            elif depth == 2 and para_runs is not None and tag == W_NS + 'p':
+                paragraph_runs.append(para_runs)
+                doc_offset += para_len + 1  # '\n' joins paragraphs in full_text
+                para_runs = None
+                para_len = 0
+
+            if depth == 2 and elem is not body and body is not None:
+                # Finished a body-level block - drop it to keep memory flat
+                body.clear()
+
+        # Convert slot indexes to positions among non-empty texts, as the recursive walker records them
+        text_content = []
+        position_of_slot = []
+        range_offset = 0
+        for text in text_slots:
+            position_of_slot.append(len(text_content))
+            if text:
+                text_content.append({
+                    'text': text,
+                    'position': len(text_content),
+                    'offset': range_offset
+                })
+                range_offset += len(text)
+        position_of_slot.append(len(text_content))
+
+        # Markers after the last body paragraph point past the end of full_text
+        full_text_length = max(doc_offset - 1, 0)
+        for anchor in comment_anchors.values():
+            anchor['offset'] = min(anchor['offset'], full_text_length)
+            if anchor['end_offset'] is not None:
+                anchor['end_offset'] = min(max(anchor['end_offset'], anchor['offset']), full_text_length)
+
+        return {
+            'paragraph_runs': paragraph_runs,
+            'comment_starts': {cid: position_of_slot[slot] for cid, slot in comment_starts.items()},
+            'comment_ends': {cid: position_of_slot[slot] for cid, slot in comment_ends.items()},
+            'comment_anchors': comment_anchors,
+            'text_content': text_content,
+            'range_text': ''.join(text_slots),
+            'comment_refs': comment_refs
+        }
+
+    def stream_comments_part(self, xml_stream):
+        """Stream word/comments.xml, returning (id, author, date, text) for each comment"""
+        comment_bodies = []
+
+        for event, elem in ET.iterparse(xml_stream, events=('end',)):
+            if elem.tag != W_NS + 'comment':
+                continue
+            comment_text = ''.join(t.text or '' for t in elem.iter(W_NS + 't'))
+            comment_bodies.append((
+                elem.get(W_NS + 'id'),
+                elem.get(W_NS + 'author', 'Unknown'),
+                elem.get(W_NS + 'date', ''),
+                comment_text
+            ))
+            elem.clear()
+
+        logger.info(f"Found {len(comment_bodies)} comment elements in XML")
+        return comment_bodies
+
+    def build_comment_ranges(self, comment_starts, comment_ends, text_content, range_text=None):
+        """Map each comment id to the text between its range markers"""
+        comment_ranges = {}
+
+        if range_text is None:
+            range_text = ''.join([item['text'] for item in text_content])
+
+        for comment_id in comment_starts:
+            if comment_id in comment_ends:
+                comment_ranges[comment_id] = self.extract_text_range(
+                    text_content, comment_starts[comment_id], comment_ends[comment_id], range_text
+                )
+            else:
+                logger.warning(f"Comment {comment_id} has start but no end marker")
+
+        return comment_ranges
+
+    def assemble_comments(self, comment_bodies, comment_ranges, comment_anchors=None):
+        """Build comment dicts from streamed comment bodies and their text ranges"""
+        comments = []
+        comment_anchors = comment_anchors or {}
+
+        for comment_id, author, date, comment_text in comment_bodies:
+            if not comment_text.strip():
+                continue
+
+            associated_text = comment_ranges.get(comment_id, '').strip()
+            if not associated_text:
+                logger.warning(f"No associated text found for comment ID {comment_id}")
+                associated_text = f"[RANGE NOT FOUND FOR ID {comment_id}]"
+
+            comment = {
+                'id': comment_id or str(len(comments) + 1),
+                'text': comment_text.strip(),
+                'author': author,
+                'date': date,
+                'position': len(comments),
+                'associated_text': associated_text,
+                'context': f"Comment on '{associated_text[:50]}...' by {author}: {comment_text[:100]}..."
+            }
+
+            # Exact location of the commented text in full_text
+            anchor = comment_anchors.get(comment_id)
+            if anchor:
+                comment['anchor_offset'] = anchor['offset']
+                comment['anchor_end_offset'] = anchor['end_offset']
+                comment['paragraph_index'] = anchor['paragraph_index']
+
+            comments.append(comment)
+
+        return comments
 
-class WordDocumentAnalyzer:
-    def __init__(self):
-        self.session_data = {}
-    
-    def extract_document_data(self, file_path):
-        """Extract text and comments from a Word document"""
-        try:
-            doc = Document(file_path)
-            
-            # Extract main document text with paragraph tracking
-            paragraphs = []
-            for i, para in enumerate(doc.paragraphs):
-                paragraphs.append({
-                    'index': i,
-                    'text': para.text,
-                    'runs': [{'text': run.text} for run in para.runs]
-                })
-            
-            # Extract comments (Word comments are stored differently)
-            comments = self.extract_comments(doc)
-            
-            return {
-                'paragraphs': paragraphs,
-                'comments': comments,
-                'full_text': '\n'.join([p['text'] for p in paragraphs])
-            }
-        except Exception as e:
-            logger.error(f"Error extracting document data: {str(e)}")
-            raise e
-    
-    def extract_comments(self, doc):
+    def extract_comments(self, doc, docx_zip=None):
         """Extract comments from Word document using multiple methods"""
         comments = []
         file_path = None
         
-        # Get the file path if available (for ZIP method)
-        if hasattr(doc, '_part') and hasattr(doc._part, 'package') and hasattr(doc._part.package, '_package_reader'):
+        # Get the file path if no open ZIP handle was passed in (for ZIP method)
+        if docx_zip is None and hasattr(doc, '_part') and hasattr(doc._part, 'package') and hasattr(doc._part.package, '_package_reader'):
             try:
                 file_path = doc._part.package._package_reader._file_like_object.name
             except:
@@ -128,7 +1826,7 @@ class WordDocumentAnalyzer:
         
         try:
             logger.info("Attempting to extract comments using ZIP method...")
-            comments = self.extract_comments_zip_method(file_path) if file_path else []
+            comments = self.extract_comments_zip_method(file_path, docx_zip) if (file_path or docx_zip) else []
             
             if not comments:
                 logger.info("ZIP method failed, trying relationship method...")
@@ -146,18 +1844,21 @@ class WordDocumentAnalyzer:
         
         return comments
     
-    def extract_comments_zip_method(self, file_path):
+    def extract_comments_zip_method(self, file_path, docx_zip=None):
         """Extract comments by directly reading the ZIP file and associate with text"""
         comments = []
         
-        if not file_path:
+        if not file_path and docx_zip is None:
             return comments
         
         try:
-            import zipfile
-            import xml.etree.ElementTree as ET
+            # Reuse the caller's open handle rather than reopening the package
+            if docx_zip is not None:
+                zip_context = contextlib.nullcontext(docx_zip)
+            else:
+                zip_context = zipfile.ZipFile(file_path, 'r')
             
-            with zipfile.ZipFile(file_path, 'r') as docx_zip:
+            with zip_context as docx_zip:
                 # First, extract comment-to-text associations from document.xml
                 comment_ranges = self.extract_comment_ranges(docx_zip)
                 
@@ -240,7 +1941,7 @@ class WordDocumentAnalyzer:
             # Walk through document collecting text and comment markers
             self.walk_document_for_comments(root, ns, comment_starts, comment_ends, text_content)
             
-            # Build the full text
+            # Build the full text once; every range is a slice of it
             full_text = ''.join([item['text'] for item in text_content])
             
             # Debug what we found
@@ -257,7 +1958,7 @@ class WordDocumentAnalyzer:
                     logger.info(f"Comment {comment_id}: start={start_pos}, end={end_pos}")
                     
                     # Find the text between start and end positions
-                    associated_text = self.extract_text_range(text_content, start_pos, end_pos)
+                    associated_text = self.extract_text_range(text_content, start_pos, end_pos, full_text)
                     comment_ranges[comment_id] = associated_text
                     
                     logger.info(f"Comment {comment_id} associated with text: '{associated_text[:50]}...'")
@@ -270,49 +1971,68 @@ class WordDocumentAnalyzer:
         return comment_ranges
     
     def walk_document_for_comments(self, element, ns, comment_starts, comment_ends, text_content):
-        """Recursively walk document XML to find comment markers and text"""
-        
-        # Check for comment range start
-        if element.tag.endswith('commentRangeStart'):
-            comment_id = element.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id')
-            if comment_id:
-                comment_starts[comment_id] = len(text_content)
-        
-        # Check for comment range end  
-        elif element.tag.endswith('commentRangeEnd'):
-            comment_id = element.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id')
-            if comment_id:
-                comment_ends[comment_id] = len(text_content)
-        
-        # Check for text content
-        elif element.tag.endswith('t'):
-            text = element.text or ''
-            if text:
-                text_content.append({
-                    'text': text,
-                    'position': len(text_content)
-                })
+        """Walk document XML in document order to find comment markers and text
         
-        # Recursively process child elements
-        for child in element:
-            self.walk_document_for_comments(child, ns, comment_starts, comment_ends, text_content)
+        Element.iter() yields the same pre-order sequence a recursive walk would, but
+        without a Python call per element, so deeply nested tables, text boxes and
+        content controls neither slow it down nor hit the recursion limit.
+        """
+        
+        for node in element.iter():
+            tag = node.tag
+            
+            # Comments and processing instructions have non-string tags
+            if not isinstance(tag, str):
+                continue
+            
+            # Check for comment range start
+            if tag.endswith('commentRangeStart'):
+                comment_id = node.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id')
+                if comment_id:
+                    comment_starts[comment_id] = len(text_content)
+            
+            # Check for comment range end  
+            elif tag.endswith('commentRangeEnd'):
+                comment_id = node.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id')
+                if comment_id:
+                    comment_ends[comment_id] = len(text_content)
+            
+            # Check for text content
+            elif tag.endswith('t'):
+                text = node.text or ''
+                if text:
+                    text_content.append({
+                        'text': text,
+                        'position': len(text_content),
+                        'offset': self.text_content_length(text_content)  # Prefix sum of characters before this text
+                    })
+    
+    def text_content_length(self, text_content):
+        """Total characters in text_content, in O(1) from the last prefix-sum offset"""
+        if not text_content:
+            return 0
+        last = text_content[-1]
+        return last['offset'] + len(last['text'])
     
-    def extract_text_range(self, text_content, start_pos, end_pos):
-        """Extract text between start and end positions"""
+    def extract_text_range(self, text_content, start_pos, end_pos, full_text=None):
+        """Extract text between start and end positions
+        
+        Each text item carries its character offset, so the range is a single slice
+        of the joined text. Pass the joined text when extracting many ranges.
+        """
         
         if start_pos >= end_pos or start_pos >= len(text_content):
             return ""
         
         end_pos = min(end_pos, len(text_content))
         
-        # Join text from start to end position
-        range_text = ''.join([
-            text_content[i]['text'] 
-            for i in range(start_pos, end_pos)
-            if i < len(text_content)
-        ])
+        if full_text is None:
+            full_text = ''.join([item['text'] for item in text_content])
+        
+        start_char = text_content[start_pos]['offset']
+        end_char = text_content[end_pos]['offset'] if end_pos < len(text_content) else len(full_text)
         
-        return range_text.strip()
+        return full_text[start_char:end_char].strip()
     
     def find_associated_text_pattern(self, full_text, comment_match):
         """Find text associated with a comment pattern in fallback mode"""
@@ -400,6 +2120,8 @@ class WordDocumentAnalyzer:
             # Walk through document collecting text and comment markers
             self.walk_document_for_comments(root, ns, comment_starts, comment_ends, text_content)
             
+            full_text = ''.join([item['text'] for item in text_content])
+            
             # Debug what we found
             logger.info(f"Document part analysis: {len(comment_starts)} starts, {len(comment_ends)} ends, {len(text_content)} text elements")
             
@@ -412,7 +2134,7 @@ class WordDocumentAnalyzer:
                     logger.info(f"Comment {comment_id}: positions {start_pos}-{end_pos}")
                     
                     # Find the text between start and end positions
-                    associated_text = self.extract_text_range(text_content, start_pos, end_pos)
+                    associated_text = self.extract_text_range(text_content, start_pos, end_pos, full_text)
                     comment_ranges[comment_id] = associated_text
                     
                     logger.info(f"Comment {comment_id} → '{associated_text[:30]}...'")
@@ -505,7 +2227,18 @@ class WordDocumentAnalyzer:
                 
             # Method 2: Look for text patterns that might be comments
             full_text = '\n'.join([p.text for p in doc.paragraphs])
-            
+            comments = self.extract_comments_from_text(full_text, len(comment_refs))
+        
+        except Exception as e:
+            logger.error(f"Fallback comment extraction failed: {str(e)}")
+        
+        return comments
+    
+    def extract_comments_from_text(self, full_text, comment_ref_count=0):
+        """Find inline comment markers such as [COMMENT: ...] in plain document text"""
+        comments = []
+        
+        try:
             # Check if document contains comment-like patterns and extract associated text
             comment_patterns = [
                 r'\[COMMENT:\s*([^\]]+)\]',  # [COMMENT: text]
@@ -531,7 +2264,7 @@ class WordDocumentAnalyzer:
                     })
             
             # Method 3: Manual comment detection message
-            if not comments and not comment_refs:
+            if not comments and not comment_ref_count:
                 logger.warning("No comments found. The document may not contain Word Review comments.")
                 # Add a helpful message
                 comments.append({
@@ -548,40 +2281,175 @@ class WordDocumentAnalyzer:
         
         return comments
     
-    def analyze_comments_with_ai(self, comments, original_text, revised_text):
-        """Analyze comments using GenAI to determine change scope and validation"""
+    def analyze_comments_with_ai(self, comments, original_text, revised_text, text_views=None):
+        """Analyze comments using GenAI to determine change scope and validation
+        
+        Comments are triaged with pattern matching first, and only those it cannot
+        resolve with AI_TRIAGE_CONFIDENCE are sent to the AI, each as soon as it is
+        triaged; the others are marked ai_call_avoided. Up to AI_CONCURRENCY requests are in flight at once; results
+        keep comment order. With AI_BATCH_SIZE above 1 comments are sent in batches of
+        that size, and any comment a batch leaves unanswered is retried on its own.
+        """
         
-        analysis_results = []
+        # Prioritize AI-powered analysis for intelligent comment understanding
+        ai_client = get_anthropic_client() or get_openai_client()
+        
+        if not ai_client:
+            logger.warning("No AI available - using pattern matching (limited comment understanding)")
+            # Use pattern matching fallback when no AI is available
+            if comments:
+                text_views = self.count_comment_terms(comments, original_text, revised_text, text_views)
+            return [
+                self.fallback_analyze_comment(comment, original_text, revised_text, text_views)
+                for comment in comments
+            ]
         
-        for comment in comments:
-            # Prioritize AI-powered analysis for intelligent comment understanding
-            ai_client = get_anthropic_client() or get_openai_client()
+        # Prompts are built from the session's views; fill them before the workers share them
+        if comments:
+            text_views = self.count_comment_terms(comments, original_text, revised_text, text_views)
+            self.session_alignment(text_views, original_text, revised_text)
+        
+        analysis_results = [None] * len(comments)
+        pattern_results = {}
+        batch_size = max(1, app.config['AI_BATCH_SIZE'])
+        workers = max(1, min(app.config['AI_CONCURRENCY'], len(comments)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
             
-            if ai_client:
-                try:
-                    logger.info(f"Using AI analysis for comment: '{comment['text'][:50]}...'")
-                    result = self.ai_analyze_comment(comment, original_text, revised_text)
-                    analysis_results.append(result)
-                except Exception as e:
-                    logger.error(f"AI analysis failed for comment '{comment['text']}': {str(e)}")
-                    logger.info("Falling back to pattern matching for this comment")
-                    # Fall back to pattern matching only if AI fails
-                    result = self.fallback_analyze_comment(comment, original_text, revised_text)
-                    analysis_results.append(result)
-            else:
-                logger.warning("No AI available - using pattern matching (limited comment understanding)")
-                # Use pattern matching fallback when no AI is available
-                result = self.fallback_analyze_comment(comment, original_text, revised_text)
-                analysis_results.append(result)
+            def submit(batch):
+                if len(batch) > 1:
+                    logger.info(f"Using AI analysis for a batch of {len(batch)} comments")
+                    batch_comments = [comments[i] for i in batch]
+                    future = pool.submit(self.ai_analyze_batch, batch_comments, original_text, revised_text, text_views)
+                else:
+                    logger.info(f"Using AI analysis for comment: '{comments[batch[0]]['text'][:50]}...'")
+                    future = pool.submit(self.ai_analyze_comment, comments[batch[0]], original_text, revised_text, text_views)
+                futures[future] = batch
+            
+            # Comments the pattern engine resolves confidently never reach the AI; the
+            # others are sent as soon as they are triaged, so triage overlaps the requests
+            waiting = []
+            for i, comment in enumerate(comments):
+                result = self.fallback_analyze_comment(comment, original_text, revised_text, text_views)
+                if self.pattern_confidence(result) >= app.config['AI_TRIAGE_CONFIDENCE']:
+                    result['ai_call_avoided'] = True
+                    analysis_results[i] = result
+                    continue
+                pattern_results[i] = result
+                waiting.append(i)
+                if len(waiting) == batch_size:
+                    submit(waiting)
+                    waiting = []
+            if waiting:
+                submit(waiting)
+            logger.info(f"Triage: {len(comments) - len(pattern_results)} comment(s) resolved by pattern matching, "
+                        f"{len(pattern_results)} sent to AI")
+            
+            while futures:
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    batch = futures.pop(future)
+                    if len(batch) == 1:
+                        try:
+                            analysis_results[batch[0]] = future.result()
+                        except Exception as e:
+                            logger.error(f"AI analysis failed for comment '{comments[batch[0]]['text']}': {str(e)}")
+                        continue
+                    
+                    try:
+                        for i, result in zip(batch, future.result()):
+                            analysis_results[i] = result
+                    except Exception as e:
+                        logger.error(f"AI batch analysis failed for {len(batch)} comment(s): {str(e)}")
+                    # Comments left unanswered by their batch get a request each
+                    for i in batch:
+                        if analysis_results[i] is None:
+                            submit([i])
+        
+        # Fall back to the triage result only for the comments whose AI analysis failed
+        failed = [i for i, result in enumerate(analysis_results) if result is None]
+        if failed:
+            logger.info(f"Falling back to pattern matching for {len(failed)} comment(s)")
+            for i in failed:
+                analysis_results[i] = pattern_results[i]
         
         return analysis_results
     
-    def extract_comment_context(self, comment, original_text, revised_text):
-        """Extract focused context around where a comment appears"""
+    def pattern_confidence(self, result):
+        """How far a pattern-matching result can be trusted without the AI, from 0 to 1"""
+        
+        intent = result['intent']
+        if intent.get('type') == 'unknown' or result.get('requires_manual_review'):
+            return 0.0
+        validation = result['validation']
+        confidence = validation.get('confidence', PATTERN_STATUS_CONFIDENCE.get(validation['status'], 0.0))
+        
+        # Only values a rule read from the comment, counted in the documents, settle it;
+        # a count of zero occurrences settles nothing
+        if (not intent.get('explicit') or validation.get('change_type') == 'local_context_validation'
+                or validation.get('details', {}).get('original_count') == 0):
+            confidence = min(confidence, PATTERN_GUESS_CONFIDENCE)
+        return confidence
+    
+    def count_comment_terms(self, comments, original_text, revised_text, text_views=None):
+        """Count the from/to text of every comment with one pass over each document"""
+        
+        terms = set()
+        for comment in comments:
+            intent = self.parse_comment_intent(comment['text'], comment.get('associated_text', '').strip())
+            terms.update(term for term in (intent.get('from_text'), intent.get('to_text')) if isinstance(term, str))
+        
+        if text_views is None:
+            return {
+                'original': NormalizedText(original_text, terms),
+                'revised': NormalizedText(revised_text, terms)
+            }
+        
+        for role in ('original', 'revised'):
+            text_views[role].count_terms(terms)
+        return text_views
+    
+    def session_text_views(self, data):
+        """Normalized views of a session's documents, built on first use.
+
+        session_alignment adds their TextAlignment under 'alignment' on first use.
+        """
+        if 'text_views' not in data:
+            data['text_views'] = {
+                'original': NormalizedText(data['original']['full_text']),
+                'revised': NormalizedText(data['revised']['full_text'])
+            }
+        return data['text_views']
+    
+    def session_alignment(self, text_views, original_text, revised_text):
+        """TextAlignment of the two texts, built on first use and kept in text_views.
+
+        Without session views the alignment is built for the caller alone.
+        """
+        if text_views is None:
+            return TextAlignment(original_text, revised_text)
+        if 'alignment' not in text_views:
+            text_views['alignment'] = TextAlignment(original_text, revised_text)
+        return text_views['alignment']
+    
+    def extract_comment_context(self, comment, original_text, revised_text, alignment=None, context_window=100):
+        """Extract focused context around where a comment appears.
+
+        `alignment` is the session's TextAlignment of the two texts (see
+        session_alignment); without it one is built for this call. The original
+        window spans `context_window` characters each side of the comment.
+        """
         
-        # Priority 1: Use the position of the associated text if available
+        # Priority 1: Use the anchor captured during XML extraction - exact and O(1),
+        # as long as the commented text is actually there
         associated_text = comment.get('associated_text', '').strip()
-        if associated_text:
+        anchor_offset = comment.get('anchor_offset')
+        if anchor_offset is not None and 0 <= anchor_offset <= len(original_text) and self.anchor_matches(
+                original_text, anchor_offset, comment.get('associated_text', '')):
+            comment_position = anchor_offset
+            logger.info(f"Using extracted anchor position {comment_position} for '{associated_text}'")
+        # Priority 2: Use the position of the associated text if available
+        elif associated_text:
             # Find where the associated text actually appears in the document
             associated_position = original_text.find(associated_text)
             if associated_position != -1:
@@ -596,8 +2464,7 @@ class WordDocumentAnalyzer:
             comment_position = comment.get('position', 0)
             logger.info(f"No associated text, using stored position {comment_position}")
         
-        # Use smaller, more focused context window (±100 characters)
-        context_window = 100
+        # Use smaller, more focused context window (±100 characters by default)
         start_pos = max(0, comment_position - context_window)
         end_pos = min(len(original_text), comment_position + context_window)
         
@@ -607,21 +2474,29 @@ class WordDocumentAnalyzer:
         # Try to find sentence boundaries to avoid cutting mid-sentence
         original_context = self.trim_to_sentences(original_context)
         
-        # For revised text, try to find similar context
-        # Look for matching text patterns - use text before the associated text position
-        context_before = original_text[max(0, comment_position - 50):comment_position].strip()
-        
-        # Find corresponding position in revised text
-        revised_context = self.find_corresponding_context(
-            context_before, original_context, revised_text, context_window
-        )
+        # The aligned image of the same window in the revised text, bounded in case
+        # a long passage was inserted
+        if alignment is None:
+            alignment = TextAlignment(original_text, revised_text)
+        revised_position = alignment.map(comment_position)
+        revised_start = max(alignment.map(start_pos), revised_position - 2 * context_window)
+        revised_end = min(alignment.map(end_pos), revised_position + 2 * context_window)
+        revised_context = self.trim_to_sentences(revised_text[revised_start:revised_end].strip())
+        logger.info(f"Aligned position {comment_position} to revised position {revised_position}")
         
         return {
             'original_context': original_context,
             'revised_context': revised_context,
-            'position': comment_position
+            'position': comment_position,
+            'revised_position': revised_position
         }
     
+    @staticmethod
+    def anchor_matches(original_text, anchor_offset, associated_text):
+        """Whether the commented text starts at anchor_offset in original_text"""
+        anchored = original_text[anchor_offset:anchor_offset + len(associated_text)]
+        return NormalizedText.normalize(anchored).strip() == NormalizedText.normalize(associated_text).strip()
+    
     def trim_to_sentences(self, text):
         """Trim text to complete sentences when possible"""
         
@@ -640,82 +2515,108 @@ class WordDocumentAnalyzer:
         
         return text
     
-    def find_corresponding_context(self, context_before, original_context, revised_text, window_size):
-        """Find corresponding context in revised text using improved matching"""
+    def ai_prompt_context(self, comment, original_text, revised_text, text_views=None):
+        """Excerpts of both documents for a comment's AI prompt, and what they left out.
         
-        logger.info(f"Finding context for: before='{context_before[:50]}...', original='{original_context[:50]}...'")
+        Global comments get the occurrences of their terms, counted over the whole
+        documents; other comments the aligned windows around their anchor; comments
+        with neither the changed paragraphs. Returns (text, info) where info records
+        the mode, the prompt characters used and whether anything was truncated.
+        """
         
-        # Strategy 1: Try to find the unchanged text before the comment
-        if len(context_before) > 10:
-            # Try different portions of the before context to handle small changes
-            for length in [30, 20, 15, 10]:
-                if len(context_before) >= length:
-                    search_text = context_before[-length:].strip()  # Use the end of before context
-                    before_match = revised_text.find(search_text)
-                    
-                    if before_match != -1:
-                        logger.info(f"Found before context match at position {before_match}")
-                        # Found the anchor, extract window after it
-                        start_pos = before_match + len(search_text)
-                        end_pos = min(len(revised_text), start_pos + window_size)
-                        revised_context = revised_text[start_pos:end_pos].strip()
-                        
-                        if revised_context:
-                            logger.info(f"Strategy 1 success: '{revised_context[:50]}...'")
-                            return self.trim_to_sentences(revised_context)
-        
-        # Strategy 2: Find common words around the area but skip the potentially changed word
-        words_in_original = original_context.split()
-        if len(words_in_original) >= 3:
-            # Try to find sequences of 2-3 consecutive words that might be unchanged
-            for start_idx in range(len(words_in_original) - 1):
-                for seq_len in [3, 2]:
-                    if start_idx + seq_len <= len(words_in_original):
-                        word_sequence = ' '.join(words_in_original[start_idx:start_idx + seq_len])
-                        match_pos = revised_text.find(word_sequence)
-                        
-                        if match_pos != -1:
-                            logger.info(f"Found word sequence '{word_sequence}' at position {match_pos}")
-                            # Extract context around this match
-                            start_pos = max(0, match_pos - 50)
-                            end_pos = min(len(revised_text), match_pos + window_size)
-                            revised_context = revised_text[start_pos:end_pos].strip()
-                            
-                            if revised_context:
-                                logger.info(f"Strategy 2 success: '{revised_context[:50]}...'")
-                                return self.trim_to_sentences(revised_context)
-        
-        # Strategy 3: Use fuzzy matching with partial words
-        # Look for individual words from the original context, but be more flexible
-        significant_words = [w for w in original_context.split() if len(w) > 3 and w.lower() not in ['the', 'and', 'was', 'were', 'that', 'this', 'with', 'from']]
-        
-        for word in significant_words:
-            match_pos = revised_text.find(word)
-            if match_pos != -1:
-                logger.info(f"Found significant word '{word}' at position {match_pos}")
-                start_pos = max(0, match_pos - 75)  # Wider context
-                end_pos = min(len(revised_text), match_pos + window_size)
-                revised_context = revised_text[start_pos:end_pos].strip()
-                
-                if revised_context:
-                    logger.info(f"Strategy 3 success: '{revised_context[:50]}...'")
-                    return self.trim_to_sentences(revised_context)
+        if text_views is None:
+            text_views = {'original': NormalizedText(original_text), 'revised': NormalizedText(revised_text)}
         
-        # Strategy 4: Position-based fallback using relative document position
-        # If all else fails, use the approximate same position in the document
-        original_length = len(context_before) + len(original_context)
-        total_original_length = original_length * 3  # Rough estimate
-        relative_position = len(context_before) / max(total_original_length, 1)
+        associated_text = comment.get('associated_text', '').strip()
+        user_scope = comment.get('user_scope', 'auto')
+        intent = self.parse_comment_intent(comment['text'], associated_text)
+        scope = user_scope if user_scope in ('global', 'local') else intent.get('scope')
+        
+        terms = {}
+        for term in (associated_text, intent.get('from_text'), intent.get('to_text')):
+            if isinstance(term, str) and term.strip():
+                terms.setdefault(NormalizedText.normalize(term.strip()), term.strip())
+        
+        if scope == 'global' and terms:
+            text, truncated = self.occurrence_excerpts(list(terms.values())[:AI_PROMPT_TERMS], text_views)
+            mode = 'occurrences'
+        elif associated_text or comment.get('anchor_offset') is not None:
+            context = self.extract_comment_context(
+                comment, original_text, revised_text,
+                self.session_alignment(text_views, original_text, revised_text), AI_CONTEXT_WINDOW
+            )
+            text = (f"ORIGINAL DOCUMENT (excerpt around the commented text; the document is "
+                    f"{len(original_text)} characters):\n{context['original_context']}\n\n"
+                    f"REVISED DOCUMENT (the corresponding excerpt; the document is "
+                    f"{len(revised_text)} characters):\n{context['revised_context']}")
+            truncated = (len(context['original_context']) < len(original_text.strip())
+                         or len(context['revised_context']) < len(revised_text.strip()))
+            mode = 'local_window'
+        else:
+            text, truncated = self.changed_paragraph_excerpts(original_text, revised_text)
+            mode = 'changed_paragraphs'
         
-        approx_position = int(len(revised_text) * relative_position)
-        start_pos = max(0, approx_position - window_size // 2)
-        end_pos = min(len(revised_text), approx_position + window_size // 2)
+        if truncated:
+            text += "\n\nNOTE: These are excerpts. Parts of the documents were left out as marked above."
+        return text, {'mode': mode, 'characters': len(text), 'truncated': truncated}
+    
+    def occurrence_excerpts(self, terms, text_views):
+        """Counts and snippets of each term in both documents, from the session index"""
+        
+        sections = []
+        truncated = False
+        for term in terms:
+            lines = [f'"{term}": {text_views["original"].count(term)} occurrence(s) in the ORIGINAL DOCUMENT, '
+                     f'{text_views["revised"].count(term)} in the REVISED DOCUMENT (whole words, any case)']
+            for role in ('original', 'revised'):
+                view = text_views[role]
+                locations = view.locate(term)
+                for index in locations[:AI_OCCURRENCE_SNIPPETS]:
+                    start = view.raw_offset(index)
+                    end = view.raw_offset(index + len(NormalizedText.normalize(term)) - 1) + 1
+                    # Clipped to the occurrence's own paragraph
+                    paragraph_end = view.raw.find('\n', end)
+                    snippet = view.raw[
+                        max(view.raw.rfind('\n', 0, start) + 1, start - AI_SNIPPET_RADIUS):
+                        min(len(view.raw) if paragraph_end == -1 else paragraph_end, end + AI_SNIPPET_RADIUS)
+                    ]
+                    lines.append(f"  {role.upper()}: ...{WHITESPACE_PATTERN.sub(' ', snippet)}...")
+                if len(locations) > AI_OCCURRENCE_SNIPPETS:
+                    lines.append(f"  ({len(locations) - AI_OCCURRENCE_SNIPPETS} more in the {role} document not shown)")
+                    truncated = True
+            sections.append('\n'.join(lines))
+        
+        return "OCCURRENCES (counted over the full documents):\n" + '\n\n'.join(sections), truncated
+    
+    def changed_paragraph_excerpts(self, original_text, revised_text):
+        """The paragraphs that differ between the documents, up to AI_CHANGED_PARAGRAPHS changes"""
+        
+        original_lines = original_text.split('\n')
+        revised_lines = revised_text.split('\n')
+        changes = [
+            opcode for opcode in PatienceMatcher(None, original_lines, revised_lines).get_opcodes()
+            if opcode[0] != 'equal'
+        ]
         
-        logger.info(f"Strategy 4 fallback: using position {approx_position} (relative: {relative_position:.2f})")
-        return self.trim_to_sentences(revised_text[start_pos:end_pos])
+        limit = 2 * AI_CONTEXT_WINDOW
+        truncated = len(changes) > AI_CHANGED_PARAGRAPHS
+        lines = []
+        for _, i1, i2, j1, j2 in changes[:AI_CHANGED_PARAGRAPHS]:
+            for prefix, paragraphs, first in (('-', original_lines[i1:i2], i1), ('+', revised_lines[j1:j2], j1)):
+                for number, paragraph in enumerate(paragraphs, first + 1):
+                    if len(paragraph) > limit:
+                        paragraph = paragraph[:limit] + ' [...]'
+                        truncated = True
+                    lines.append(f"{prefix} paragraph {number}: {paragraph}")
+        if len(changes) > AI_CHANGED_PARAGRAPHS:
+            lines.append(f"({len(changes) - AI_CHANGED_PARAGRAPHS} more changed passages not shown)")
+        
+        text = ("CHANGED PARAGRAPHS (- original, + revised; all other paragraphs are identical):\n"
+                + ('\n'.join(lines) if lines else '(none - the documents are identical)'))
+        return text, truncated
     
-    def ai_analyze_comment(self, comment, original_text, revised_text):
-        """Use GenAI to analyze a comment and validate changes with full context understanding"""
+    def ai_analyze_comment(self, comment, original_text, revised_text, text_views=None):
+        """Use GenAI to analyze a comment and validate changes with focused document context"""
         
         comment_text = comment['text']
         associated_text = comment.get('associated_text', '').strip()
@@ -727,13 +2628,21 @@ class WordDocumentAnalyzer:
         logger.info(f"User specified scope: {user_scope}")
         
         # Create a comprehensive AI prompt that understands context and scope
-        scope_description = {
-            'global': 'a GLOBAL change (should affect all instances throughout the document)',
-            'local': 'a LOCAL change (should affect only the specific instance being commented on)',
-            'auto': 'automatically determined scope based on the comment intent'
-        }
+        scope_description = AI_SCOPE_DESCRIPTIONS
+        
+        # Excerpts of the documents rather than the documents themselves
+        document_context, prompt_context = self.ai_prompt_context(comment, original_text, revised_text, text_views)
+        logger.info(f"Prompt context: {prompt_context}")
+        
+        # The same comment over the same excerpts gets the answer it got before
+        cache_key = ai_response_cache.key_for(
+            self.ai_model(), 'comment', AI_PROMPT_VERSION, comment_text, associated_text, user_scope, document_context
+        )
+        ai_analysis = ai_response_cache.get(cache_key)
+        if ai_analysis is not None:
+            logger.info("Using cached AI analysis")
+            return self.ai_result(comment, ai_analysis, prompt_context, cached=True)
         
-        # Provide the full document text for comprehensive analysis
         if associated_text:
             prompt = f"""You are an expert document reviewer analyzing Word document comments and their implementation.
 
@@ -743,11 +2652,7 @@ SCOPE: This is {scope_description[user_scope]}
 
 TASK: Evaluate whether the comment "{comment_text}" applied to the text/word/phrase "{associated_text}" was correctly implemented in the revised document.
 
-ORIGINAL DOCUMENT:
-{original_text}
-
-REVISED DOCUMENT:
-{revised_text}
+{document_context}
 
 ANALYSIS APPROACH:
 1. UNDERSTAND THE COMMENT: What specific change does "{comment_text}" request when applied to "{associated_text}"?
@@ -766,7 +2671,7 @@ ANALYSIS APPROACH:
    - If user specified scope as "{user_scope}", respect that preference
 
 4. VERIFY IMPLEMENTATION:
-   - Search the revised document for evidence of the requested change
+   - Search the revised excerpts for evidence of the requested change
    - For style comments: Check if the style rule was applied (e.g., contractions expanded)
    - Count instances before/after if relevant for global changes
    - Check if the change was applied correctly
@@ -792,7 +2697,7 @@ RESPONSE FORMAT (JSON):
     "requires_manual_review": false
 }}
 
-Analyze the full document context to make this determination."""
+Base the determination on the excerpts above; any counts given cover the full documents."""
         
         else:
             # Handle case when associated text is missing
@@ -801,17 +2706,13 @@ Analyze the full document context to make this determination."""
 COMMENT: "{comment_text}"
 SCOPE: This is {scope_description[user_scope]}
 
-ORIGINAL DOCUMENT:
-{original_text}
-
-REVISED DOCUMENT:
-{revised_text}
+{document_context}
 
 TASK: Determine what change the comment "{comment_text}" requests and verify if it was applied correctly.
 
 ANALYSIS INSTRUCTIONS:
 1. The specific text this comment refers to was not identified
-2. Compare the original and revised documents to find relevant changes
+2. Compare the original and revised excerpts to find relevant changes
 3. Determine which change best matches the comment intent
 4. Verify if the change aligns with the requested scope
 
@@ -830,69 +2731,225 @@ RESPONSE FORMAT (JSON):
 Note: Associated text was not available, so analysis is based on document comparison."""
 
         try:
-            anthropic_client = get_anthropic_client()
-            openai_client = get_openai_client()
-            
-            if anthropic_client:
-                response = anthropic_client.messages.create(
-                    model="claude-3-haiku-20240307",  # Fast and cost-effective
-                    max_tokens=500,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                ai_response = response.content[0].text
-            elif openai_client:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",  # Fast and cost-effective
-                    max_tokens=500,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                ai_response = response.choices[0].message.content
-            else:
-                raise Exception("No AI client available")
-            
-            # Parse the JSON response
-            try:
-                ai_analysis = json.loads(ai_response)
-            except json.JSONDecodeError:
-                # Try to extract JSON from response if it's wrapped in other text
-                import re
-                json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                if json_match:
-                    ai_analysis = json.loads(json_match.group(0))
-                else:
-                    raise Exception("Could not parse AI response as JSON")
-            
-            # Convert AI analysis to our format
-            intent = self.validate_intent_structure({
-                'type': ai_analysis.get('comment_type', 'ai_determined'),
-                'scope': ai_analysis.get('scope_applied', user_scope),
-                'from_text': ai_analysis.get('expected_from', associated_text),
-                'to_text': ai_analysis.get('expected_to'),
-                'raw_comment': comment_text,
-                'ai_interpretation': ai_analysis.get('interpretation', '')
-            })
-            
-            validation = {
-                'status': ai_analysis.get('status', 'unclear'),
-                'message': ai_analysis.get('evidence', 'AI analysis completed'),
-                'confidence': ai_analysis.get('confidence', 0.8),
-                'interpretation': ai_analysis.get('interpretation', ''),
-                'evidence': ai_analysis.get('evidence', '')
-            }
-            
-            return {
-                'comment': comment,
-                'intent': intent,
-                'validation': validation,
-                'requires_manual_review': ai_analysis.get('requires_manual_review', False),
-                'ai_powered': True
-            }
+            ai_analysis = self.parse_ai_json(self.ai_complete(prompt, AI_TOKENS_PER_COMMENT), r'\{.*\}')
+            if not isinstance(ai_analysis, dict):
+                raise Exception("AI response is not a JSON object")
+            ai_response_cache.put(cache_key, ai_analysis)
+            return self.ai_result(comment, ai_analysis, prompt_context)
             
         except Exception as e:
             logger.error(f"AI analysis error: {str(e)}")
             raise e
     
-    def fallback_analyze_comment(self, comment, original_text, revised_text):
+    def ai_analyze_batch(self, comments, original_text, revised_text, text_views=None):
+        """Analyze several comments with one AI request.
+
+        The instructions are sent once and each comment brings its own excerpts; a
+        comment whose excerpts match an earlier one in the batch refers back to them.
+        Comments with a cached answer are left out of the request.
+        Returns a result per comment, None where the response had no usable entry.
+        """
+        
+        # Answers are matched up by comment id, or by position when ids repeat
+        keys = [str(comment.get('id', n)) for n, comment in enumerate(comments, 1)]
+        if len(set(keys)) < len(keys):
+            keys = [str(n) for n in range(1, len(comments) + 1)]
+        
+        model = self.ai_model()
+        results = [None] * len(comments)
+        pending = []
+        sections = []
+        contexts_sent = {}
+        for n, (key, comment) in enumerate(zip(keys, comments)):
+            associated_text = comment.get('associated_text', '').strip()
+            user_scope = comment.get('user_scope', 'auto')
+            document_context, prompt_context = self.ai_prompt_context(comment, original_text, revised_text, text_views)
+            
+            cache_key = ai_response_cache.key_for(
+                model, 'batch', AI_PROMPT_VERSION, comment['text'], associated_text, user_scope, document_context
+            )
+            ai_analysis = ai_response_cache.get(cache_key)
+            if ai_analysis is not None:
+                results[n] = self.ai_result(comment, ai_analysis, prompt_context, cached=True)
+                continue
+            pending.append((n, cache_key, prompt_context))
+            
+            if document_context in contexts_sent:
+                document_context = f"DOCUMENT EXCERPTS: the same as for comment {contexts_sent[document_context]}"
+            else:
+                contexts_sent[document_context] = key
+            
+            commented_on = f'"{associated_text}"' if associated_text else \
+                "not identified; compare the excerpts to find the change that matches the comment"
+            sections.append(f"""=== COMMENT ID: "{key}" ===
+COMMENT: "{comment['text']}"
+COMMENTED ON: {commented_on}
+SCOPE: This is {AI_SCOPE_DESCRIPTIONS[user_scope]}
+
+{document_context}""")
+        
+        if not pending:
+            logger.info(f"Batch of {len(comments)} comment(s): all answers cached")
+            return results
+        
+        comment_sections = '\n\n'.join(sections)
+        prompt = f"""You are an expert document reviewer analyzing Word document comments and their implementation.
+
+TASK: For each of the {len(pending)} comments below, evaluate whether the change it requests for the text it was made on was correctly implemented in the revised document. Each comment comes with its own excerpts of the original and revised documents.
+
+ANALYSIS APPROACH (for every comment):
+1. UNDERSTAND THE COMMENT: What specific change does the comment request when applied to the text it was made on?
+
+2. IDENTIFY COMMENT TYPE:
+   - DIRECT REPLACEMENT: "Change X to Y", "should be Z"
+   - STYLE/GRAMMAR: "Don't use contractions", "Make more formal", "Fix grammar"
+   - CONTENT CHANGE: "Make this more exciting", "Add detail"
+   - CORRECTION: "spelling mistake", "wrong word"
+   - DELETION: "remove this", "delete"
+
+3. DETERMINE EXPECTED CHANGE:
+   - For STYLE comments: Identify what needs to be changed to follow the style rule
+   - For DIRECT comments: What should the commented text become?
+   - Should this be applied globally (all instances) or locally (just this instance)? Respect the given scope
+
+4. VERIFY IMPLEMENTATION:
+   - Search the comment's revised excerpts for evidence of the requested change
+   - Count instances before/after if relevant for global changes
+   - When the commented text was not identified, find the change in the excerpts that best matches the comment and set requires_manual_review to true
+
+EXAMPLES OF COMMENT INTERPRETATION:
+- "Change her name to Claire" on "Diane" = Change "Diane" to "Claire"
+- "Don't use contractions" on "can't" = Change "can't" to "cannot", "it's" to "it is", etc.
+- "spelling mistake" on "recieve" = Change "recieve" to "receive"
+- "delete this" on "very very" = Remove the duplicate "very"
+
+{comment_sections}
+
+RESPONSE FORMAT (a JSON array with one object per comment, in any order):
+[
+    {{
+        "comment_id": "The COMMENT ID the object answers",
+        "interpretation": "What change does the comment request?",
+        "comment_type": "direct_replacement|style_grammar|content_change|correction|deletion",
+        "expected_from": "What text should be changed",
+        "expected_to": "What it should become (or null if deletion)",
+        "scope_applied": "global|local",
+        "status": "correctly_applied|partially_applied|not_applied|unclear",
+        "evidence": "What evidence shows the change was/wasn't applied?",
+        "confidence": 0.95,
+        "requires_manual_review": false
+    }}
+]
+
+Base each determination on that comment's excerpts; any counts given cover the full documents."""
+        
+        ai_response = self.ai_complete(prompt, AI_TOKENS_PER_COMMENT * len(pending))
+        
+        # A malformed or cut-off array still yields the entries that are complete
+        try:
+            entries = self.parse_ai_json(ai_response, r'\[.*\]')
+        except Exception:
+            entries = None
+        if isinstance(entries, dict):
+            entries = [dict(value, comment_id=key) for key, value in entries.items() if isinstance(value, dict)]
+        if not isinstance(entries, list):
+            entries = []
+            for match in re.finditer(r'\{[^{}]*\}', ai_response):
+                try:
+                    entries.append(json.loads(match.group(0)))
+                except json.JSONDecodeError:
+                    continue
+        
+        answers = {}
+        for entry in entries:
+            if isinstance(entry, dict) and entry.get('status'):
+                answers.setdefault(str(entry.get('comment_id')), entry)
+        
+        answered = 0
+        for n, cache_key, prompt_context in pending:
+            if keys[n] in answers:
+                ai_response_cache.put(cache_key, answers[keys[n]])
+                results[n] = self.ai_result(comments[n], answers[keys[n]], prompt_context)
+                answered += 1
+        logger.info(f"Batch of {len(comments)} comment(s): {len(comments) - len(pending)} cached, {answered} answered")
+        return results
+    
+    def ai_complete(self, prompt, max_tokens):
+        """Send a prompt to the configured AI provider and return the response text"""
+        
+        anthropic_client = get_anthropic_client()
+        openai_client = get_openai_client()
+        
+        if anthropic_client:
+            response = anthropic_client.messages.create(
+                model=ANTHROPIC_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response.content[0].text
+        elif openai_client:
+            response = openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response.choices[0].message.content
+        else:
+            raise Exception("No AI client available")
+    
+    def ai_model(self):
+        """Model that ai_complete would send a request to, or None without a client"""
+        if get_anthropic_client():
+            return ANTHROPIC_MODEL
+        if get_openai_client():
+            return OPENAI_MODEL
+        return None
+    
+    @staticmethod
+    def parse_ai_json(ai_response, pattern):
+        """Parse an AI response as JSON, or the part of it matching pattern"""
+        
+        try:
+            return json.loads(ai_response)
+        except json.JSONDecodeError:
+            # Try to extract JSON from response if it's wrapped in other text
+            json_match = re.search(pattern, ai_response, re.DOTALL)
+            if json_match:
+                return json.loads(json_match.group(0))
+            raise Exception("Could not parse AI response as JSON")
+    
+    def ai_result(self, comment, ai_analysis, prompt_context, cached=False):
+        """Convert a parsed AI analysis of a comment to our result format"""
+        
+        associated_text = comment.get('associated_text', '').strip()
+        intent = self.validate_intent_structure({
+            'type': ai_analysis.get('comment_type', 'ai_determined'),
+            'scope': ai_analysis.get('scope_applied', comment.get('user_scope', 'auto')),
+            'from_text': ai_analysis.get('expected_from', associated_text),
+            'to_text': ai_analysis.get('expected_to'),
+            'raw_comment': comment['text'],
+            'ai_interpretation': ai_analysis.get('interpretation', '')
+        })
+        
+        validation = {
+            'status': ai_analysis.get('status', 'unclear'),
+            'message': ai_analysis.get('evidence', 'AI analysis completed'),
+            'confidence': ai_analysis.get('confidence', 0.8),
+            'interpretation': ai_analysis.get('interpretation', ''),
+            'evidence': ai_analysis.get('evidence', '')
+        }
+        
+        return {
+            'comment': comment,
+            'intent': intent,
+            'validation': validation,
+            'requires_manual_review': ai_analysis.get('requires_manual_review', False),
+            'ai_powered': True,
+            'ai_cached': cached,
+            'prompt_context': prompt_context
+        }
+    
+    def fallback_analyze_comment(self, comment, original_text, revised_text, text_views=None):
         """Fallback to pattern matching when AI is not available"""
         
         # Parse the comment to understand the intended change
@@ -911,11 +2968,11 @@ Note: Associated text was not available, so analysis is based on document compar
                     change_intent['type'] = 'replace_local'
                 # For local scope, always try enhanced local validation if we have associated text
                 if associated_text:
-                    return self.validate_local_change_with_context(comment, change_intent, original_text, revised_text)
+                    return self.validate_local_change_with_context(comment, change_intent, original_text, revised_text, text_views)
         
         # Check if the change was applied correctly
         validation_result = self.validate_change_application(
-            change_intent, original_text, revised_text
+            change_intent, original_text, revised_text, text_views
         )
         
         return {
@@ -938,6 +2995,9 @@ Note: Associated text was not available, so analysis is based on document compar
         for field in optional_fields:
             if field not in intent:
                 intent[field] = ''
+        
+        # Whether a rule read concrete from/to values from the comment itself
+        intent.setdefault('explicit', False)
                 
         return intent
     
@@ -950,33 +3010,12 @@ Note: Associated text was not available, so analysis is based on document compar
             return None
         
         # Skip if comment has explicit change patterns that should be handled normally
-        explicit_patterns = [
-            r'change\s+all\s+',
-            r'replace\s+all\s+',
-            r'find\s+and\s+replace',
-            r'everywhere',
-            r'globally',
-            r'throughout'
-        ]
-        
-        for pattern in explicit_patterns:
-            if re.search(pattern, comment_text, re.IGNORECASE):
-                return None
+        if CONTEXT_EXPLICIT_PATTERN.search(comment_text):
+            return None
         
         # Pattern: "His/Her/Their name should be X" when commenting on a specific name
-        name_patterns = [
-            r'(?:his|her|their|the)\s+name\s+should\s+be\s+["\']?([^"\']+)["\']?',
-            r'(?:his|her|their|the)\s+name\s+is\s+["\']?([^"\']+)["\']?',
-            r'name\s+should\s+be\s+["\']?([^"\']+)["\']?',
-            r'should\s+be\s+named\s+["\']?([^"\']+)["\']?',
-            r'call\s+(?:him|her|them|it)\s+["\']?([^"\']+)["\']?',
-            r'(?:the\s+)?(?:character|boy|girl|person)\s+should\s+be\s+called\s+["\']?([^"\']+)["\']?',  # "the character should be called Mike"
-            r'change\s+(?:his|her|their|the)\s+name\s+to\s+["\']?([^"\']+)["\']?',  # "change her name to Diane"
-            r'rename\s+(?:him|her|them|it)\s+to\s+["\']?([^"\']+)["\']?',  # "rename her to Diane"
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, comment_text, re.IGNORECASE)
+        for pattern in CONTEXT_NAME_PATTERNS:
+            match = pattern.search(comment_text)
             if match:
                 target_name = match.group(1)
                 # Use associated text as the source name
@@ -989,12 +3028,8 @@ Note: Associated text was not available, so analysis is based on document compar
                 })
         
         # Pattern: "should be X" when commenting on a specific word (context-dependent)
-        should_be_patterns = [
-            r'should\s+be\s+["\']?([^"\']+)["\']?$',  # Simple "should be X" at end
-        ]
-        
-        for pattern in should_be_patterns:
-            match = re.search(pattern, comment_text, re.IGNORECASE)
+        for pattern in CONTEXT_SHOULD_BE_PATTERNS:
+            match = pattern.search(comment_text)
             if match:
                 target_text = match.group(1)
                 # Use associated text as the source
@@ -1007,14 +3042,8 @@ Note: Associated text was not available, so analysis is based on document compar
                 })
         
         # Pattern: Comments that are just instructions without explicit source/target
-        instruction_patterns = [
-            r'make\s+(?:it|this)\s+["\']?([^"\']+)["\']?',
-            r'change\s+(?:it|this)\s+to\s+["\']?([^"\']+)["\']?',
-            r'use\s+["\']?([^"\']+)["\']?\s+instead',
-        ]
-        
-        for pattern in instruction_patterns:
-            match = re.search(pattern, comment_text, re.IGNORECASE)
+        for pattern in CONTEXT_INSTRUCTION_PATTERNS:
+            match = pattern.search(comment_text)
             if match:
                 target_text = match.group(1)
                 return self.validate_intent_structure({
@@ -1026,13 +3055,10 @@ Note: Associated text was not available, so analysis is based on document compar
                 })
         
         # Pattern: Single word/phrase comments (likely replacement targets)
-        single_word_patterns = [
-            r'^["\']?([^"\']+)["\']?$',  # Just a single word/phrase (replacement target)
-        ]
-        
-        for pattern in single_word_patterns:
-            match = re.search(pattern, comment_text.strip(), re.IGNORECASE)
-            if match and len(comment_text.strip().split()) <= 3:  # Max 3 words for single replacement
+        stripped_comment = comment_text.strip()
+        for pattern in CONTEXT_SINGLE_WORD_PATTERNS:
+            match = pattern.search(stripped_comment)
+            if match and len(stripped_comment.split()) <= 3:  # Max 3 words for single replacement
                 target_text = match.group(1)
                 return self.validate_intent_structure({
                     'type': 'replace_local',
@@ -1047,31 +3073,12 @@ Note: Associated text was not available, so analysis is based on document compar
     def parse_style_comment(self, comment_text, associated_text=None):
         """Parse style and grammar comments that don't require specific text replacement"""
         
-        # Style/grammar patterns that the fallback system can recognize
-        style_patterns = [
-            # Contraction-related
-            (r"don'?t\s+use\s+contractions?", 'style_grammar', 'Remove contractions from text'),
-            (r"expand\s+contractions?", 'style_grammar', 'Expand contractions to full forms'),
-            (r"no\s+contractions?", 'style_grammar', 'Remove contractions from text'),
-            
-            # Formality
-            (r"make\s+(?:this\s+)?more\s+formal", 'style_grammar', 'Make text more formal'),
-            (r"use\s+formal\s+language", 'style_grammar', 'Use formal language'),
-            (r"less\s+casual", 'style_grammar', 'Make text less casual'),
-            
-            # Grammar
-            (r"fix\s+grammar", 'style_grammar', 'Fix grammatical errors'),
-            (r"correct\s+grammar", 'style_grammar', 'Correct grammatical errors'),
-            (r"grammar\s+(?:error|mistake)", 'style_grammar', 'Fix grammatical errors'),
-            
-            # General style
-            (r"improve\s+(?:the\s+)?writing", 'style_grammar', 'Improve writing style'),
-            (r"make\s+(?:this\s+)?clearer", 'style_grammar', 'Make text clearer'),
-            (r"simplify\s+(?:this\s+)?(?:text|language)?", 'style_grammar', 'Simplify the language'),
-        ]
+        # One search rules out the common case of a non-style comment
+        if not STYLE_PREFILTER.search(comment_text):
+            return None
         
-        for pattern, change_type, description in style_patterns:
-            if re.search(pattern, comment_text, re.IGNORECASE):
+        for pattern, change_type, description in STYLE_RULES:
+            if pattern.search(comment_text):
                 
                 # For contraction-related comments, try to find specific contractions
                 if 'contraction' in description.lower() and associated_text:
@@ -1086,7 +3093,8 @@ Note: Associated text was not available, so analysis is based on document compar
                             'to_text': to_text,
                             'scope': 'local',
                             'raw_comment': comment_text,
-                            'style_description': description
+                            'style_description': description,
+                            'explicit': True
                         })
                     else:
                         # No contractions found - should already be correct
@@ -1114,124 +3122,52 @@ Note: Associated text was not available, so analysis is based on document compar
     def parse_comment_intent(self, comment_text, associated_text=None):
         """Parse comment text to understand the intended change"""
         
+        deadline = time.perf_counter() + COMMENT_PARSE_TIME_BUDGET
+        
         # First, check for style/grammar patterns that don't rely on specific text changes
         style_patterns = self.parse_style_comment(comment_text, associated_text)
         if style_patterns:
             return style_patterns
         
+        # Pasted-in paragraphs are not edit instructions the rules can parse
+        if len(comment_text) > COMMENT_PARSE_MAX_LENGTH:
+            logger.info(f"Comment of {len(comment_text)} characters sent to manual review")
+            return self.validate_intent_structure({
+                'type': 'unknown',
+                'from_text': None,
+                'to_text': None,
+                'scope': 'manual_review',
+                'raw_comment': comment_text
+            })
+        
         # Then, check for context-aware patterns that should use associated text
         if associated_text and associated_text.strip():
             context_patterns = self.parse_context_aware_comment(comment_text, associated_text.strip())
             if context_patterns:
                 return context_patterns
         
-        # Enhanced patterns for common change instructions
-        patterns = {
-            # Global replacements
-            'replace_global': [
-                r'change\s+(?:all\s+)?(?:instances?\s+of\s+)?["\']?([^"\']+)["\']?\s+(?:to|with)\s+["\']?([^"\']+)["\']?\s+(?:everywhere|globally|throughout)',
-                r'replace\s+(?:all\s+)?["\']?([^"\']+)["\']?\s+(?:with|to)\s+["\']?([^"\']+)["\']?\s+(?:everywhere|globally|throughout)',
-                r'(?:find|search)\s+and\s+replace\s+["\']?([^"\']+)["\']?\s+(?:with|to)\s+["\']?([^"\']+)["\']?',
-                r'change\s+all\s+["\']?([^"\']+)["\']?\s+(?:to|with)\s+["\']?([^"\']+)["\']?',  # "change all X to Y" (with or without quotes)
-                
-                # Character/name change patterns (global by nature)
-                r'change\s+(?:the\s+)?(?:character|boy|girl|person|name)\'?s?\s+name\s+to\s+["\']?([^"\']+)["\']?',  # "change the boy's name to Jimmy"
-                r'rename\s+(?:the\s+)?(?:character|boy|girl|person)\s+to\s+["\']?([^"\']+)["\']?',  # "rename the character to Jimmy"
-            ],
-            
-            # Local replacements - most common patterns
-            'replace_local': [
-                r'change\s+(?:this\s+)?["\']?([^"\']+)["\']?\s+(?:to|with)\s+["\']?([^"\']+)["\']?(?:\s+here|\s+in\s+this\s+(?:sentence|paragraph))?',
-                r'replace\s+["\']?([^"\']+)["\']?\s+(?:with|to)\s+["\']?([^"\']+)["\']?',
-                r'correct\s+(?:spelling|word)?:?\s*["\']?([^"\']+)["\']?\s+(?:to|should\s+be|->|→)\s+["\']?([^"\']+)["\']?',
-                r'correct\s+(?:spelling|word)?:?\s+([^\s]+)',  # "correct spelling: receive"
-                r'should\s+be\s+["\']?([^"\']+)["\']?\s+(?:not|instead\s+of)\s+["\']?([^"\']+)["\']?',
-                r'(?:fix|correct):\s*["\']?([^"\']+)["\']?\s+(?:to|->|→)\s+["\']?([^"\']+)["\']?',
-                r'(?:typo|error):\s*["\']?([^"\']+)["\']?\s+(?:should\s+be|->|→)\s+["\']?([^"\']+)["\']?',
-                # REMOVED the problematic generic pattern that was causing "His name should be Eli" to be parsed incorrectly
-                r'["\']?([^"\']+)["\']?\s*[?]\s*["\']?([^"\']+)["\']?',  # "real? reel"
-                r'use\s+["\']?([^"\']+)["\']?\s+(?:instead\s+of|not)\s+["\']?([^"\']+)["\']?'
-            ],
-            
-            # Deletions
-            'delete': [
-                r'(?:delete|remove)\s+["\']?([^"\']+)["\']?',
-                r'(?:cut|omit)\s+["\']?([^"\']+)["\']?',
-                r'take\s+out\s+["\']?([^"\']+)["\']?'
-            ],
-            
-            # Additions
-            'add': [
-                r'(?:add|insert)\s+["\']?([^"\']+)["\']?(?:\s+(?:before|after)\s+["\']?([^"\']+)["\']?)?',
-                r'include\s+["\']?([^"\']+)["\']?',
-                r'put\s+["\']?([^"\']+)["\']?\s+(?:before|after)\s+["\']?([^"\']+)["\']?'
-            ],
-            
-            # Formatting
-            'format': [
-                r'(?:format|style)\s+["\']?([^"\']+)["\']?\s+as\s+([^"\']+)',
-                r'make\s+["\']?([^"\']+)["\']?\s+(?:bold|italic|underlined?)'
-            ]
-        }
+        comment_lower = comment_text.lower()
         
-        # Try each pattern type
-        for change_type, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                match = re.search(pattern, comment_text, re.IGNORECASE)
-                if match:
-                    groups = match.groups()
-                    
-                    # Handle different group arrangements
-                    if change_type == 'replace_global':
-                        # Special handling for character name changes
-                        if 'change' in comment_text.lower() and ('name' in comment_text.lower() or 'character' in comment_text.lower() or 'boy' in comment_text.lower() or 'girl' in comment_text.lower()):
-                            # For "change the boy's name to Jimmy", we only get the target name
-                            if len(groups) == 1:
-                                # Use associated text as the source if available
-                                from_text = associated_text.strip() if associated_text else None
-                                to_text = groups[0]
-                            else:
-                                from_text = groups[0] if len(groups) >= 1 and groups[0] else (associated_text.strip() if associated_text else None)
-                                to_text = groups[1] if len(groups) >= 2 and groups[1] else groups[0]
-                        else:
-                            # Regular global replacement patterns
-                            from_text = groups[0] if len(groups) >= 1 and groups[0] else None
-                            to_text = groups[1] if len(groups) >= 2 and groups[1] else None
-                    elif change_type == 'replace_local' and len(groups) >= 1:
-                        # Handle single-word patterns like "correct spelling: receive"
-                        if len(groups) == 1 and 'correct' in comment_text.lower():
-                            from_text = None  # Will be inferred
-                            to_text = groups[0]
-                        elif len(groups) >= 2:
-                            # For replacements, sometimes the order might be reversed
-                            from_text = groups[0] if groups[0] else None
-                            to_text = groups[1] if groups[1] else None
-                            
-                            # Check specific patterns that have reversed order
-                            if 'should be' in comment_text.lower() and ('not' in comment_text.lower() or 'instead of' in comment_text.lower()):
-                                # "should be reel not real" means real->reel, so swap
-                                from_text, to_text = to_text, from_text
-                            elif 'use' in comment_text.lower() and 'instead of' in comment_text.lower():
-                                # "use great instead of good" means good->great, so swap
-                                from_text, to_text = to_text, from_text
-                        else:
-                            from_text = groups[0] if groups[0] else None
-                            to_text = None
-                    else:
-                        from_text = groups[0] if len(groups) >= 1 and groups[0] else None
-                        to_text = groups[1] if len(groups) >= 2 and groups[1] else None
-                    
-                    return self.validate_intent_structure({
-                        'type': change_type,
-                        'from_text': from_text,
-                        'to_text': to_text,
-                        'scope': 'global' if 'global' in change_type else 'local',
-                        'raw_comment': comment_text
-                    })
+        # Try each rule in priority order
+        for change_type, pattern, required in INTENT_RULES:
+            if required and not any(word in comment_lower for word in required):
+                continue
+            if time.perf_counter() > deadline:
+                logger.warning(f"Comment parsing exceeded {COMMENT_PARSE_TIME_BUDGET}s, sending to manual review: {comment_text[:80]!r}")
+                return self.validate_intent_structure({
+                    'type': 'unknown',
+                    'from_text': None,
+                    'to_text': None,
+                    'scope': 'manual_review',
+                    'raw_comment': comment_text
+                })
+            match = pattern.search(comment_text)
+            if match:
+                return self.build_rule_intent(change_type, match.groups(), comment_text, comment_lower, associated_text)
         
         # Smart fallback: try to extract two words that might be a replacement
         # Look for patterns like "word1 word2" where it might mean word1->word2
-        simple_replacement = re.search(r'^["\']?(\w+)["\']?\s*[?/→-]+\s*["\']?(\w+)["\']?$', comment_text.strip(), re.IGNORECASE)
+        simple_replacement = SIMPLE_REPLACEMENT_PATTERN.search(comment_text.strip())
         if simple_replacement:
             return self.validate_intent_structure({
                 'type': 'replace_local',
@@ -1242,7 +3178,7 @@ Note: Associated text was not available, so analysis is based on document compar
             })
         
         # Another fallback: single word might be a replacement target
-        single_word = re.search(r'^["\']?(\w+)["\']?$', comment_text.strip(), re.IGNORECASE)
+        single_word = SINGLE_WORD_PATTERN.search(comment_text.strip())
         if single_word:
             return self.validate_intent_structure({
                 'type': 'replace_local',
@@ -1261,8 +3197,65 @@ Note: Associated text was not available, so analysis is based on document compar
             'raw_comment': comment_text
         })
     
-    def validate_change_application(self, intent, original_text, revised_text):
-        """Validate if the intended change was correctly applied"""
+    def build_rule_intent(self, change_type, groups, comment_text, comment_lower, associated_text):
+        """Turn the groups of a matched INTENT_RULES pattern into an intent"""
+        
+        # Handle different group arrangements
+        if change_type == 'replace_global':
+            # Special handling for character name changes
+            if 'change' in comment_lower and ('name' in comment_lower or 'character' in comment_lower or 'boy' in comment_lower or 'girl' in comment_lower):
+                # For "change the boy's name to Jimmy", we only get the target name
+                if len(groups) == 1:
+                    # Use associated text as the source if available
+                    from_text = associated_text.strip() if associated_text else None
+                    to_text = groups[0]
+                else:
+                    from_text = groups[0] if len(groups) >= 1 and groups[0] else (associated_text.strip() if associated_text else None)
+                    to_text = groups[1] if len(groups) >= 2 and groups[1] else groups[0]
+            else:
+                # Regular global replacement patterns
+                from_text = groups[0] if len(groups) >= 1 and groups[0] else None
+                to_text = groups[1] if len(groups) >= 2 and groups[1] else None
+        elif change_type == 'replace_local' and len(groups) >= 1:
+            # Handle single-word patterns like "correct spelling: receive"
+            if len(groups) == 1 and 'correct' in comment_lower:
+                from_text = None  # Will be inferred
+                to_text = groups[0]
+            elif len(groups) >= 2:
+                # For replacements, sometimes the order might be reversed
+                from_text = groups[0] if groups[0] else None
+                to_text = groups[1] if groups[1] else None
+                
+                # Check specific patterns that have reversed order
+                if 'should be' in comment_lower and ('not' in comment_lower or 'instead of' in comment_lower):
+                    # "should be reel not real" means real->reel, so swap
+                    from_text, to_text = to_text, from_text
+                elif 'use' in comment_lower and 'instead of' in comment_lower:
+                    # "use great instead of good" means good->great, so swap
+                    from_text, to_text = to_text, from_text
+            else:
+                from_text = groups[0] if groups[0] else None
+                to_text = None
+        else:
+            from_text = groups[0] if len(groups) >= 1 and groups[0] else None
+            to_text = groups[1] if len(groups) >= 2 and groups[1] else None
+        
+        return self.validate_intent_structure({
+            'type': change_type,
+            'from_text': from_text,
+            'to_text': to_text,
+            'scope': 'global' if 'global' in change_type else 'local',
+            'raw_comment': comment_text,
+            # Both values come from the comment, not from the associated text
+            'explicit': change_type.startswith('replace') and len(groups) >= 2 and bool(groups[0] and groups[1])
+        })
+    
+    def validate_change_application(self, intent, original_text, revised_text, text_views=None):
+        """Validate if the intended change was correctly applied.
+
+        `text_views` holds the session's NormalizedText for 'original' and 'revised';
+        without it both documents are normalized for this intent alone.
+        """
         
         if intent['type'] == 'unknown':
             return {
@@ -1271,6 +3264,12 @@ Note: Associated text was not available, so analysis is based on document compar
                 'ambiguous': True
             }
         
+        if text_views is None and intent['type'] in ['replace_global', 'replace_local', 'style_grammar']:
+            text_views = {
+                'original': NormalizedText(original_text, [intent.get('from_text'), intent.get('to_text')]),
+                'revised': NormalizedText(revised_text, [intent.get('from_text'), intent.get('to_text')])
+            }
+        
         if intent['type'] in ['replace_global', 'replace_local']:
             from_text = intent.get('from_text')
             to_text = intent.get('to_text')
@@ -1279,7 +3278,7 @@ Note: Associated text was not available, so analysis is based on document compar
             if not from_text and to_text:
                 # Try to find what word was likely replaced by looking for context
                 # This is a smart guess based on similar words or context
-                return self.validate_single_word_replacement(to_text, original_text, revised_text, intent)
+                return self.validate_single_word_replacement(to_text, original_text, revised_text, intent, text_views)
             
             if not from_text or not to_text:
                 return {
@@ -1287,10 +3286,10 @@ Note: Associated text was not available, so analysis is based on document compar
                     'message': 'Could not parse replacement text from comment'
                 }
             
-            # Count occurrences in original and revised text
-            original_count = original_text.lower().count(from_text.lower())
-            revised_from_count = revised_text.lower().count(from_text.lower())
-            revised_to_count = revised_text.lower().count(to_text.lower())
+            # Count whole-word occurrences in original and revised text
+            original_count = text_views['original'].count(from_text)
+            revised_from_count = text_views['revised'].count(from_text)
+            revised_to_count = text_views['revised'].count(to_text)
             
             if intent['scope'] == 'global':
                 # For global changes, all instances should be replaced
@@ -1339,7 +3338,7 @@ Note: Associated text was not available, so analysis is based on document compar
         
         elif intent['type'] == 'style_grammar':
             # Handle style and grammar validation
-            return self.validate_style_change(intent, original_text, revised_text)
+            return self.validate_style_change(intent, original_text, revised_text, text_views)
         
         # Handle other change types (delete, add, format)
         return {
@@ -1347,12 +3346,18 @@ Note: Associated text was not available, so analysis is based on document compar
             'message': f'Change type "{intent["type"]}" requires manual review'
         }
     
-    def validate_single_word_replacement(self, target_word, original_text, revised_text, intent):
+    def validate_single_word_replacement(self, target_word, original_text, revised_text, intent, text_views=None):
         """Validate replacement when only the target word is known"""
         
+        if text_views is None:
+            text_views = {
+                'original': NormalizedText(original_text, [target_word]),
+                'revised': NormalizedText(revised_text, [target_word])
+            }
+        
         # Count target word in both documents
-        original_target_count = original_text.lower().count(target_word.lower())
-        revised_target_count = revised_text.lower().count(target_word.lower())
+        original_target_count = text_views['original'].count(target_word)
+        revised_target_count = text_views['revised'].count(target_word)
         
         # If target word appears more in revised than original, likely a replacement occurred
         if revised_target_count > original_target_count:
@@ -1360,6 +3365,7 @@ Note: Associated text was not available, so analysis is based on document compar
             return {
                 'status': 'correctly_applied',
                 'message': f'"{target_word}" was added {added_count} time(s) - likely replacing another word',
+                'confidence': 0.6,
                 'details': {
                     'original_count': original_target_count,
                     'revised_count': revised_target_count,
@@ -1368,29 +3374,23 @@ Note: Associated text was not available, so analysis is based on document compar
             }
         
         # If target word appears same or less, try to find similar words that might have been replaced
-        import difflib
-        
-        # Split texts into words and find differences
-        original_words = set(re.findall(r'\b\w+\b', original_text.lower()))
-        revised_words = set(re.findall(r'\b\w+\b', revised_text.lower()))
         
-        # Words that disappeared from original
-        removed_words = original_words - revised_words
+        # Words that disappeared from original, indexed for fuzzy lookup
+        removed_vocabulary = text_views['original'].removed_vocabulary(text_views['revised'])
         
         # Find the most similar word to target_word among removed words
-        if removed_words:
-            closest_matches = difflib.get_close_matches(target_word.lower(), removed_words, n=1, cutoff=0.6)
-            if closest_matches:
-                likely_original = closest_matches[0]
-                
+        if removed_vocabulary.size:
+            likely_original = removed_vocabulary.close_match(NormalizedText.normalize(target_word), cutoff=0.6)
+            if likely_original:
                 # Count occurrences to validate
-                original_count = original_text.lower().count(likely_original)
-                revised_original_count = revised_text.lower().count(likely_original)
+                original_count = text_views['original'].count(likely_original)
+                revised_original_count = text_views['revised'].count(likely_original)
                 
                 if revised_original_count < original_count and revised_target_count >= original_target_count:
                     return {
                         'status': 'correctly_applied',
                         'message': f'Likely replaced "{likely_original}" with "{target_word}"',
+                        'confidence': 0.6,
                         'details': {
                             'inferred_from': likely_original,
                             'original_count': original_count,
@@ -1411,15 +3411,18 @@ Note: Associated text was not available, so analysis is based on document compar
                 'message': f'Cannot determine if "{target_word}" replacement was correctly applied'
             }
     
-    def validate_style_change(self, intent, original_text, revised_text):
+    def validate_style_change(self, intent, original_text, revised_text, text_views=None):
         """Validate style and grammar changes"""
         
         style_description = intent.get('style_description', '').lower()
         
         if 'contraction' in style_description:
-            # Check for contraction removal/expansion
-            original_contractions = self.find_contractions(original_text)
-            revised_contractions = self.find_contractions(revised_text)
+            if text_views is None:
+                text_views = {'original': NormalizedText(original_text), 'revised': NormalizedText(revised_text)}
+            
+            # Check for contraction removal/expansion, found once per session
+            original_contractions = text_views['original'].contractions
+            revised_contractions = text_views['revised'].contractions
             
             if not original_contractions:
                 return {
@@ -1469,14 +3472,12 @@ Note: Associated text was not available, so analysis is based on document compar
     
     def find_contractions(self, text):
         """Find contractions in text"""
-        contraction_patterns = [
-            r"\b\w+'\w+\b",  # General pattern: word'word
-            r"\b(?:can't|won't|shouldn't|couldn't|wouldn't|isn't|aren't|wasn't|weren't|don't|doesn't|didn't|haven't|hasn't|hadn't|I'm|you're|he's|she's|it's|we're|they're|I'll|you'll|he'll|she'll|it'll|we'll|they'll|I'd|you'd|he'd|she'd|it'd|we'd|they'd|I've|you've|he's|she's|it's|we've|they've)\b"
-        ]
+        # Word types apostrophes as ’
+        text = text.translate(QUOTE_TRANSLATION)
         
         contractions = []
-        for pattern in contraction_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in CONTRACTION_PATTERNS:
+            matches = pattern.findall(text)
             contractions.extend(matches)
         
         # Remove duplicates and return
@@ -1547,43 +3548,54 @@ Note: Associated text was not available, so analysis is based on document compar
         # Fallback: return original if we can't expand it
         return contraction
     
-    def generate_comparison_report(self, session_id):
-        """Generate a comprehensive comparison report"""
+    def generate_comparison_report(self, session_id, intraline=None):
+        """Generate a comprehensive comparison report
+        
+        intraline picks how changes inside a paragraph are marked: 'word' (the
+        default) or 'char'. Reports are kept in the session, one per intraline
+        mode, until analyze_documents stores new analysis results.
+        """
         
         if session_id not in self.session_data:
             return None
         
         data = self.session_data[session_id]
+        if intraline not in SideBySideDiff.intraline_modes:
+            intraline = 'word'
+        
+        reports = data.setdefault('reports', {})
+        if intraline in reports:
+            return reports[intraline]
         
         # Create side-by-side diff
         original_lines = data['original']['full_text'].split('\n')
         revised_lines = data['revised']['full_text'].split('\n')
         
-        differ = difflib.unified_diff(
-            original_lines, revised_lines,
-            fromfile='Original Document',
-            tofile='Revised Document',
-            lineterm=''
-        )
-        
         # Generate enhanced diff that highlights missed instances
         diff_html = self.generate_enhanced_diff(
-            original_lines, revised_lines, data.get('analysis_results', [])
+            original_lines, revised_lines, data.get('analysis_results', []),
+            self.session_text_views(data)['revised'], intraline
         )
         
-        return {
+        reports[intraline] = {
             'session_id': session_id,
             'analysis_results': data.get('analysis_results', []),
             'diff_html': diff_html,
+            'intraline': intraline,
             'summary': self.generate_summary(data.get('analysis_results', [])),
             'timestamp': data.get('timestamp')
         }
+        return reports[intraline]
     
-    def generate_enhanced_diff(self, original_lines, revised_lines, analysis_results):
+    def generate_enhanced_diff(self, original_lines, revised_lines, analysis_results, revised_view=None,
+                               intraline=None, engine=None):
         """Generate enhanced HTML diff that highlights missed instances for incomplete global changes"""
         
         # Find incomplete global changes that need highlighting
         missed_instances = []
+        annotations = {}
+        if revised_view is None:
+            revised_view = NormalizedText('\n'.join(revised_lines))
         
         for result in analysis_results:
             validation = result.get('validation', {})
@@ -1595,54 +3607,55 @@ Note: Associated text was not available, so analysis is based on document compar
                 from_text = intent.get('from_text')
                 
                 if from_text:
-                    # Find all lines in revised text that still contain the old text
-                    for line_num, line in enumerate(revised_lines):
-                        if from_text.lower() in line.lower():
-                            missed_instances.append({
-                                'line_num': line_num,
-                                'text': from_text,
-                                'comment': result.get('comment', {}).get('text', ''),
-                                'line_content': line
-                            })
+                    # Spans of the revised lines that still contain the old text, from the index
+                    comment = result.get('comment', {}).get('text', '')
+                    title = f"Missed instance for comment: {comment}"
+                    length = len(NormalizedText.normalize(from_text))
+                    lines = {}
+                    for index in revised_view.locate(from_text):
+                        line_num, start, end = revised_view.line_span(index, length)
+                        lines.setdefault(line_num, []).append((start, end))
+                        annotations.setdefault(line_num, []).append((start, end, title))
+                    for line_num, spans in sorted(lines.items()):
+                        missed_instances.append({
+                            'line_num': line_num,
+                            'text': from_text,
+                            'comment': comment,
+                            'spans': spans,
+                            'line_content': revised_lines[line_num]
+                        })
         
-        # Generate the base HTML diff
-        differ = difflib.HtmlDiff()
-        html_diff = differ.make_table(
-            original_lines, revised_lines,
-            fromdesc='Original Document',
-            todesc='Revised Document',
-            context=True,
-            numlines=3
+        # Generate the base HTML diff; the table marks the missed spans as it formats each line
+        rendered_lines = set()
+        html_diff = self.generate_html_diff(
+            original_lines, revised_lines, engine, intraline, annotations, rendered_lines
         )
         
-        # Enhance the HTML to highlight missed instances
+        # Add the highlighting styles and a summary of the missed instances the table
+        # shows; the difflib engine's context table drops unchanged lines far from changes
+        missed_instances = [missed for missed in missed_instances if missed['line_num'] in rendered_lines]
         if missed_instances:
             html_diff = self.enhance_diff_with_missed_instances(html_diff, missed_instances)
         
         return html_diff
     
     def enhance_diff_with_missed_instances(self, html_diff, missed_instances):
-        """Add highlighting and annotations for missed instances in the HTML diff"""
+        """Add the missed-instance styles and summary box to a diff table that marks them"""
         
         # Add custom CSS for missed instance highlighting
         enhanced_css = """
         <style>
         .missed-instance {
-            background-color: #ffebee !important;
-            border: 2px solid #f44336 !important;
-            position: relative;
+            background-color: #ffcdd2;
+            font-weight: bold;
+            border: 1px solid #f44336;
+            padding: 1px 3px;
+            border-radius: 2px;
         }
         .missed-instance::after {
-            content: '⚠️ MISSED INSTANCE';
-            position: absolute;
-            right: 5px;
-            top: 2px;
-            background: #f44336;
-            color: white;
-            padding: 2px 6px;
+            content: '⚠️';
             font-size: 10px;
-            border-radius: 3px;
-            font-weight: bold;
+            margin-left: 2px;
         }
         .missed-instance-tooltip {
             background: #fff3cd;
@@ -1658,33 +3671,13 @@ Note: Associated text was not available, so analysis is based on document compar
         # Insert CSS at the beginning of the HTML
         html_diff = enhanced_css + html_diff
         
-        # For each missed instance, enhance the corresponding line in the HTML
-        for missed in missed_instances:
-            line_num = missed['line_num']
-            text_to_highlight = missed['text']
-            comment = missed['comment']
-            
-            # Create a unique identifier for this line
-            line_pattern = f'<td class="diff_chg"[^>]*>([^<]*{re.escape(text_to_highlight)}[^<]*)</td>'
-            
-            def replace_line(match):
-                content = match.group(1)
-                # Highlight the specific missed text
-                highlighted_content = content.replace(
-                    text_to_highlight,
-                    f'<span style="background-color: #ffcdd2; font-weight: bold; border: 1px solid #f44336; padding: 1px 3px; border-radius: 2px;">{text_to_highlight}</span>'
-                )
-                return f'<td class="diff_chg missed-instance" title="Missed instance for comment: {comment}">{highlighted_content}</td>'
-            
-            html_diff = re.sub(line_pattern, replace_line, html_diff, flags=re.IGNORECASE)
-        
         # Add a summary box at the top
         if missed_instances:
             summary_box = f"""
             <div class="missed-instance-tooltip">
                 <strong>⚠️ Incomplete Global Changes Detected:</strong><br>
                 Found {len(missed_instances)} missed instance(s) that should have been changed globally.
-                Look for highlighted lines with ⚠️ MISSED INSTANCE markers.
+                Look for highlighted text with ⚠️ markers.
             </div>
             """
             # Insert after the first table tag
@@ -1692,10 +3685,28 @@ Note: Associated text was not available, so analysis is based on document compar
         
         return html_diff
 
-    def generate_html_diff(self, original_lines, revised_lines):
-        """Generate HTML side-by-side diff"""
+    def generate_html_diff(self, original_lines, revised_lines, engine=None, intraline=None, annotations=None,
+                           rendered_lines=None):
+        """Generate HTML side-by-side diff
+        
+        annotations maps revised line indexes to (start, end, title) spans to highlight.
+        The indexes of the annotated lines the table shows are added to rendered_lines.
+        """
+        
+        engine = engine or app.config['DIFF_ENGINE']
+        if engine not in DIFF_ENGINES:
+            logger.warning(f"Unknown diff engine '{engine}', using 'patience'")
+            engine = 'patience'
         
-        differ = difflib.HtmlDiff()
+        if engine == 'difflib':
+            # HtmlDiff always marks changes character by character
+            differ = DIFF_ENGINES[engine](annotations=annotations)
+        else:
+            intraline = intraline or 'word'
+            if intraline not in SideBySideDiff.intraline_modes:
+                logger.warning(f"Unknown intraline mode '{intraline}', using 'word'")
+                intraline = 'word'
+            differ = DIFF_ENGINES[engine](intraline=intraline, annotations=annotations)
         html_diff = differ.make_table(
             original_lines, revised_lines,
             fromdesc='Original Document',
@@ -1703,22 +3714,27 @@ Note: Associated text was not available, so analysis is based on document compar
             context=True,
             numlines=3
         )
+        if rendered_lines is not None:
+            rendered_lines.update(differ.rendered_lines)
         
         return html_diff
     
-    def validate_local_change_with_context(self, comment, change_intent, original_text, revised_text):
+    def validate_local_change_with_context(self, comment, change_intent, original_text, revised_text, text_views=None):
         """Enhanced validation for local changes using context analysis"""
         
         associated_text = comment.get('associated_text', '').strip()
         comment_text = comment['text'].lower()
         
-        # Extract context around the associated text
-        context = self.extract_comment_context(comment, original_text, revised_text)
-        original_context = context['original_context'].lower()
-        revised_context = context['revised_context'].lower()
+        # Extract context around the associated text; comparisons use the same
+        # normalization as the session's text views
+        alignment = self.session_alignment(text_views, original_text, revised_text)
+        context = self.extract_comment_context(comment, original_text, revised_text, alignment)
+        original_context = NormalizedText.normalize(context['original_context'])
+        revised_context = NormalizedText.normalize(context['revised_context'])
+        normalized_associated = NormalizedText.normalize(associated_text)
         
         # Check if the associated text appears in original context
-        if associated_text.lower() not in original_context:
+        if normalized_associated not in original_context:
             return {
                 'comment': comment,
                 'intent': change_intent,
@@ -1741,7 +3757,7 @@ Note: Associated text was not available, so analysis is based on document compar
                 'occured': 'occurred', 'definately': 'definitely', 'thier': 'their',
                 'reel': 'real', 'absolutly': 'absolutely'
             }
-            expected_change = spelling_fixes.get(associated_text.lower())
+            expected_change = spelling_fixes.get(normalized_associated)
         
         # Word replacements
         elif any(word in comment_text for word in ['change', 'replace', 'use', 'different']):
@@ -1756,7 +3772,7 @@ Note: Associated text was not available, so analysis is based on document compar
                 
         # Check if expected change appears in revised context
         if expected_change:
-            if expected_change.lower() in revised_context:
+            if NormalizedText.normalize(expected_change) in revised_context:
                 status = 'correctly_applied'
                 message = f'Successfully changed "{associated_text}" to "{expected_change}" in the local context'
             else:
@@ -1764,7 +3780,8 @@ Note: Associated text was not available, so analysis is based on document compar
                 message = f'Expected change from "{associated_text}" to "{expected_change}" was not found in revised context'
         else:
             # Check if the associated text was removed or changed somehow
-            if associated_text.lower() not in revised_context:
+            # The aligned windows cover the same text, so a changed occurrence leaves fewer behind
+            if revised_context.count(normalized_associated) < original_context.count(normalized_associated):
                 status = 'correctly_applied'
                 message = f'Associated text "{associated_text}" was modified/removed from the context as requested'
             else:
@@ -1793,6 +3810,7 @@ Note: Associated text was not available, so analysis is based on document compar
         partially_applied = sum(1 for r in analysis_results if r['validation']['status'] == 'partially_applied')
         not_applied = sum(1 for r in analysis_results if r['validation']['status'] == 'not_applied')
         manual_review = sum(1 for r in analysis_results if r.get('requires_manual_review', False))
+        ai_calls_avoided = sum(1 for r in analysis_results if r.get('ai_call_avoided', False))
         
         return {
             'total_comments': total_comments,
@@ -1800,12 +3818,17 @@ Note: Associated text was not available, so analysis is based on document compar
             'partially_applied': partially_applied,
             'not_applied': not_applied,
             'manual_review_required': manual_review,
+            'ai_calls_avoided': ai_calls_avoided,
             'success_rate': (correctly_applied / total_comments * 100) if total_comments > 0 else 0
         }
 
 # Global analyzer instance
 analyzer = WordDocumentAnalyzer()
 
+def extract_document_bytes(docx_bytes):
+    """Extraction process pool entry point: extract one document from its raw bytes"""
+    return WordDocumentAnalyzer().extract_document_data(io.BytesIO(docx_bytes))
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -1842,7 +3865,9 @@ def api_status():
             'configured': bool(OPENAI_API_KEY),
             'ready': bool(OPENAI_API_KEY and OPENAI_AVAILABLE)
         },
-        'primary_ai': 'anthropic' if (ANTHROPIC_API_KEY and ANTHROPIC_AVAILABLE) else ('openai' if (OPENAI_API_KEY and OPENAI_AVAILABLE) else 'none')
+        'primary_ai': 'anthropic' if (ANTHROPIC_API_KEY and ANTHROPIC_AVAILABLE) else ('openai' if (OPENAI_API_KEY and OPENAI_AVAILABLE) else 'none'),
+        'extraction_cache': extraction_cache.stats(),
+        'ai_cache': ai_response_cache.stats()
     }
     return jsonify(status)
 
@@ -1976,19 +4001,26 @@ def upload_files():
         # Generate session ID
         session_id = str(uuid.uuid4())
         
-        # Save files
         original_filename = secure_filename(f"{session_id}_original_{original_file.filename}")
         revised_filename = secure_filename(f"{session_id}_revised_{revised_file.filename}")
         
-        original_path = os.path.join(app.config['UPLOAD_FOLDER'], original_filename)
-        revised_path = os.path.join(app.config['UPLOAD_FOLDER'], revised_filename)
+        # Process uploads in memory - nothing is written to disk
+        original_bytes = original_file.read()
+        revised_bytes = revised_file.read()
         
-        original_file.save(original_path)
-        revised_file.save(revised_path)
+        # Extract both documents concurrently, skipping documents we have already seen
+        extracted, errors = analyzer.extract_documents_parallel({
+            'original': original_bytes,
+            'revised': revised_bytes
+        })
+        if errors:
+            return jsonify({
+                'error': '; '.join(f'Could not read {name} document: {message}' for name, message in errors.items()),
+                'document_errors': errors
+            }), 400
         
-        # Extract document data
-        original_data = analyzer.extract_document_data(original_path)
-        revised_data = analyzer.extract_document_data(revised_path)
+        original_data = extracted['original']
+        revised_data = extracted['revised']
         
         # Store session data
         analyzer.session_data[session_id] = {
@@ -2071,14 +4103,20 @@ def analyze_documents(session_id):
         analysis_results = analyzer.analyze_comments_with_ai(
             comments_with_scope,
             data['original']['full_text'],
-            data['revised']['full_text']
+            data['revised']['full_text'],
+            analyzer.session_text_views(data)
         )
         
-        # Store analysis results
+        # Store analysis results; reports rendered from the previous results are stale
         data['analysis_results'] = analysis_results
+        # A running total over every analysis of the session
+        data['ai_calls_avoided'] = data.get('ai_calls_avoided', 0) + sum(
+            1 for result in analysis_results if result.get('ai_call_avoided', False)
+        )
+        data.pop('reports', None)
         
         # Generate comparison report
-        report = analyzer.generate_comparison_report(session_id)
+        report = analyzer.generate_comparison_report(session_id, form_data.get('intraline'))
         
         return jsonify({
             'success': True,
@@ -2094,7 +4132,7 @@ def analyze_documents(session_id):
 @app.route('/report/<session_id>')
 def view_report(session_id):
     """View comparison report"""
-    report = analyzer.generate_comparison_report(session_id)
+    report = analyzer.generate_comparison_report(session_id, request.args.get('intraline'))
     if not report:
         return "Report not found", 404
     
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark parse_comment_intent over a corpus of real comment texts
+
+Compares the precompiled rule tables against searching the same rules as pattern
+strings on every call, which is what the parser used to do.
+"""
+
+import re
+import sys
+import os
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+# Comments collected from editor feedback on real manuscripts
+COMMENT_CORPUS = [
+    ("change all Johnny to Jimmy", "Johnny"),
+    ("His name should be Eli", "Elias"),
+    ("Change her name to Diane", "Sarah"),
+    ("rename him to Alex", "Tom"),
+    ("should be sunny", "rainy"),
+    ("change this to happy", "sad"),
+    ("Jimmy", "Johnny"),
+    ("receive", "recieve"),
+    ("Claire", "Diane"),
+    ("Spelling mistake", "absolutly"),
+    ("Don't use contractions", "It's late and we can't stay."),
+    ("Make this more formal", "Hey guys, what's up"),
+    ("fix grammar", "Him and me went"),
+    ("correct spelling: real -> reel", None),
+    ("real? reel", None),
+    ("should be reel not real", None),
+    ("use great instead of good", None),
+    ("change all \"ABC\" to \"Acme Corp\"", "ABC"),
+    ("delete \"obviously\"", "obviously"),
+    ("add \"very\" before \"soon\"", "soon"),
+    ("Remove duplicate word", "very very"),
+    ("Not sure about this wording - can we soften it?", "You must"),
+    ("This paragraph drags. Consider cutting the middle section.", "The long middle section"),
+    ("Use \"excellent\" instead", "good"),
+]
+
+
+def legacy_search(comment_text):
+    """Search every rule as a pattern string, as the parser did before precompiling"""
+    for rule, _, _ in app.STYLE_RULES:
+        if re.search(rule.pattern, comment_text, re.IGNORECASE):
+            return rule.pattern
+    for pattern in (app.CONTEXT_NAME_PATTERNS + app.CONTEXT_SHOULD_BE_PATTERNS
+                    + app.CONTEXT_INSTRUCTION_PATTERNS):
+        if re.search(pattern.pattern, comment_text, re.IGNORECASE):
+            return pattern.pattern
+    for _, pattern, _ in app.INTENT_RULES:
+        if re.search(pattern.pattern, comment_text, re.IGNORECASE):
+            return pattern.pattern
+    return None
+
+
+def compiled_search(comment_text):
+    """The same search through the precompiled tables"""
+    if app.STYLE_PREFILTER.search(comment_text):
+        for rule, _, _ in app.STYLE_RULES:
+            if rule.search(comment_text):
+                return rule.pattern
+    for pattern in (app.CONTEXT_NAME_PATTERNS + app.CONTEXT_SHOULD_BE_PATTERNS
+                    + app.CONTEXT_INSTRUCTION_PATTERNS):
+        if pattern.search(comment_text):
+            return pattern.pattern
+    for _, pattern, _ in app.INTENT_RULES:
+        if pattern.search(comment_text):
+            return pattern.pattern
+    return None
+
+
+def time_per_comment(func, iterations=200):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for comment_text, associated_text in COMMENT_CORPUS:
+            func(comment_text, associated_text)
+    return (time.perf_counter() - start) / (iterations * len(COMMENT_CORPUS)) * 1e6
+
+
+def benchmark():
+    analyzer = WordDocumentAnalyzer()
+
+    print("⏱️  Comment Intent Parsing Benchmark")
+    print("=" * 50)
+    print(f"Corpus: {len(COMMENT_CORPUS)} comments")
+
+    legacy_us = time_per_comment(lambda text, _: legacy_search(text))
+    compiled_us = time_per_comment(lambda text, _: compiled_search(text))
+    full_us = time_per_comment(analyzer.parse_comment_intent)
+
+    print(f"Rule search, pattern strings:  {legacy_us:8.2f} µs/comment")
+    print(f"Rule search, precompiled:      {compiled_us:8.2f} µs/comment ({legacy_us / compiled_us:.1f}x)")
+    print(f"parse_comment_intent (full):   {full_us:8.2f} µs/comment")
+
+
+if __name__ == "__main__":
+    benchmark()
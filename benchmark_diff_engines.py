@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark generate_html_diff with each diff engine across document sizes
+
+Documents are paragraphs of manuscript-length prose with one in fifty paragraphs
+edited and a rewritten section of consecutive paragraphs, which is where
+difflib.HtmlDiff compares every changed line with every other.
+"""
+
+import sys
+import os
+import random
+import difflib
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+WORDS = ('the', 'house', 'stood', 'at', 'end', 'of', 'a', 'long', 'road', 'and', 'nobody',
+         'remembered', 'who', 'built', 'it', 'rain', 'fell', 'on', 'quiet', 'garden', 'she', 'walked')
+
+
+def manuscript(rng, paragraph_count, words_per_paragraph=90):
+    return [f'{i}. ' + ' '.join(rng.choice(WORDS) for _ in range(words_per_paragraph)) + '.'
+            for i in range(paragraph_count)]
+
+
+def revision(rng, paragraphs):
+    revised = list(paragraphs)
+    for i in range(0, len(revised), 50):
+        words = revised[i].split(' ')
+        words[rng.randrange(len(words))] = 'edited'
+        revised[i] = ' '.join(words)
+
+    # Rewrite a section of consecutive paragraphs
+    section = len(revised) // 2
+    for i in range(section, min(section + max(len(revised) // 100, 2), len(revised))):
+        revised[i] = revised[i].replace('the', 'a').replace('road', 'street')
+    return revised
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def html_diff_table(original_lines, revised_lines):
+    """generate_html_diff as it was before condensing and the pluggable engines"""
+    return difflib.HtmlDiff().make_table(
+        original_lines, revised_lines,
+        fromdesc='Original Document',
+        todesc='Revised Document',
+        context=True,
+        numlines=3
+    )
+
+
+def benchmark():
+    analyzer = WordDocumentAnalyzer()
+    rng = random.Random(17)
+
+    print("⏱️  Diff Engine Benchmark")
+    print("=" * 50)
+    print(f"{'paragraphs':>10}  {'HtmlDiff':>10}  " + '  '.join(f'{engine:>10}' for engine in app.DIFF_ENGINES))
+
+    for paragraph_count in (100, 400, 1600, 6400):
+        original = manuscript(rng, paragraph_count)
+        revised = revision(rng, original)
+
+        timings = [time_call(html_diff_table, original, revised)]
+        for engine in app.DIFF_ENGINES:
+            timings.append(time_call(analyzer.generate_html_diff, original, revised, engine))
+        print(f"{paragraph_count:>10}  " + '  '.join(f'{seconds * 1000:>8.1f}ms' for seconds in timings))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the document walker on nested-table fixtures
+
+Compares the original recursive walk_document_for_comments against the current
+iterative walker. The streaming column also includes XML parsing time.
+"""
+
+import io
+import sys
+import os
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer
+from create_comment_docs import build_docx_bytes, nested_table_xml, paragraph_xml
+
+W_ID = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id'
+
+
+def recursive_walk(element, comment_starts, comment_ends, text_content):
+    """The original recursive walker, kept as the reference implementation"""
+    if element.tag.endswith('commentRangeStart'):
+        comment_id = element.get(W_ID)
+        if comment_id:
+            comment_starts[comment_id] = len(text_content)
+    elif element.tag.endswith('commentRangeEnd'):
+        comment_id = element.get(W_ID)
+        if comment_id:
+            comment_ends[comment_id] = len(text_content)
+    elif element.tag.endswith('t'):
+        text = element.text or ''
+        if text:
+            text_content.append({'text': text, 'position': len(text_content)})
+
+    for child in element:
+        recursive_walk(child, comment_starts, comment_ends, text_content)
+
+
+def nested_table_docx(blocks, depth):
+    """`blocks` commented paragraphs, each wrapped in `depth` levels of tables"""
+    body_xml = ''.join(
+        nested_table_xml(depth, paragraph_xml([f'Cell {i} ', (i, f'target {i}'), ' end.']))
+        for i in range(blocks)
+    )
+    comments = {i: ('Editor', f'Comment {i}') for i in range(blocks)}
+    return build_docx_bytes(body_xml=body_xml, comments=comments)
+
+
+def time_call(func, repeat=5):
+    """Best-of-N wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark():
+    analyzer = WordDocumentAnalyzer()
+
+    print("⏱️  Document Walker Benchmark (nested tables)")
+    print("=" * 72)
+    print(f"{'blocks':>7} {'depth':>6} {'recursive ms':>14} {'iterative ms':>14} {'stream+parse':>14} {'speedup':>8}")
+
+    for blocks, depth in [(200, 3), (200, 10), (100, 40), (20, 300)]:
+        docx_bytes = nested_table_docx(blocks, depth)
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as docx_zip:
+            document_xml = docx_zip.read('word/document.xml')
+        root = ET.fromstring(document_xml)
+
+        def run_recursive():
+            recursive_walk(root, {}, {}, [])
+
+        def run_iterative():
+            analyzer.walk_document_for_comments(root, None, {}, {}, [])
+
+        def run_streaming():
+            analyzer.stream_document_part(io.BytesIO(document_xml))
+
+        try:
+            recursive_ms = time_call(run_recursive)
+            recursive_label = f"{recursive_ms:14.2f}"
+        except RecursionError:
+            recursive_ms = None
+            recursive_label = f"{'RecursionError':>14}"
+
+        iterative_ms = time_call(run_iterative)
+        streaming_ms = time_call(run_streaming)
+        speedup = f"{recursive_ms / iterative_ms:7.1f}x" if recursive_ms else f"{'n/a':>8}"
+
+        print(f"{blocks:>7} {depth:>6} {recursive_label} {iterative_ms:14.2f} {streaming_ms:14.2f} {speedup}")
+
+
+if __name__ == "__main__":
+    benchmark()
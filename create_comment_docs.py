@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Create Word documents containing real Word Review comments (word/comments.xml)
+
+python-docx cannot write comments, so the package is assembled directly with zipfile.
+"""
+
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+CONTENT_TYPES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/comments.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.comments+xml"/>
+</Types>"""
+
+ROOT_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+DOCUMENT_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/comments" Target="comments.xml"/>
+</Relationships>"""
+
+
+def run_xml(text):
+    """A single run, preserving whitespace"""
+    return f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def commented_xml(comment_id, text):
+    """A run wrapped in comment range markers plus its comment reference"""
+    return (
+        f'<w:commentRangeStart w:id="{comment_id}"/>'
+        f'{run_xml(text)}'
+        f'<w:commentRangeEnd w:id="{comment_id}"/>'
+        f'<w:r><w:commentReference w:id="{comment_id}"/></w:r>'
+    )
+
+
+def paragraph_xml(segments):
+    """Build a paragraph from plain strings and (comment_id, text) tuples"""
+    parts = []
+    for segment in segments:
+        if isinstance(segment, tuple):
+            parts.append(commented_xml(*segment))
+        else:
+            parts.append(run_xml(segment))
+    return '<w:p>' + ''.join(parts) + '</w:p>'
+
+
+def nested_table_xml(depth, inner_xml):
+    """Wrap inner_xml in `depth` levels of single-cell tables"""
+    for _ in range(depth):
+        inner_xml = f'<w:tbl><w:tr><w:tc>{inner_xml}<w:p/></w:tc></w:tr></w:tbl>'
+    return inner_xml
+
+
+def build_docx_bytes(paragraphs=None, comments=None, body_xml=None):
+    """Return .docx bytes for the given paragraphs and {comment_id: (author, text)} comments"""
+
+    if body_xml is None:
+        body_xml = ''.join(paragraph_xml(segments) for segments in (paragraphs or []))
+
+    document_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{W_NAMESPACE}"><w:body>{body_xml}<w:sectPr/></w:body></w:document>'
+    )
+
+    comment_parts = []
+    for comment_id, (author, text) in (comments or {}).items():
+        comment_parts.append(
+            f'<w:comment w:id="{comment_id}" w:author="{escape(author)}" w:date="2024-01-01T00:00:00Z">'
+            f'<w:p>{run_xml(text)}</w:p></w:comment>'
+        )
+    comments_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:comments xmlns:w="{W_NAMESPACE}">{"".join(comment_parts)}</w:comments>'
+    )
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as docx_zip:
+        docx_zip.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        docx_zip.writestr('_rels/.rels', ROOT_RELS_XML)
+        docx_zip.writestr('word/document.xml', document_xml)
+        if comments:
+            docx_zip.writestr('word/_rels/document.xml.rels', DOCUMENT_RELS_XML)
+            docx_zip.writestr('word/comments.xml', comments_xml)
+    return buffer.getvalue()
+
+
+def create_comment_documents():
+    """Create an original with real Word comments and a revised version"""
+
+    original = build_docx_bytes(
+        paragraphs=[
+            ['Johnny went to the store. ', (1, 'Johnny'), ' likes shopping.'],
+            ['The weather was ', (2, 'absolutly'), ' beautiful today.'],
+            ['The food was ', (3, 'good'), ' at the restaurant.'],
+        ],
+        comments={
+            1: ('Editor', 'change all Johnny to Jimmy'),
+            2: ('Editor', 'Spelling mistake'),
+            3: ('Editor', 'excellent'),
+        },
+    )
+    revised = build_docx_bytes(paragraphs=[
+        ['Jimmy went to the store. Jimmy likes shopping.'],
+        ['The weather was absolutely beautiful today.'],
+        ['The food was excellent at the restaurant.'],
+    ])
+
+    original_path = 'word_comments_original.docx'
+    revised_path = 'word_comments_revised.docx'
+    with open(original_path, 'wb') as f:
+        f.write(original)
+    print(f'✅ Created: {original_path}')
+    with open(revised_path, 'wb') as f:
+        f.write(revised)
+    print(f'✅ Created: {revised_path}')
+
+    return original_path, revised_path
+
+
+if __name__ == "__main__":
+    create_comment_documents()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test that AI prompts carry document excerpts of about constant size
+"""
+
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+
+def manuscript(paragraph_count, marker_at):
+    paragraphs = [f'Paragraph {i}: Johnny walked along the river and thought about the day.'
+                  for i in range(paragraph_count)]
+    paragraphs[marker_at] = 'The weather was nice today, said the marker paragraph.'
+    return '\n'.join(paragraphs)
+
+
+class RecordingClient:
+    """Anthropic client stand-in that keeps every prompt it is sent"""
+
+    def __init__(self):
+        self.prompts = []
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        self.prompts.append(messages[0]['content'])
+        answer = {'interpretation': 'Change nice to excellent', 'comment_type': 'direct_replacement',
+                  'expected_from': 'nice', 'expected_to': 'excellent', 'scope_applied': 'local',
+                  'status': 'correctly_applied', 'evidence': 'excellent appears', 'confidence': 0.9,
+                  'requires_manual_review': False}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(answer))])
+
+
+def test_local_prompt_size_is_constant():
+    """A local comment sends the aligned windows around its anchor, whatever the document size"""
+
+    analyzer = WordDocumentAnalyzer()
+    comment = {'id': '1', 'text': 'change nice to excellent', 'associated_text': 'nice', 'user_scope': 'local'}
+
+    print("🧪 Testing AI Prompt Context")
+    print("=" * 50)
+
+    sizes = []
+    for paragraph_count in (100, 5000):
+        original = manuscript(paragraph_count, paragraph_count // 2)
+        revised = original.replace('nice today', 'excellent today')
+        text, info = analyzer.ai_prompt_context(comment, original, revised)
+        print(f"{len(original)} character documents: {info}")
+        assert info['mode'] == 'local_window' and info['truncated']
+        assert 'nice today' in text and 'excellent today' in text
+        assert 'NOTE: These are excerpts' in text
+        sizes.append(info['characters'])
+
+    assert abs(sizes[1] - sizes[0]) < 100
+    print("  ✅ PASSED")
+
+
+def test_global_prompt_counts_occurrences():
+    """A global comment gets counts over the whole documents and a few snippets"""
+
+    analyzer = WordDocumentAnalyzer()
+    original = manuscript(200, 0)
+    revised = original.replace('Johnny', 'Jimmy', 150)
+    comment = {'id': '2', 'text': 'change all Johnny to Jimmy', 'associated_text': 'Johnny', 'user_scope': 'global'}
+
+    text, info = analyzer.ai_prompt_context(comment, original, revised)
+    print(f"\nGlobal comment: {info}")
+    assert info['mode'] == 'occurrences' and info['truncated']
+    assert '"Johnny": 199 occurrence(s) in the ORIGINAL DOCUMENT, 49 in the REVISED DOCUMENT' in text
+    assert '"Jimmy": 0 occurrence(s) in the ORIGINAL DOCUMENT, 150 in the REVISED DOCUMENT' in text
+    assert '(194 more in the original document not shown)' in text
+    assert text.count('  REVISED: ') == 2 * app.AI_OCCURRENCE_SNIPPETS
+    assert info['characters'] < 5000
+    print("  ✅ PASSED")
+
+
+def test_unanchored_prompt_sends_changed_paragraphs():
+    """Without associated text or an anchor only the changed paragraphs are sent"""
+
+    analyzer = WordDocumentAnalyzer()
+    original = manuscript(1000, 10)
+    revised = original.replace('Paragraph 500: Johnny', 'Paragraph 500: Jimmy')
+    comment = {'id': '3', 'text': 'Fix the name', 'associated_text': ''}
+
+    text, info = analyzer.ai_prompt_context(comment, original, revised)
+    print(f"\nUnanchored comment: {info}")
+    assert info['mode'] == 'changed_paragraphs' and not info['truncated']
+    assert '- paragraph 501: Paragraph 500: Johnny' in text
+    assert '+ paragraph 501: Paragraph 500: Jimmy' in text
+    assert info['characters'] < 1000
+    print("  ✅ PASSED")
+
+
+def test_ai_request_uses_excerpts():
+    """The prompt sent to the model holds excerpts, and the result reports them"""
+
+    analyzer = WordDocumentAnalyzer()
+    original = manuscript(3000, 1500)
+    revised = original.replace('nice today', 'excellent today')
+    comment = {'id': '4', 'text': 'change nice to excellent', 'associated_text': 'nice', 'user_scope': 'local'}
+
+    client = RecordingClient()
+    get_client = app.get_anthropic_client
+    triage = app.app.config['AI_TRIAGE_CONFIDENCE']
+    app.get_anthropic_client = lambda: client
+    app.app.config['AI_TRIAGE_CONFIDENCE'] = float('inf')  # Send every comment to the AI
+    try:
+        results = analyzer.analyze_comments_with_ai([comment], original, revised)
+    finally:
+        app.get_anthropic_client = get_client
+        app.app.config['AI_TRIAGE_CONFIDENCE'] = triage
+
+    prompt = client.prompts[0]
+    print(f"\nPrompt: {len(prompt)} characters for {len(original)} character documents")
+    assert len(prompt) < 6000
+    assert 'The weather was nice today' in prompt and 'Paragraph 10:' not in prompt
+    assert results[0]['ai_powered'] and results[0]['prompt_context']['mode'] == 'local_window'
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_local_prompt_size_is_constant()
+    test_global_prompt_counts_occurrences()
+    test_unanchored_prompt_sends_changed_paragraphs()
+    test_ai_request_uses_excerpts()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test that repeated AI analyses are answered from the AI response cache
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import time
+from types import SimpleNamespace
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer, AIResponseCache
+
+
+class CountingClient:
+    """Anthropic client stand-in that counts requests and answers after a delay"""
+
+    def __init__(self, latency=0.05):
+        self.requests = 0
+        self.latency = latency
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        self.requests += 1
+        time.sleep(self.latency)
+        answer = {'interpretation': 'Change Johnny to Jimmy', 'comment_type': 'direct_replacement',
+                  'expected_from': 'Johnny', 'expected_to': 'Jimmy', 'scope_applied': 'global',
+                  'status': 'correctly_applied', 'evidence': 'Jimmy appears', 'confidence': 0.9,
+                  'requires_manual_review': False}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(answer))])
+
+
+def run(comments, original, revised, client, cache):
+    analyzer = WordDocumentAnalyzer()
+    get_client = app.get_anthropic_client
+    configured = app.ai_response_cache
+    triage = app.app.config['AI_TRIAGE_CONFIDENCE']
+    app.get_anthropic_client = lambda: client
+    app.app.config['AI_TRIAGE_CONFIDENCE'] = float('inf')  # Send every comment to the AI
+    app.ai_response_cache = cache
+    try:
+        return analyzer.analyze_comments_with_ai(comments, original, revised)
+    finally:
+        app.get_anthropic_client = get_client
+        app.app.config['AI_TRIAGE_CONFIDENCE'] = triage
+        app.ai_response_cache = configured
+
+
+def documents():
+    original = '\n'.join(f'Paragraph {i}: Johnny walked along the river.' for i in range(500))
+    return original, original.replace('Johnny', 'Jimmy')
+
+
+def comments(scope='global'):
+    return [{'id': str(i), 'text': f'Note {i}: change all Johnny to Jimmy', 'associated_text': 'Johnny',
+             'user_scope': scope} for i in range(10)]
+
+
+def test_repeat_analysis_makes_no_requests():
+    """The second analysis of the same comments is answered from memory"""
+
+    original, revised = documents()
+    cache = AIResponseCache()
+    client = CountingClient()
+
+    print("🧪 Testing AI Response Cache")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    first = run(comments(), original, revised, client, cache)
+    first_time = time.perf_counter() - start
+    assert client.requests == 10 and not any(result['ai_cached'] for result in first)
+
+    start = time.perf_counter()
+    repeat = run(comments(), original, revised, client, cache)
+    repeat_time = time.perf_counter() - start
+
+    print(f"First analysis: {first_time * 1000:.1f} ms, repeat: {repeat_time * 1000:.1f} ms, {cache.stats()}")
+    assert client.requests == 10
+    assert all(result['ai_cached'] for result in repeat)
+    assert [result['validation'] for result in repeat] == [result['validation'] for result in first]
+    assert repeat_time < first_time
+
+    # A different scope is a different question
+    run(comments('local'), original, revised, client, cache)
+    assert client.requests == 20
+    print("  ✅ PASSED")
+
+
+def test_disk_tier_survives_restart_and_expires():
+    """Answers are read back from SQLite by a new cache, until they are older than the TTL"""
+
+    original, revised = documents()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'ai_cache.sqlite3')
+        client = CountingClient(latency=0)
+        run(comments(), original, revised, client, AIResponseCache(db_path=db_path))
+
+        restarted = AIResponseCache(db_path=db_path)
+        results = run(comments(), original, revised, client, restarted)
+        print(f"\nAfter restart: {restarted.stats()}")
+        assert client.requests == 10
+        assert all(result['ai_cached'] for result in results)
+        assert restarted.stats()['disk_hits'] == 10
+
+        with sqlite3.connect(db_path) as db:
+            db.execute('UPDATE ai_responses SET created = created - 120')
+        db.close()
+        expired = AIResponseCache(db_path=db_path, ttl=60)
+        results = run(comments(), original, revised, client, expired)
+        assert client.requests == 20 and not any(result['ai_cached'] for result in results)
+    print("  ✅ PASSED")
+
+
+def test_memory_tier_is_bounded():
+    """The memory tier keeps only the most recently used answers"""
+
+    cache = AIResponseCache(max_entries=2)
+    for n in range(3):
+        cache.put(AIResponseCache.key_for('model', n), {'status': 'unclear', 'n': n})
+    assert cache.get(AIResponseCache.key_for('model', 0)) is None
+    assert cache.get(AIResponseCache.key_for('model', 2)) == {'status': 'unclear', 'n': 2}
+    assert cache.stats()['entries'] == 2
+    print("\n  ✅ PASSED (bounded memory tier)")
+
+
+def test_disk_tier_is_pruned():
+    """Expired rows go when the cache opens, and the table is cut to max_rows as it fills"""
+
+    def row_count(db_path):
+        with sqlite3.connect(db_path) as db:
+            count = db.execute('SELECT COUNT(*) FROM ai_responses').fetchone()[0]
+        db.close()
+        return count
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'ai_cache.sqlite3')
+        cache = AIResponseCache(db_path=db_path, max_rows=10, prune_every=5)
+        for n in range(23):
+            cache.put(AIResponseCache.key_for('model', n), {'status': 'unclear', 'n': n})
+        print(f"\n23 writes, at most 10 rows: {row_count(db_path)} rows")
+        assert row_count(db_path) == 13
+        cache.prune()
+        assert row_count(db_path) == 10
+        assert AIResponseCache(db_path=db_path).get(AIResponseCache.key_for('model', 22)) is not None
+        assert AIResponseCache(db_path=db_path).get(AIResponseCache.key_for('model', 12)) is None
+
+        with sqlite3.connect(db_path) as db:
+            db.execute('UPDATE ai_responses SET created = created - 120')
+        db.close()
+        AIResponseCache(db_path=db_path, ttl=60)
+        assert row_count(db_path) == 0
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_repeat_analysis_makes_no_requests()
+    test_disk_tier_survives_restart_and_expires()
+    test_memory_tier_is_bounded()
+    test_disk_tier_is_pruned()
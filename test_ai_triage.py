@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test that only comments pattern matching cannot resolve are sent to the AI
+"""
+
+import sys
+import os
+import json
+import threading
+from types import SimpleNamespace
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer, CompactParagraphs
+
+ORIGINAL = ("Johnny went home. I can't stay, Johnny said. It's late.\n"
+            "The weather was nice today.\n"
+            "She felt tired after the long walk.")
+REVISED = ("Jimmy went home. I cannot stay, Jimmy said. It is late.\n"
+           "The weather was nice today.\n"
+           "She felt exhausted after the long walk.")
+
+COMMENTS = [
+    {'id': '1', 'text': 'change all Johnny to Jimmy', 'associated_text': 'Johnny', 'user_scope': 'global'},
+    {'id': '2', 'text': "Don't use contractions", 'associated_text': "can't", 'user_scope': 'global'},
+    {'id': '3', 'text': 'Make this more exciting', 'associated_text': 'The weather was nice today.'},
+    {'id': '4', 'text': 'exhausted', 'associated_text': '', 'user_scope': 'global'},
+]
+
+
+class CountingClient:
+    """Anthropic client stand-in that records the comments it is asked about"""
+
+    def __init__(self, fail=False):
+        self.prompts = []
+        self.fail = fail
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        self.prompts.append(messages[0]['content'])
+        if self.fail:
+            raise RuntimeError('simulated API error')
+        answer = {'interpretation': 'AI reading', 'comment_type': 'content_change', 'scope_applied': 'local',
+                  'status': 'unclear', 'evidence': 'AI answer', 'confidence': 0.5, 'requires_manual_review': True}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(answer))])
+
+
+def with_client(client, func):
+    get_client = app.get_anthropic_client
+    cache = app.ai_response_cache
+    app.get_anthropic_client = lambda: client
+    app.ai_response_cache = app.AIResponseCache()
+    try:
+        return func()
+    finally:
+        app.get_anthropic_client = get_client
+        app.ai_response_cache = cache
+
+
+def test_only_ambiguous_comments_reach_the_ai():
+    """Exact replacements and contraction rules are settled without a request"""
+
+    analyzer = WordDocumentAnalyzer()
+    client = CountingClient()
+
+    print("🧪 Testing AI Triage")
+    print("=" * 50)
+
+    results = with_client(client, lambda: analyzer.analyze_comments_with_ai(
+        [dict(comment) for comment in COMMENTS], ORIGINAL, REVISED))
+
+    for result in results:
+        print(f"{result['comment']['text']!r}: {result['validation']['status']}, "
+              f"AI {'avoided' if result.get('ai_call_avoided') else 'used'}")
+    assert len(client.prompts) == 2
+    assert [result.get('ai_call_avoided', False) for result in results] == [True, True, False, False]
+    assert [result['ai_powered'] for result in results] == [False, False, True, True]
+    assert results[0]['validation']['status'] == 'correctly_applied'
+    assert results[1]['validation']['status'] == 'correctly_applied'
+    assert analyzer.generate_summary(results)['ai_calls_avoided'] == 2
+    print("  ✅ PASSED")
+
+
+def test_threshold_and_failed_escalations():
+    """The threshold decides what is escalated; a failed AI call keeps the pattern result"""
+
+    analyzer = WordDocumentAnalyzer()
+    client = CountingClient(fail=True)
+    results = with_client(client, lambda: analyzer.analyze_comments_with_ai(
+        [dict(comment) for comment in COMMENTS], ORIGINAL, REVISED))
+    assert len(client.prompts) == 2
+    assert results[3]['validation']['status'] == 'correctly_applied' and not results[3]['ai_powered']
+    assert results[3]['validation']['confidence'] < app.app.config['AI_TRIAGE_CONFIDENCE']
+
+    # A lower threshold trusts the pattern engine's not_applied, but still not its guesses
+    comments = [{'id': '5', 'text': 'change walk to stroll', 'associated_text': ''},
+                dict(COMMENTS[2]), dict(COMMENTS[3])]
+    threshold = app.app.config['AI_TRIAGE_CONFIDENCE']
+    app.app.config['AI_TRIAGE_CONFIDENCE'] = 0.65
+    try:
+        client = CountingClient()
+        results = with_client(client, lambda: analyzer.analyze_comments_with_ai(comments, ORIGINAL, REVISED))
+    finally:
+        app.app.config['AI_TRIAGE_CONFIDENCE'] = threshold
+    print(f"\nThreshold 0.65: {len(client.prompts)} request(s)")
+    assert len(client.prompts) == 2
+    assert results[0]['ai_call_avoided'] and results[0]['validation']['status'] == 'not_applied'
+    assert results[1]['ai_powered'] and results[2]['ai_powered']
+    print("  ✅ PASSED")
+
+
+def test_guessed_intents_reach_the_ai():
+    """Intents read from the associated text, or forced by the scope, are not trusted"""
+
+    analyzer = WordDocumentAnalyzer()
+    rewritten = REVISED.replace('The weather was nice today.', 'The sun blazed over a roaring crowd!')
+    cases = [
+        ({'id': '1', 'text': 'Make this more exciting', 'associated_text': 'The weather was nice today.',
+          'user_scope': 'local'}, ORIGINAL, rewritten),
+        ({'id': '2', 'text': 'should be sunny', 'associated_text': 'rainy', 'user_scope': 'local'},
+         'It was rainy all day.', 'It was cloudy all day.'),
+        ({'id': '3', 'text': 'Make this more exciting', 'associated_text': 'The weather was nice today.',
+          'user_scope': 'global'}, ORIGINAL, rewritten),
+    ]
+
+    for comment, original, revised in cases:
+        pattern_result = analyzer.fallback_analyze_comment(dict(comment), original, revised)
+        assert pattern_result['validation']['status'] in ('correctly_applied', 'partially_applied')
+        assert analyzer.pattern_confidence(pattern_result) < app.app.config['AI_TRIAGE_CONFIDENCE']
+
+        client = CountingClient()
+        results = with_client(client, lambda: analyzer.analyze_comments_with_ai([dict(comment)], original, revised))
+        print(f"\n{comment['text']!r} ({comment['user_scope']}): pattern said "
+              f"{pattern_result['validation']['status']}, {len(client.prompts)} AI request(s)")
+        assert len(client.prompts) == 1
+        assert results[0]['ai_powered'] and not results[0].get('ai_call_avoided')
+    print("  ✅ PASSED")
+
+
+class OverlapAnalyzer(WordDocumentAnalyzer):
+    """Triage of the last comment waits until an AI request for an earlier comment has started"""
+
+    def __init__(self, comment_count):
+        super().__init__()
+        self.last_id = str(comment_count - 1)
+        self.ai_started = threading.Event()
+        self.overlapped = False
+
+    def fallback_analyze_comment(self, comment, original_text, revised_text, text_views=None):
+        if comment['id'] == self.last_id:
+            self.overlapped = self.ai_started.wait(timeout=5)
+        return {'comment': comment, 'intent': {'type': 'unknown'}, 'validation': {'status': 'manual_review_required'},
+                'requires_manual_review': True, 'ai_powered': False}
+
+    def ai_analyze_comment(self, comment, original_text, revised_text, text_views=None):
+        self.ai_started.set()
+        return {'comment': comment, 'intent': {}, 'validation': {'status': 'unclear'},
+                'requires_manual_review': True, 'ai_powered': True}
+
+
+def test_triage_overlaps_ai_requests():
+    """An escalated comment is sent while the rest are still being triaged"""
+
+    analyzer = OverlapAnalyzer(6)
+    comments = [{'id': str(i), 'text': f'comment {i}', 'associated_text': ''} for i in range(6)]
+
+    results = with_client(object(), lambda: analyzer.analyze_comments_with_ai(comments, ORIGINAL, REVISED))
+    print(f"\nAI request started during triage: {analyzer.overlapped}")
+    assert analyzer.overlapped
+    assert all(result['ai_powered'] for result in results)
+    print("  ✅ PASSED")
+
+
+def test_session_records_avoided_calls():
+    """The analysis route keeps a session total of the AI calls triage saved"""
+
+    paragraphs = {role: CompactParagraphs.from_runs([[line] for line in text.split('\n')])
+                  for role, text in (('original', ORIGINAL), ('revised', REVISED))}
+    app.analyzer.session_data['triaged'] = {
+        'original': {'paragraphs': paragraphs['original'], 'comments': [dict(comment) for comment in COMMENTS],
+                     'full_text': paragraphs['original'].full_text},
+        'revised': {'paragraphs': paragraphs['revised'], 'comments': [],
+                    'full_text': paragraphs['revised'].full_text},
+        'original_file': 'original.docx',
+        'revised_file': 'revised.docx',
+        'timestamp': '2026-01-01T00:00:00',
+    }
+
+    client = CountingClient()
+    response = with_client(client, lambda: app.app.test_client().post(
+        '/analyze/triaged', json={'scope_0': 'global', 'scope_1': 'global', 'scope_3': 'global'}))
+    assert response.status_code == 200
+    print(f"\nSession: {app.analyzer.session_data['triaged']['ai_calls_avoided']} AI call(s) avoided")
+    assert app.analyzer.session_data['triaged']['ai_calls_avoided'] == 2
+    assert response.get_json()['report']['summary']['ai_calls_avoided'] == 2
+    assert len(client.prompts) == 2
+
+    # Re-analysis adds to the session's total
+    response = with_client(client, lambda: app.app.test_client().post(
+        '/analyze/triaged', json={'scope_0': 'global', 'scope_1': 'global', 'scope_3': 'global'}))
+    assert app.analyzer.session_data['triaged']['ai_calls_avoided'] == 4
+    assert response.get_json()['report']['summary']['ai_calls_avoided'] == 2
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_only_ambiguous_comments_reach_the_ai()
+    test_threshold_and_failed_escalations()
+    test_guessed_intents_reach_the_ai()
+    test_triage_overlaps_ai_requests()
+    test_session_records_avoided_calls()
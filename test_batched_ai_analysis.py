@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test that AI analysis can send several comments in one request
+"""
+
+import sys
+import os
+import re
+import json
+import threading
+from types import SimpleNamespace
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+
+def answer(comment_id):
+    return {'comment_id': comment_id, 'interpretation': 'Change Johnny to Jimmy', 'comment_type': 'direct_replacement',
+            'expected_from': 'Johnny', 'expected_to': 'Jimmy', 'scope_applied': 'global',
+            'status': 'correctly_applied', 'evidence': f'answer for {comment_id}', 'confidence': 0.9,
+            'requires_manual_review': False}
+
+
+class BatchClient:
+    """Anthropic client stand-in that answers every comment id in a prompt
+
+    Ids listed in skip are left out of batch answers; with cut_off the
+    array is truncated mid-entry, as a response that ran out of tokens would be.
+    """
+
+    def __init__(self, skip=(), cut_off=False):
+        self.prompts = []
+        self.skip = set(skip)
+        self.cut_off = cut_off
+        self.lock = threading.Lock()
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        prompt = messages[0]['content']
+        with self.lock:
+            self.prompts.append(prompt)
+        ids = re.findall(r'=== COMMENT ID: "([^"]*)" ===', prompt)
+        if not ids:
+            text = json.dumps(answer('single'))
+        else:
+            text = json.dumps([answer(comment_id) for comment_id in ids if comment_id not in self.skip], indent=2)
+            if self.cut_off:
+                text = text[:text.rindex('"status"')]
+        return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+
+def run(comments, original, revised, client, batch_size):
+    analyzer = WordDocumentAnalyzer()
+    get_client = app.get_anthropic_client
+    configured = app.app.config['AI_BATCH_SIZE']
+    cache = app.ai_response_cache
+    triage = app.app.config['AI_TRIAGE_CONFIDENCE']
+    app.get_anthropic_client = lambda: client
+    app.app.config['AI_TRIAGE_CONFIDENCE'] = float('inf')  # Send every comment to the AI
+    app.app.config['AI_BATCH_SIZE'] = batch_size
+    app.ai_response_cache = app.AIResponseCache()
+    try:
+        return analyzer.analyze_comments_with_ai(comments, original, revised)
+    finally:
+        app.get_anthropic_client = get_client
+        app.app.config['AI_TRIAGE_CONFIDENCE'] = triage
+        app.app.config['AI_BATCH_SIZE'] = configured
+        app.ai_response_cache = cache
+
+
+def document():
+    original = '\n'.join(f'Paragraph {i}: Johnny walked along the river.' for i in range(400))
+    return original, original.replace('Johnny', 'Jimmy')
+
+
+def test_batches_cut_requests_and_prompt_size():
+    """Twenty comments go out in four requests with fewer prompt characters in total"""
+
+    original, revised = document()
+    comments = [{'id': str(i), 'text': f'Note {i}: change all Johnny to Jimmy', 'associated_text': 'Johnny',
+                 'user_scope': 'global'} for i in range(20)]
+
+    print("🧪 Testing Batched AI Analysis")
+    print("=" * 50)
+
+    single = BatchClient()
+    single_results = run(comments, original, revised, single, 1)
+    batched = BatchClient()
+    results = run(comments, original, revised, batched, 5)
+
+    single_size = sum(len(prompt) for prompt in single.prompts)
+    batched_size = sum(len(prompt) for prompt in batched.prompts)
+    print(f"One per comment: {len(single.prompts)} requests, {single_size} characters")
+    print(f"Batches of 5: {len(batched.prompts)} requests, {batched_size} characters")
+    assert len(single.prompts) == 20 and len(batched.prompts) == 4
+    assert batched_size * 3 < single_size
+    assert all(prompt.count('DOCUMENT EXCERPTS: the same as for comment') == 4 for prompt in batched.prompts)
+
+    assert [result['comment']['id'] for result in results] == [str(i) for i in range(20)]
+    assert all(result['ai_powered'] for result in results)
+    assert [result['validation']['evidence'] for result in results] == [f'answer for {i}' for i in range(20)]
+    assert results[3]['intent'] == single_results[3]['intent']
+    assert results[3]['prompt_context'] == single_results[3]['prompt_context']
+    print("  ✅ PASSED")
+
+
+def test_missing_answers_are_retried_individually():
+    """Comments a batch does not answer get a request of their own"""
+
+    original, revised = document()
+    comments = [{'id': 'a', 'text': 'change Johnny to Jimmy', 'associated_text': 'Johnny'},
+                {'id': 'b', 'text': 'Fix the name', 'associated_text': ''},
+                {'id': 'c', 'text': 'change all Johnny to Jimmy', 'associated_text': 'Johnny', 'user_scope': 'global'}]
+
+    client = BatchClient(skip={'b'})
+    results = run(comments, original, revised, client, 3)
+    print(f"\nPartial batch: {len(client.prompts)} requests")
+    assert len(client.prompts) == 2
+    assert [result['validation']['evidence'] for result in results] == ['answer for a', 'answer for single', 'answer for c']
+
+    client = BatchClient(cut_off=True)
+    results = run(comments, original, revised, client, 3)
+    print(f"Cut-off batch: {len(client.prompts)} requests")
+    assert len(client.prompts) == 2
+    assert [result['validation']['evidence'] for result in results] == ['answer for a', 'answer for b', 'answer for single']
+    print("  ✅ PASSED")
+
+
+def test_repeated_ids_and_failed_batches():
+    """Repeated comment ids are answered by position; a failed batch falls back per comment"""
+
+    original, revised = document()
+    comments = [{'id': '1', 'text': f'comment {i}', 'associated_text': ''} for i in range(4)]
+
+    client = BatchClient()
+    results = run(comments, original, revised, client, 4)
+    assert re.findall(r'=== COMMENT ID: "([^"]*)" ===', client.prompts[0]) == ['1', '2', '3', '4']
+    assert [result['validation']['evidence'] for result in results] == [f'answer for {i}' for i in range(1, 5)]
+
+    results = run(comments, original, revised, object(), 4)
+    assert [result['ai_powered'] for result in results] == [False] * 4
+    print("\n  ✅ PASSED (ids and failures)")
+
+
+if __name__ == "__main__":
+    test_batches_cut_requests_and_prompt_size()
+    test_missing_answers_are_retried_individually()
+    test_repeated_ids_and_failed_batches()
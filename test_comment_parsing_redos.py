@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Feed adversarial comments to the intent parser and check that none of them is slow
+"""
+
+import sys
+import os
+import random
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+# No single comment may take longer than this, in seconds
+SLOWEST_ALLOWED = 0.25
+
+# Repeated fragments that used to make the two-group rules backtrack
+ADVERSARIAL_FRAGMENTS = [
+    ' ', 'lorem ipsum ', 'a? ', 'a"', "it's ", '?',
+    'change ', 'change this to ', 'change all x to ', 'change x to y everywhere ',
+    'replace x ', 'replace x with ', 'correct spelling ', 'should be x not ',
+    'her name should be ', 'use x instead of ', 'add x before ', 'make x ',
+]
+
+FUZZ_TOKENS = ['change', 'all', 'to', 'with', 'replace', 'should', 'be', 'not', 'use', 'instead',
+               'of', 'everywhere', 'name', 'add', 'before', '?', '"', "'", ':', '->', ' ', ' ', 'x']
+
+
+def time_parse(analyzer, comment_text, associated_text=None):
+    start = time.perf_counter()
+    intent = analyzer.parse_comment_intent(comment_text, associated_text)
+    return intent, time.perf_counter() - start
+
+
+def test_adversarial_comments_are_fast():
+    """Repeated fragments, with and without a trailing '?' or quote, at several lengths"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    print("🧪 Testing Adversarial Comment Parsing")
+    print("=" * 50)
+
+    slowest = (0, None)
+    for fragment in ADVERSARIAL_FRAGMENTS:
+        for length in (100, app.COMMENT_PARSE_MAX_LENGTH, 5000, 100000):
+            body = (fragment * (length // len(fragment) + 1))[:length - 1]
+            for comment_text in (body + ' ', body + '?', body + '"'):
+                for associated_text in (None, 'Johnny'):
+                    intent, elapsed = time_parse(analyzer, comment_text, associated_text)
+                    assert intent['raw_comment'] == comment_text
+                    assert elapsed < SLOWEST_ALLOWED, \
+                        f"{fragment!r} x {length}: {elapsed:.3f}s"
+                    slowest = max(slowest, (elapsed, f"{fragment!r} x {length}"))
+
+    print(f"Slowest: {slowest[0] * 1000:.1f} ms for {slowest[1]}")
+    print("  ✅ PASSED")
+
+
+def test_random_comments_are_fast():
+    """Random comments built from rule keywords and delimiters"""
+
+    analyzer = WordDocumentAnalyzer()
+    rng = random.Random(1234)
+
+    slowest = 0
+    for _ in range(300):
+        length = rng.randint(1, 120)
+        comment_text = ' '.join(rng.choice(FUZZ_TOKENS) for _ in range(length))
+        _, elapsed = time_parse(analyzer, comment_text, rng.choice([None, 'real', 'Johnny']))
+        assert elapsed < SLOWEST_ALLOWED, f"{comment_text!r}: {elapsed:.3f}s"
+        slowest = max(slowest, elapsed)
+
+    print(f"\nSlowest random comment: {slowest * 1000:.1f} ms")
+    print("  ✅ PASSED")
+
+
+def test_padded_two_value_rules_are_fast():
+    """Whitespace around the separator of a two-value rule, under the length cap"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    for comment_text in ('everywhere change ' + ' ' * 80 + 'to' + ' ' * 80 + 'x',
+                         'everywhere change ' + ' ' * 120 + 'to' + ' ' * 120 + 'x',
+                         'change ' + ' ' * 492 + 'x',
+                         'make ' + ' ' * 494 + 'x'):
+        assert len(comment_text) <= app.COMMENT_PARSE_MAX_LENGTH
+        intent, elapsed = time_parse(analyzer, comment_text)
+        print(f"{len(comment_text)} characters: {elapsed * 1000:.2f} ms")
+        assert intent['raw_comment'] == comment_text
+        assert elapsed < SLOWEST_ALLOWED, f"{comment_text[:20]!r}: {elapsed:.3f}s"
+
+    intent = analyzer.parse_comment_intent('change ' + ' ' * 80 + 'nice' + ' ' * 80 + 'to   excellent   everywhere')
+    assert (intent['type'], intent['from_text'], intent['to_text']) == ('replace_global', 'nice', 'excellent')
+    print("  ✅ PASSED")
+
+
+def test_short_comments_still_parse():
+    """The linear "real? reel" rule and the length cap keep ordinary comments working"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    intent = analyzer.parse_comment_intent('real? reel')
+    assert (intent['type'], intent['from_text'], intent['to_text']) == ('replace_local', 'real', 'reel')
+
+    intent = analyzer.parse_comment_intent('"real" ? "reel"')
+    assert (intent['from_text'], intent['to_text']) == ('real', 'reel')
+
+    intent = analyzer.parse_comment_intent('Change Johnny to Jimmy throughout')
+    assert (intent['type'], intent['from_text'], intent['to_text']) == ('replace_global', 'Johnny', 'Jimmy')
+
+    intent = analyzer.parse_comment_intent('replace "to be" with "not to be" everywhere')
+    assert (intent['type'], intent['from_text'], intent['to_text']) == ('replace_global', 'to be', 'not to be')
+
+    intent = analyzer.parse_comment_intent('use great instead of good')
+    assert (intent['from_text'], intent['to_text']) == ('good', 'great')
+
+    # A long comment is still recognised as a style comment
+    long_style = "Don't use contractions. " + 'This section reads far too casually. ' * 40
+    intent = analyzer.parse_comment_intent(long_style, "It's late")
+    assert intent['type'] == 'style_grammar'
+
+    long_comment = 'change this to that ' * 50
+    intent = analyzer.parse_comment_intent(long_comment)
+    assert intent['type'] == 'unknown' and intent['raw_comment'] == long_comment
+    print("\n  ✅ PASSED (ordinary comments)")
+
+
+def test_time_budget_sends_comment_to_manual_review():
+    """Exceeding the time budget gives up on the rules instead of running on"""
+
+    analyzer = WordDocumentAnalyzer()
+    budget = app.COMMENT_PARSE_TIME_BUDGET
+    app.COMMENT_PARSE_TIME_BUDGET = -1
+    try:
+        intent = analyzer.parse_comment_intent('change nice to excellent')
+    finally:
+        app.COMMENT_PARSE_TIME_BUDGET = budget
+
+    assert intent['type'] == 'unknown' and intent['scope'] == 'manual_review'
+    print("\n  ✅ PASSED (time budget)")
+
+
+if __name__ == "__main__":
+    test_adversarial_comments_are_fast()
+    test_random_comments_are_fast()
+    test_padded_two_value_rules_are_fast()
+    test_short_comments_still_parse()
+    test_time_budget_sends_comment_to_manual_review()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test that diffing only the changed paragraphs gives the same report table
+"""
+
+import sys
+import os
+import re
+import random
+import difflib
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer, CondensedDiff
+
+
+def full_table(original_lines, revised_lines):
+    """The report table built from every line, as before condensing"""
+    return difflib.HtmlDiff().make_table(
+        original_lines, revised_lines,
+        fromdesc='Original Document',
+        todesc='Revised Document',
+        context=True,
+        numlines=3
+    )
+
+
+def without_prefixes(html_table):
+    """HtmlDiff numbers its anchors per table; drop that number before comparing"""
+    return re.sub(r'(from|to|difflib_chg_to)\d+_', r'\1_', html_table)
+
+
+def edited_copy(rng, lines, edits):
+    revised = list(lines)
+    for _ in range(edits):
+        position = rng.randint(0, len(revised))
+        operation = rng.random()
+        if operation < 0.3 and revised:
+            del revised[min(position, len(revised) - 1)]
+        elif operation < 0.6:
+            revised.insert(position, f'Inserted paragraph {rng.random()}')
+        elif revised:
+            revised[min(position, len(revised) - 1)] += ' Edited.'
+    return revised
+
+
+def test_condensed_table_matches_full_table():
+    """Line numbers, hunks and highlights are unchanged by condensing"""
+
+    analyzer = WordDocumentAnalyzer()
+    rng = random.Random(16)
+
+    print("🧪 Testing Condensed Diff")
+    print("=" * 50)
+
+    # Distinct paragraphs, so that there is only one way to pair up unchanged lines
+    for _ in range(500):
+        original = [f'Paragraph {i} of the story.' for i in range(rng.randint(0, 80))]
+        revised = edited_copy(rng, original, rng.randint(0, 5))
+        assert without_prefixes(analyzer.generate_html_diff(original, revised, engine='difflib')) == \
+            without_prefixes(full_table(original, revised)), (original, revised)
+    print("  ✅ PASSED")
+
+
+def test_unchanged_runs_are_condensed():
+    """Only the lines a context diff shows reach HtmlDiff"""
+
+    original = [f'Paragraph {i}.' for i in range(1000)]
+    revised = list(original)
+    revised[10] = 'Paragraph ten, rewritten.'
+    revised[900] = 'Paragraph nine hundred, rewritten.'
+
+    condensed = CondensedDiff(original, revised, context=3)
+    print(f"\nKept {len(condensed.original_lines)} of {len(original)} lines: {list(condensed.original_numbers)}")
+    # Three lines of context each side of lines 11 and 901, and one line for each gap
+    assert list(condensed.original_numbers) == [1, 8, 9, 10, 11, 12, 13, 14, 15,
+                                                898, 899, 900, 901, 902, 903, 904, 905]
+    assert list(condensed.revised_numbers) == list(condensed.original_numbers)
+
+    identical = CondensedDiff(original, list(original))
+    assert not identical.changed and identical.original_lines == []
+    assert 'No Differences Found' in WordDocumentAnalyzer().generate_html_diff(original, list(original), engine='difflib')
+    print("  ✅ PASSED")
+
+
+def test_report_time_follows_edit_size():
+    """A one-paragraph edit costs about the same in a short and a long document"""
+
+    analyzer = WordDocumentAnalyzer()
+    timings = []
+    for paragraph_count in (1000, 50000):
+        original = [f'Paragraph {i} of the manuscript.' for i in range(paragraph_count)]
+        revised = list(original)
+        revised[-20] += ' Edited.'
+        start = time.perf_counter()
+        html_diff = analyzer.generate_html_diff(original, revised, engine='difflib')
+        timings.append(time.perf_counter() - start)
+        assert f'>{paragraph_count - 19}</td>' in html_diff
+
+    print(f"\n1,000 paragraphs: {timings[0] * 1000:.1f} ms, 50,000 paragraphs: {timings[1] * 1000:.1f} ms")
+    # Interning the lines is linear, but far cheaper than HtmlDiff on every line
+    assert timings[1] < 0.5
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_condensed_table_matches_full_table()
+    test_unchanged_runs_are_condensed()
+    test_report_time_follows_edit_size()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test the patience diff engine against difflib.HtmlDiff
+"""
+
+import sys
+import os
+import re
+import random
+import difflib
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer, PatienceMatcher, SideBySideDiff
+
+
+def line_numbers(html_table):
+    """(from, to) line numbers of every row of a report table"""
+    return [tuple(re.findall(r'class="diff_header"[^>]*>(\d*)<', row)) for row in html_table.split('<tr>')[2:]]
+
+
+def test_patience_opcodes_rebuild_revised():
+    """Equal opcodes really are equal and the opcodes turn one sequence into the other"""
+
+    rng = random.Random(17)
+
+    print("🧪 Testing Patience Diff Engine")
+    print("=" * 50)
+
+    for _ in range(2000):
+        vocabulary = rng.choice([3, 10, 1000])
+        original = [rng.randrange(vocabulary) for _ in range(rng.randint(0, 60))]
+        revised = list(original)
+        for _ in range(rng.randint(0, 6)):
+            position = rng.randint(0, len(revised))
+            if rng.random() < 0.5 and revised:
+                del revised[min(position, len(revised) - 1)]
+            else:
+                revised.insert(position, rng.randrange(vocabulary))
+
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in PatienceMatcher(None, original, revised).get_opcodes():
+            if tag == 'equal':
+                assert original[i1:i2] == revised[j1:j2]
+            rebuilt.extend(revised[j1:j2])
+        assert rebuilt == revised
+    print("  ✅ PASSED")
+
+
+def test_table_matches_html_diff_rows():
+    """Single edits land on the same rows, with the same line numbers, as in HtmlDiff"""
+
+    original = [f'Paragraph {i} of the story goes on.' for i in range(40)]
+    revised = list(original)
+    revised[5] = 'Paragraph 5 of the story goes on and on.'
+    del revised[20]
+    revised.insert(30, 'A new paragraph.')
+
+    differ_args = dict(fromdesc='Original Document', todesc='Revised Document', context=True, numlines=3)
+    expected = difflib.HtmlDiff().make_table(original, revised, **differ_args)
+    table = SideBySideDiff().make_table(original, revised, **differ_args)
+
+    print(f"\nRows: {line_numbers(table)}")
+    assert line_numbers(table) == line_numbers(expected)
+    assert table.count('<tbody>') == expected.count('<tbody>')
+    assert 'id="difflib_chg_to' in table and '>t</a>' in table
+    print("  ✅ PASSED")
+
+
+def test_intraline_marks_tokens():
+    """Only the changed words are marked, and dissimilar lines are shown removed and added"""
+
+    differ = SideBySideDiff()
+    from_text, to_text = differ.mark_changes('The weather was nice today.', 'The weather was excellent today.')
+    assert from_text == 'The weather was \0^nice\1 today.'
+    assert to_text == 'The weather was \0^excellent\1 today.'
+
+    from_text, to_text = differ.mark_changes('Completely different.', 'Nothing alike here at all')
+    assert (from_text, to_text) == ('\0-Completely different.\1', '\0+Nothing alike here at all\1')
+
+    table = differ.make_table(['a < b & c'], ['a < b & d'], context=True, numlines=3)
+    assert 'a&nbsp;&lt;&nbsp;b&nbsp;&amp;&nbsp;<span class="diff_chg">d</span>' in table
+    assert 'No Differences Found' in differ.make_table(['same'], ['same'], context=True, numlines=3)
+    print("\n  ✅ PASSED (intraline)")
+
+
+def test_word_and_character_intraline():
+    """Word marking refines short misspellings; character marking is selectable per report"""
+
+    words = SideBySideDiff(intraline='word')
+    from_text, to_text = words.mark_changes('I did not recieve it.', 'I did not receive it.')
+    assert (from_text, to_text) == ('I did not reci\0-e\1ve it.', 'I did not rec\0+e\1ive it.')
+
+    # Long words are not refined
+    long_from, long_to = words.mark_changes('See the internationalizations.', 'See the internationalisations.')
+    assert '\0^internationalizations\1' in long_from and '\0^internationalisations\1' in long_to
+
+    characters = SideBySideDiff(intraline='char')
+    from_text, _ = characters.mark_changes('The weather was nice today.', 'The weather was excellent today.')
+    assert '\0^nice\1' not in from_text
+
+    analyzer = WordDocumentAnalyzer()
+    analyzer.session_data['intraline'] = {
+        'original': {'full_text': 'First paragraph.\nThe weather was nice today.', 'comments': []},
+        'revised': {'full_text': 'First paragraph.\nThe weather was excellent today.', 'comments': []},
+        'analysis_results': [],
+    }
+    word_report = analyzer.generate_comparison_report('intraline')
+    char_report = analyzer.generate_comparison_report('intraline', 'char')
+    assert word_report['intraline'] == 'word' and char_report['intraline'] == 'char'
+    assert '<span class="diff_chg">nice</span>' in word_report['diff_html']
+    assert '<span class="diff_chg">nice</span>' not in char_report['diff_html']
+
+    # Long paragraphs are compared a word at a time: fewer units, and only the edited words marked
+    paragraph = ' '.join(f'word{i % 50}' for i in range(1500))
+    edited = paragraph.replace('word7 ', 'changed ', 5)
+    tokens = SideBySideDiff.token_pattern.findall(paragraph)
+    print(f"\nLong paragraph: {len(tokens)} tokens, {len(paragraph)} characters")
+    assert len(tokens) * 3 < len(paragraph)
+    from_text, to_text = SideBySideDiff(intraline='word').mark_changes(paragraph, edited)
+    assert from_text.count('\0') == from_text.count('\0^word7\1') == 5
+    assert to_text.count('\0') == to_text.count('\0^changed\1') == 5
+    print("  ✅ PASSED")
+
+
+def test_rewritten_section_is_fast():
+    """A long rewritten section no longer makes the report quadratic"""
+
+    analyzer = WordDocumentAnalyzer()
+    original = [f'{i}. The house stood at the end of a long road and nobody remembered who built it.'
+                for i in range(5000)]
+    revised = [line.replace('house', 'cottage') if 2000 <= i < 2200 else line for i, line in enumerate(original)]
+
+    start = time.perf_counter()
+    html_diff = analyzer.generate_html_diff(original, revised, engine='patience')
+    elapsed = time.perf_counter() - start
+
+    print(f"\n200 rewritten paragraphs of 5,000: {elapsed * 1000:.1f} ms")
+    assert html_diff.count('<span class="diff_chg">') == 400
+    assert elapsed < 2
+    assert app.DIFF_ENGINES['patience'] is SideBySideDiff
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_patience_opcodes_rebuild_revised()
+    test_table_matches_html_diff_rows()
+    test_intraline_marks_tokens()
+    test_word_and_character_intraline()
+    test_rewritten_section_is_fast()
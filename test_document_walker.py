@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test that the iterative document walker matches the original recursive walker
+"""
+
+import io
+import sys
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer
+from benchmark_document_walker import nested_table_docx, recursive_walk
+
+
+def document_root(docx_bytes):
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as docx_zip:
+        return ET.fromstring(docx_zip.read('word/document.xml'))
+
+
+def test_iterative_walker_matches_recursive():
+    """Same starts, ends and text on nested tables"""
+
+    analyzer = WordDocumentAnalyzer()
+    root = document_root(nested_table_docx(blocks=20, depth=5))
+
+    expected = ({}, {}, [])
+    recursive_walk(root, *expected)
+
+    actual = ({}, {}, [])
+    analyzer.walk_document_for_comments(root, None, *actual)
+
+    print("🧪 Testing Iterative Walker")
+    print("=" * 50)
+    print(f"Starts: {len(actual[0])}, ends: {len(actual[1])}, text elements: {len(actual[2])}")
+
+    assert actual[0] == expected[0]
+    assert actual[1] == expected[1]
+    assert [(item['text'], item['position']) for item in actual[2]] == \
+        [(item['text'], item['position']) for item in expected[2]]
+    print("  ✅ PASSED")
+
+
+def test_deep_nesting_does_not_recurse():
+    """Nesting deeper than the recursion limit is handled by every extraction path"""
+
+    analyzer = WordDocumentAnalyzer()
+    docx_bytes = nested_table_docx(blocks=2, depth=sys.getrecursionlimit())
+    root = document_root(docx_bytes)
+
+    comment_starts, comment_ends, text_content = {}, {}, []
+    analyzer.walk_document_for_comments(root, None, comment_starts, comment_ends, text_content)
+    assert analyzer.extract_text_range(text_content, comment_starts['1'], comment_ends['1']) == 'target 1'
+
+    data = analyzer.extract_document_data_streaming(io.BytesIO(docx_bytes))
+    assert [c['associated_text'] for c in data['comments']] == ['target 0', 'target 1']
+    print("  ✅ PASSED (deep nesting)")
+
+
+if __name__ == "__main__":
+    test_iterative_walker_matches_recursive()
+    test_deep_nesting_does_not_recurse()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed extraction cache
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer, ExtractionCache, CompactParagraphs
+from create_comment_docs import build_docx_bytes
+
+
+def test_repeat_upload_skips_extraction():
+    """Identical bytes are extracted once; sessions get independent comment lists"""
+
+    app.extraction_cache = ExtractionCache(max_entries=4)
+    analyzer = WordDocumentAnalyzer()
+    docx_bytes = build_docx_bytes(
+        paragraphs=[['Johnny went to the store. ', (1, 'Johnny'), ' likes shopping.']],
+        comments={1: ('Editor', 'change all Johnny to Jimmy')},
+    )
+
+    print("🧪 Testing Extraction Cache")
+    print("=" * 50)
+
+    first = analyzer.extract_documents_parallel({'original': docx_bytes})[0]['original']
+    second = analyzer.extract_documents_parallel({'original': docx_bytes})[0]['original']
+
+    stats = app.extraction_cache.stats()
+    print(f"Stats after two uploads: {stats}")
+    assert stats['misses'] == 1 and stats['memory_hits'] == 1
+    assert first == second
+
+    # analyze_documents replaces the comment list with scoped copies
+    first['comments'] = [dict(first['comments'][0], user_scope='global')]
+    third = analyzer.extract_documents_parallel({'original': docx_bytes})[0]['original']
+    assert 'user_scope' not in third['comments'][0]
+    print("  ✅ PASSED")
+
+
+def test_lru_eviction_and_disk_tier():
+    """Evicted entries come back from disk when a cache directory is configured"""
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ExtractionCache(max_entries=2, cache_dir=cache_dir)
+        for i in range(3):
+            paragraphs = CompactParagraphs.from_runs([[str(i), ' run']])
+            cache.put(f'key{i}', {'paragraphs': paragraphs, 'comments': [], 'full_text': paragraphs.full_text})
+
+        stats = cache.stats()
+        assert stats['entries'] == 2
+        restored = cache.get('key0')
+        assert restored['full_text'] == '0 run'
+        assert restored['paragraphs'][0]['runs'] == [{'text': '0'}, {'text': ' run'}]
+        assert cache.get('missing') is None
+
+        stats = cache.stats()
+        print(f"\nStats with disk tier: {stats}")
+        assert stats['disk_hits'] == 1 and stats['misses'] == 1
+
+        # A fresh process sees the on-disk tier
+        assert ExtractionCache(max_entries=2, cache_dir=cache_dir).get('key1')['full_text'] == '1 run'
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_repeat_upload_skips_extraction()
+    test_lru_eviction_and_disk_tier()
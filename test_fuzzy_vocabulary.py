@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test that the fuzzy vocabulary index finds what difflib.get_close_matches finds
+"""
+
+import sys
+import os
+import difflib
+import random
+import string
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer, FuzzyVocabulary
+
+
+def misspell(rng, word):
+    """One substitution, deletion or insertion"""
+    chars = list(word)
+    i = rng.randrange(len(chars))
+    operation = rng.random()
+    if operation < 0.3:
+        chars[i] = rng.choice(string.ascii_lowercase)
+    elif operation < 0.6 and len(chars) > 1:
+        del chars[i]
+    else:
+        chars.insert(i, rng.choice(string.ascii_lowercase))
+    return ''.join(chars)
+
+
+def test_matches_get_close_matches():
+    """Same best match, cutoff and tie-breaking over misspellings and random words"""
+
+    rng = random.Random(42)
+    syllables = ['re', 'ce', 'ive', 'an', 'the', 'ing', 'ly', 'ab', 'so', 'lut', 'sep', 'ar', 'ate', 'cl', 'aire', 'di']
+    words = {''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(4000)}
+    words.update(['receive', 'absolutely', 'separate', 'claire', 'diane', 'the', 'ab', 'ba'])
+    vocabulary = FuzzyVocabulary(words)
+
+    queries = [misspell(rng, word) for word in rng.sample(sorted(words), 200)]
+    queries += ['recieve', 'absolutly', 'seperate', 'clare', 'teh', 'ba', 'zzzz', 'q']
+
+    print("🧪 Testing Fuzzy Vocabulary")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    expected = [(difflib.get_close_matches(query, words, n=1, cutoff=0.6) or [None])[0] for query in queries]
+    difflib_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    actual = [vocabulary.close_match(query, cutoff=0.6) for query in queries]
+    index_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(queries)} queries over {len(words)} words: difflib {difflib_ms:.1f} ms, index {index_ms:.1f} ms")
+    assert actual == expected
+    assert vocabulary.close_match('recieve') == 'receive'
+    assert vocabulary.close_match('zzzz') is None
+    print("  ✅ PASSED")
+
+
+def test_single_word_inference():
+    """A single-word comment infers the replaced word through the index"""
+
+    analyzer = WordDocumentAnalyzer()
+    original_text = "She will recieve the letter. You receive mail."
+    revised_text = "She will receive the letter. You get mail."
+    intent = analyzer.parse_comment_intent('receive')
+
+    validation = analyzer.validate_change_application(intent, original_text, revised_text)
+    print(f"\nSingle word: {validation['message']}")
+    assert validation['status'] == 'correctly_applied'
+    assert validation['details']['inferred_from'] == 'recieve'
+    print("  ✅ PASSED (single word)")
+
+
+if __name__ == "__main__":
+    test_matches_get_close_matches()
+    test_single_word_inference()
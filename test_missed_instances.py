@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test that missed instances are highlighted while the diff table is built
+"""
+
+import sys
+import os
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer, NormalizedText, AnnotatedHtmlDiff, SideBySideDiff
+
+MISSED_SPAN = '<span class="missed-instance"'
+
+
+def partial_global_change(comment_text, from_text):
+    return [{
+        'comment': {'text': comment_text},
+        'intent': {'scope': 'global', 'from_text': from_text},
+        'validation': {'status': 'partially_applied'},
+    }]
+
+
+def test_spans_are_marked_in_unchanged_lines():
+    """Every occurrence is highlighted, including lines far from any change"""
+
+    analyzer = WordDocumentAnalyzer()
+    original = ['Johnny went home.'] + [f'Filler paragraph {i}.' for i in range(50)] + ['Then Johnny left, JOHNNY too.']
+    revised = ['Jimmy went home.'] + original[1:]
+
+    print("🧪 Testing Missed-Instance Annotation")
+    print("=" * 50)
+
+    for engine in ('patience', 'difflib'):
+        html_diff = analyzer.generate_enhanced_diff(
+            original, revised, partial_global_change('change all Johnny to Jimmy', 'Johnny'), engine=engine)
+        print(f"{engine}: {html_diff.count(MISSED_SPAN)} highlighted spans")
+        if engine == 'patience':
+            # Unchanged annotated lines are pulled into the context table
+            assert 'Found 1 missed instance(s)' in html_diff
+            assert html_diff.count(MISSED_SPAN) == 2
+            assert '>52</td>' in html_diff
+            assert f'{MISSED_SPAN} title="Missed instance for comment: change all Johnny to Jimmy">JOHNNY</span>' in html_diff
+        else:
+            # HtmlDiff leaves the line out, and the summary does not count it
+            assert html_diff.count(MISSED_SPAN) == 0
+            assert 'missed instance(s)' not in html_diff
+
+    # HtmlDiff marks the annotated lines it shows as context
+    html_diff = analyzer.generate_enhanced_diff(
+        original[:1] + original[-1:], revised[:1] + revised[-1:],
+        partial_global_change('change all Johnny to Jimmy', 'Johnny'), engine='difflib')
+    assert html_diff.count(MISSED_SPAN) == 2
+    assert 'Found 1 missed instance(s)' in html_diff
+    print("  ✅ PASSED")
+
+
+def test_title_is_escaped():
+    """Comment text cannot break out of the title attribute"""
+
+    analyzer = WordDocumentAnalyzer()
+    comment_text = 'change "Johnny" everywhere <script>alert(1)</script>'
+    html_diff = analyzer.generate_enhanced_diff(
+        ['Johnny left.', 'Johnny came.'], ['Jimmy left.', 'Johnny came.'],
+        partial_global_change(comment_text, 'Johnny'))
+
+    assert '<script>' not in html_diff
+    assert 'title="Missed instance for comment: change &quot;Johnny&quot; everywhere &lt;script&gt;' in html_diff
+    print("\n  ✅ PASSED (escaped title)")
+
+
+def test_spans_nest_with_change_markers():
+    """A span that crosses a change marker is closed and reopened around it"""
+
+    marked = AnnotatedHtmlDiff._mark_annotations('ab\0^cd\1ef', [(1, 5, 0)])
+    assert marked == 'a\x020\x03b\x04\0^\x020\x03cd\x04\1\x020\x03e\x04f'
+
+    table = SideBySideDiff(annotations={0: [(2, 8, 'tab')]}).make_table(
+        ['a\tJohnny b'], ['a\tJohnny c'], context=True, numlines=3)
+    assert f'{MISSED_SPAN} title="tab">Johnny</span>' in table
+
+    view = NormalizedText('First line\nSay  ‘Johnny’ twice')
+    line, start, end = view.line_span(view.locate('Johnny')[0], len('johnny'))
+    assert (line, 'Say  ‘Johnny’ twice'[start:end]) == (1, 'Johnny')
+    print("\n  ✅ PASSED (nesting and offsets)")
+
+
+def test_many_missed_instances_render_in_linear_time():
+    """Hundreds of missed replacements cost one pass over the table"""
+
+    analyzer = WordDocumentAnalyzer()
+    timings = []
+    for paragraph_count in (500, 2000):
+        original = [f'Paragraph {i}: Johnny met Johnny.' for i in range(paragraph_count)]
+        revised = [line.replace('Johnny', 'Jimmy') if i % 2 else line for i, line in enumerate(original)]
+        results = partial_global_change('change all Johnny to Jimmy', 'Johnny')
+
+        start = time.perf_counter()
+        html_diff = analyzer.generate_enhanced_diff(original, revised, results)
+        timings.append(time.perf_counter() - start)
+        assert html_diff.count(MISSED_SPAN) == paragraph_count
+
+    print(f"\n500 paragraphs: {timings[0] * 1000:.1f} ms, 2,000 paragraphs: {timings[1] * 1000:.1f} ms")
+    assert timings[1] < timings[0] * 10
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_spans_are_marked_in_unchanged_lines()
+    test_title_is_escaped()
+    test_spans_nest_with_change_markers()
+    test_many_missed_instances_render_in_linear_time()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the normalized text views and whole-word term counts shared by the validators
+"""
+
+import sys
+import os
+import random
+import re
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer, NormalizedText
+
+
+def reference_count(text, term):
+    """Non-overlapping, case-insensitive, whole-word count with one regex per term"""
+    pattern = re.escape(term.lower())
+    if re.match(r'\w', term):
+        pattern = r'(?<!\w)' + pattern
+    if re.match(r'\w', term[-1]):
+        pattern += r'(?!\w)'
+    return len(re.findall(pattern, text.lower()))
+
+
+def test_counts_match_reference():
+    """Words, phrases and punctuated terms, known up front or counted on first use"""
+
+    rng = random.Random(7)
+    vocabulary = ['real', 'reel', 'really', 'Real', 'Johnny', "Johnny's", 'the', 'Acme', 'Corp', 'a', '-', ',']
+    text = ' '.join(rng.choice(vocabulary) for _ in range(5000))
+    terms = ['real', 'REEL', 'Johnny', "johnny's", 'acme corp', 'the the', 'a a', ', real', 'real ', 'missing']
+
+    print("🧪 Testing Term Counts")
+    print("=" * 50)
+
+    known = NormalizedText(text, terms)
+    # Terms starting with a word are located up front
+    assert {term.lower() for term in terms if re.match(r'\w', term)} <= set(known.locations)
+    for term in terms:
+        assert known.count(term) == reference_count(text, term), term
+        print(f"  {term!r}: {known.count(term)}")
+
+    # Terms not collected up front are counted on demand
+    on_demand = NormalizedText(text)
+    for term in terms:
+        assert on_demand.count(term) == reference_count(text, term), term
+    print("  ✅ PASSED")
+
+
+def test_whole_word_matching():
+    """'real' is not counted inside 'really' or 'unreal'"""
+
+    counts = NormalizedText("Really, the real thing is unreal. REAL.", ['real'])
+    assert counts.count('real') == 2
+    assert counts.count('Really') == 1
+    print("\n  ✅ PASSED (whole words)")
+
+
+def test_session_counts_feed_validation():
+    """Every comment's terms are counted before validation, giving the same results"""
+
+    analyzer = WordDocumentAnalyzer()
+    original_text = "Johnny went home. Johnny said the weather was nice. It was a real treat."
+    revised_text = "Jimmy went home. Jimmy said the weather was excellent. It was a reel treat."
+    comments = [
+        {'text': 'change all Johnny to Jimmy', 'associated_text': 'Johnny', 'user_scope': 'global'},
+        {'text': 'change nice to excellent', 'associated_text': 'nice'},
+        {'text': 'real? reel', 'associated_text': 'real'},
+        {'text': 'reel', 'associated_text': ''},
+    ]
+
+    text_views = analyzer.count_comment_terms(comments, original_text, revised_text)
+    assert {'johnny', 'jimmy', 'nice', 'excellent', 'real', 'reel'} <= set(text_views['original'].locations)
+
+    for comment in comments:
+        shared = analyzer.fallback_analyze_comment(comment, original_text, revised_text, text_views)
+        alone = analyzer.fallback_analyze_comment(comment, original_text, revised_text)
+        print(f"\n{comment['text']!r}: {shared['validation']['status']}")
+        assert shared['validation'] == alone['validation']
+        assert shared['validation']['status'] == 'correctly_applied'
+    print("  ✅ PASSED (session counts)")
+
+
+def test_smart_quotes_and_offsets():
+    """Curly apostrophes, case and whitespace are normalized; offsets lead back to the raw text"""
+
+    raw = "It’s  STRASSE\n\tand “Quoted”. Don’t stop."
+    view = NormalizedText(raw)
+
+    print(f"\nNormalized: {view.text!r}")
+    assert view.text == "it's strasse and \"quoted\". don't stop."
+    assert view.count("it's") == 1 and view.count('IT’S') == 1
+    assert view.count('strasse and') == 1
+    assert sorted(view.contractions) == ["don't", "it's"]
+
+    # Every normalized character maps back to a raw position
+    offsets = [view.raw_offset(i) for i in range(len(view.text))]
+    assert offsets == sorted(offsets)
+    assert raw[view.raw_offset(view.text.index('quoted'))] == 'Q'
+    assert raw[view.raw_offset(view.text.index("don't")):].startswith('Don’t')
+
+    folded = NormalizedText('Groß  Straße')
+    assert folded.text == 'gross strasse'
+    assert 'Groß  Straße'[folded.raw_offset(folded.text.index('strasse'))] == 'S'
+    print("  ✅ PASSED (normalization)")
+
+
+def test_curly_apostrophes_in_validation():
+    """Contractions typed with Word's apostrophe are found by the style validator"""
+
+    analyzer = WordDocumentAnalyzer()
+    original_text = "It’s late and we can’t stay."
+    revised_text = "It is late and we cannot stay."
+    intent = analyzer.parse_comment_intent("Don't use contractions", "It’s late and we can’t stay.")
+
+    validation = analyzer.validate_change_application(intent, original_text, revised_text)
+    print(f"\nCurly contractions: {validation['message']}")
+    assert validation['status'] == 'correctly_applied'
+    assert validation['details']['original_contractions'] == 2
+    print("  ✅ PASSED (curly apostrophes)")
+
+
+def test_postings_locate_missed_instances():
+    """Locations map to diff lines; missed-instance highlighting comes from the index"""
+
+    analyzer = WordDocumentAnalyzer()
+    revised_lines = ['Jimmy went home.', 'Johnny said hello.', 'No one here.', 'Then JOHNNY left, Johnny too.']
+    view = NormalizedText('\n'.join(revised_lines))
+
+    assert list(view.postings['johnny']) == [view.text.index('johnny said'), view.text.index('johnny left'),
+                                            view.text.index('johnny too')]
+    assert [view.line_of(index) for index in view.locate('Johnny')] == [1, 3, 3]
+
+    original = NormalizedText('Johnny went home. Johnny said hello.')
+    assert original.removed_words(view) == set()
+    assert NormalizedText('Johnny walked').removed_words(view) == {'walked'}
+
+    results = [{
+        'comment': {'text': 'change all Johnny to Jimmy'},
+        'intent': {'scope': 'global', 'from_text': 'Johnny'},
+        'validation': {'status': 'partially_applied'},
+    }]
+    html = analyzer.generate_enhanced_diff(['Johnny went home.'] + revised_lines[1:], revised_lines, results, view)
+    print(f"\nMissed-instance lines: {html.count('missed-instance')}")
+    assert 'Found 2 missed instance(s)' in html
+    print("  ✅ PASSED (postings)")
+
+
+if __name__ == "__main__":
+    test_counts_match_reference()
+    test_whole_word_matching()
+    test_session_counts_feed_validation()
+    test_smart_quotes_and_offsets()
+    test_curly_apostrophes_in_validation()
+    test_postings_locate_missed_instances()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test that AI analysis runs comments concurrently and keeps their order
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer
+
+# Simulated latency of one AI request, in seconds
+AI_LATENCY = 0.2
+
+
+class SlowAnalyzer(WordDocumentAnalyzer):
+    """Stands in for the AI with a fixed delay; comments containing 'fail' raise"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.lock = threading.Lock()
+
+    def ai_analyze_comment(self, comment, original_text, revised_text, text_views=None):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(AI_LATENCY)
+            if 'fail' in comment['text']:
+                raise RuntimeError('simulated API error')
+            return {'comment': comment, 'intent': {}, 'validation': {'status': 'correctly_applied'},
+                    'requires_manual_review': False, 'ai_powered': True}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def with_ai_client(func):
+    """Run func as if an AI client were configured, sending every comment to it"""
+    get_client = app.get_anthropic_client
+    triage = app.app.config['AI_TRIAGE_CONFIDENCE']
+    app.get_anthropic_client = lambda: object()
+    app.app.config['AI_TRIAGE_CONFIDENCE'] = float('inf')
+    try:
+        return func()
+    finally:
+        app.get_anthropic_client = get_client
+        app.app.config['AI_TRIAGE_CONFIDENCE'] = triage
+
+
+def test_comments_run_concurrently_in_order():
+    """Twenty comments take about as long as one, and a failure falls back on its own"""
+
+    analyzer = SlowAnalyzer()
+    comments = [{'id': str(i), 'text': f'comment {i}', 'associated_text': ''} for i in range(20)]
+    comments[7] = {'id': '7', 'text': 'fail: change all Johnny to Jimmy', 'associated_text': 'Johnny'}
+
+    print("🧪 Testing Parallel AI Analysis")
+    print("=" * 50)
+
+    concurrency = app.app.config['AI_CONCURRENCY']
+    app.app.config['AI_CONCURRENCY'] = 20
+    try:
+        start = time.perf_counter()
+        results = with_ai_client(lambda: analyzer.analyze_comments_with_ai(
+            comments, 'Johnny went home. Johnny left.', 'Jimmy went home. Johnny left.'))
+        elapsed = time.perf_counter() - start
+    finally:
+        app.app.config['AI_CONCURRENCY'] = concurrency
+
+    print(f"20 comments in {elapsed * 1000:.0f} ms ({analyzer.most_in_flight} in flight at most)")
+    assert [result['comment']['id'] for result in results] == [str(i) for i in range(20)]
+    assert [result['ai_powered'] for result in results].count(False) == 1
+    assert not results[7]['ai_powered'] and results[7]['validation']['status'] == 'partially_applied'
+    assert elapsed < AI_LATENCY * 4
+    print("  ✅ PASSED")
+
+
+def test_concurrency_limit():
+    """No more than AI_CONCURRENCY requests are in flight"""
+
+    analyzer = SlowAnalyzer()
+    comments = [{'id': str(i), 'text': f'comment {i}', 'associated_text': ''} for i in range(6)]
+
+    concurrency = app.app.config['AI_CONCURRENCY']
+    app.app.config['AI_CONCURRENCY'] = 2
+    try:
+        results = with_ai_client(lambda: analyzer.analyze_comments_with_ai(comments, 'a', 'b'))
+    finally:
+        app.app.config['AI_CONCURRENCY'] = concurrency
+
+    print(f"\nAt most {analyzer.most_in_flight} requests in flight with a limit of 2")
+    assert analyzer.most_in_flight == 2
+    assert [result['comment']['id'] for result in results] == [str(i) for i in range(6)]
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_comments_run_concurrently_in_order()
+    test_concurrency_limit()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test concurrent extraction of the original and revised documents
+"""
+
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import WordDocumentAnalyzer, ExtractionCache
+from create_comment_docs import build_docx_bytes
+
+
+def test_parallel_extraction():
+    """Both documents are extracted, and a bad document is reported on its own"""
+
+    app.extraction_cache = ExtractionCache(max_entries=4)
+    analyzer = WordDocumentAnalyzer()
+
+    original = build_docx_bytes(
+        paragraphs=[['Johnny went to the store. ', (1, 'Johnny'), ' likes shopping.']],
+        comments={1: ('Editor', 'change all Johnny to Jimmy')},
+    )
+    revised = build_docx_bytes(paragraphs=[['Jimmy went to the store. Jimmy likes shopping.']])
+
+    print("🧪 Testing Parallel Extraction")
+    print("=" * 50)
+
+    extracted, errors = analyzer.extract_documents_parallel({'original': original, 'revised': revised})
+    print(f"Extracted: {sorted(extracted)}, errors: {errors}")
+    assert not errors
+    assert extracted['original'] == analyzer.extract_documents_parallel({'original': original})[0]['original']
+    assert extracted['revised']['full_text'] == 'Jimmy went to the store. Jimmy likes shopping.'
+
+    extracted, errors = analyzer.extract_documents_parallel({'original': original, 'revised': b'not a docx'})
+    print(f"Extracted: {sorted(extracted)}, errors: {errors}")
+    assert sorted(extracted) == ['original']
+    assert 'revised' in errors
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_parallel_extraction()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test that reports are rendered once per session until the analysis changes
+"""
+
+import sys
+import os
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, analyzer, CompactParagraphs
+
+
+def session(original_paragraphs, revised_paragraphs, comments):
+    original = CompactParagraphs.from_runs([[text] for text in original_paragraphs])
+    revised = CompactParagraphs.from_runs([[text] for text in revised_paragraphs])
+    return {
+        'original': {'paragraphs': original, 'comments': comments, 'full_text': original.full_text},
+        'revised': {'paragraphs': revised, 'comments': [], 'full_text': revised.full_text},
+        'original_file': 'original.docx',
+        'revised_file': 'revised.docx',
+        'timestamp': '2026-01-01T00:00:00',
+    }
+
+
+def test_repeat_views_use_the_stored_report():
+    """A second view of the same report does not rebuild it"""
+
+    paragraphs = [f'Paragraph {i}: Johnny walked to the market.' for i in range(3000)]
+    revised = [text.replace('Johnny', 'Jimmy') if i % 3 else text for i, text in enumerate(paragraphs)]
+    analyzer.session_data['cached'] = session(paragraphs, revised, [])
+    analyzer.session_data['cached']['analysis_results'] = []
+
+    print("🧪 Testing Report Cache")
+    print("=" * 50)
+
+    client = app.test_client()
+    start = time.perf_counter()
+    assert client.get('/report/cached').status_code == 200
+    first = time.perf_counter() - start
+    report = analyzer.generate_comparison_report('cached')
+
+    start = time.perf_counter()
+    assert client.get('/report/cached').status_code == 200
+    repeat = time.perf_counter() - start
+
+    print(f"First view: {first * 1000:.1f} ms, repeat view: {repeat * 1000:.1f} ms")
+    assert analyzer.generate_comparison_report('cached') is report
+    assert analyzer.generate_comparison_report('cached', 'bogus') is report
+    assert analyzer.generate_comparison_report('cached', 'char') is not report
+    assert repeat < first
+    print("  ✅ PASSED")
+
+
+def test_analysis_invalidates_reports():
+    """Storing new analysis results replaces the stored reports"""
+
+    comments = [{'id': '1', 'author': 'Editor', 'text': 'change all Johnny to Jimmy',
+                 'associated_text': 'Johnny', 'date': ''}]
+    analyzer.session_data['reanalyzed'] = session(
+        ['Johnny went home.', 'Johnny said hello.'], ['Jimmy went home.', 'Johnny said hello.'], comments)
+    analyzer.session_data['reanalyzed']['analysis_results'] = []
+
+    before = analyzer.generate_comparison_report('reanalyzed')
+    assert before['analysis_results'] == []
+
+    client = app.test_client()
+    response = client.post('/analyze/reanalyzed', json={'scope_0': 'global'})
+    assert response.status_code == 200
+
+    after = analyzer.generate_comparison_report('reanalyzed')
+    print(f"\nStatus after analysis: {after['analysis_results'][0]['validation']['status']}")
+    assert after is not before and len(after['analysis_results']) == 1
+    assert 'missed-instance' in after['diff_html']
+    assert analyzer.generate_comparison_report('reanalyzed') is after
+    print("  ✅ PASSED")
+
+
+if __name__ == "__main__":
+    test_repeat_views_use_the_stored_report()
+    test_analysis_invalidates_reports()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test that the streaming extractor returns exactly what the python-docx path returns
+"""
+
+import sys
+import os
+import io
+import tempfile
+import zipfile
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from docx import Document
+from app import WordDocumentAnalyzer
+from create_comment_docs import build_docx_bytes, nested_table_xml, paragraph_xml
+
+
+def legacy_extract(analyzer, path):
+    """The original python-docx + ZIP + relationship extraction"""
+    doc = Document(path)
+    paragraphs = [{
+        'index': i,
+        'text': para.text,
+        'runs': [{'text': run.text} for run in para.runs]
+    } for i, para in enumerate(doc.paragraphs)]
+    return {
+        'paragraphs': paragraphs,
+        'comments': analyzer.extract_comments(doc),
+        'full_text': '\n'.join([p['text'] for p in paragraphs])
+    }
+
+
+ANCHOR_KEYS = ('anchor_offset', 'anchor_end_offset', 'paragraph_index')
+
+FIXTURES = {
+    'word comments': build_docx_bytes(
+        paragraphs=[
+            ['Johnny went to the store. ', (1, 'Johnny'), ' likes shopping.'],
+            ['The weather was ', (2, 'absolutly'), ' beautiful today.'],
+        ],
+        comments={1: ('Editor', 'change all Johnny to Jimmy'), 2: ('Editor', 'Spelling mistake')},
+    ),
+    'inline markers only': build_docx_bytes(paragraphs=[
+        ['The weather is nice today. ', '[COMMENT: change nice to excellent]'],
+    ]),
+    'tables, tabs and breaks': build_docx_bytes(
+        body_xml=(
+            paragraph_xml(['Intro ', (5, 'first')])
+            + '<w:p><w:r><w:t>a</w:t><w:tab/><w:t>b</w:t><w:br/><w:t>c</w:t></w:r></w:p>'
+            + nested_table_xml(3, paragraph_xml(['Deep ', (6, 'cell text')]))
+            + paragraph_xml(['Outro'])
+        ),
+        comments={5: ('A', 'expand'), 6: ('B', 'Nested comment')},
+    ),
+    'empty comment body': build_docx_bytes(
+        paragraphs=[['Only ', (1, 'one'), ' comment.']],
+        comments={1: ('Editor', '   ')},
+    ),
+}
+
+
+def test_streaming_matches_python_docx():
+    """Streaming extraction must be a drop-in replacement for the python-docx path"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    print("🧪 Testing Streaming Extraction Parity")
+    print("=" * 50)
+
+    for name, docx_bytes in FIXTURES.items():
+        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as f:
+            f.write(docx_bytes)
+            path = f.name
+        try:
+            streamed = analyzer.extract_document_data_streaming(path)
+            legacy = legacy_extract(analyzer, path)
+        finally:
+            os.unlink(path)
+
+        # Anchors are extra information only the streaming path can provide
+        for comment in streamed['comments']:
+            for key in ANCHOR_KEYS:
+                comment.pop(key, None)
+
+        print(f"\n{name}: {len(streamed['paragraphs'])} paragraphs, {len(streamed['comments'])} comments")
+        assert streamed == legacy, f"{name}: streaming result differs from python-docx result"
+        print("  ✅ PASSED")
+
+
+def test_comment_anchors():
+    """Anchors give the paragraph and absolute offset of the commented text in full_text"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    # Long overlapping ranges, as in legal redlines, across several paragraphs
+    body_xml = ''
+    comment_count = 200
+    for i in range(comment_count):
+        body_xml += f'<w:p><w:commentRangeStart w:id="{i}"/><w:r><w:t>Clause {i} applies.</w:t></w:r></w:p>'
+    body_xml += ''.join(f'<w:commentRangeEnd w:id="{i}"/>' for i in range(comment_count))
+    body_xml += '<w:p><w:r><w:t>End.</w:t></w:r></w:p>'
+
+    docx_bytes = build_docx_bytes(
+        body_xml=paragraph_xml(['It\'s here and ', ('a', "it's"), ' there.']) + body_xml,
+        comments={'a': ('Editor', 'expand'), **{i: ('Editor', f'note {i}') for i in range(comment_count)}},
+    )
+
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as docx_zip, docx_zip.open('word/document.xml') as xml_stream:
+        part = analyzer.stream_document_part(xml_stream)
+    data = analyzer.extract_document_data_streaming(io.BytesIO(docx_bytes))
+
+    full_text = data['full_text']
+    anchor = part['comment_anchors']['a']
+    print(f"\nAnchor for 'a': {anchor}")
+    assert anchor['paragraph_index'] == 0
+    assert full_text[anchor['offset']:anchor['end_offset']] == "it's"
+
+    anchor = part['comment_anchors']['7']
+    assert anchor['paragraph_index'] == 8
+    assert full_text[anchor['offset']:].startswith('Clause 7 applies.')
+
+    comments = {c['id']: c for c in data['comments']}
+    assert comments['0']['associated_text'].startswith('Clause 0 applies.Clause 1 applies.')
+    assert comments['199']['associated_text'] == 'Clause 199 applies.'
+    assert comments['a']['anchor_offset'] == 14
+    assert comments['7']['paragraph_index'] == 8
+    print("  ✅ PASSED")
+
+
+def test_context_uses_anchor():
+    """Context windows come from the commented occurrence, not the first match"""
+
+    analyzer = WordDocumentAnalyzer()
+
+    paragraphs = [[f"Line {i}: it's fine."] for i in range(300)]
+    paragraphs.append(['Marker paragraph where ', ('c', "it's"), ' the one.'])
+    docx_bytes = build_docx_bytes(paragraphs=paragraphs, comments={'c': ('Editor', "Don't use contractions")})
+
+    data = analyzer.extract_document_data_streaming(io.BytesIO(docx_bytes))
+    comment = data['comments'][0]
+    context = analyzer.extract_comment_context(comment, data['full_text'], data['full_text'])
+
+    print(f"\nContext for commented \"it's\": '{context['original_context']}'")
+    assert context['position'] == comment['anchor_offset']
+    assert 'Marker paragraph' in context['original_context']
+    print("  ✅ PASSED")
+
+
+def test_comment_in_table_has_no_anchor():
+    """Body paragraph offsets cannot place a comment inside a table cell"""
+
+    analyzer = WordDocumentAnalyzer()
+    docx_bytes = build_docx_bytes(
+        body_xml=(
+            nested_table_xml(1, paragraph_xml([(1, 'Johnny in table')]))
+            + paragraph_xml(['Johnny outside later.'])
+        ),
+        comments={1: ('Editor', 'change Johnny to Jimmy')},
+    )
+
+    data = analyzer.extract_document_data_streaming(io.BytesIO(docx_bytes))
+    comment = data['comments'][0]
+    print(f"\nTable comment: {comment['associated_text']!r}, anchor {comment.get('anchor_offset')}")
+    assert comment['associated_text'] == 'Johnny in table'
+    assert 'anchor_offset' not in comment
+
+    # A stale anchor that does not point at the commented text is not trusted
+    full_text = 'Johnny in table\nJohnny outside later.'
+    stale = dict(comment, anchor_offset=full_text.index('Johnny outside'))
+    context = analyzer.extract_comment_context(stale, full_text, full_text)
+    assert context['position'] == 0
+    print("  ✅ PASSED")
+
+
+def test_in_memory_python_docx_fallback():
+    """Packages with a non-standard comments part fall back to python-docx without touching disk"""
+
+    analyzer = WordDocumentAnalyzer()
+    docx_bytes = build_docx_bytes(
+        paragraphs=[['Johnny went to the store. ', (1, 'Johnny'), ' likes shopping.']],
+        comments={1: ('Editor', 'change all Johnny to Jimmy')},
+    )
+
+    # Move word/comments.xml to word/comments1.xml
+    moved = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as source, zipfile.ZipFile(moved, 'w') as target:
+        for name in source.namelist():
+            content = source.read(name)
+            if name == 'word/comments.xml':
+                name = 'word/comments1.xml'
+            elif name in ('[Content_Types].xml', 'word/_rels/document.xml.rels'):
+                content = content.replace(b'comments.xml', b'comments1.xml')
+            target.writestr(name, content)
+
+    moved.seek(0)
+    assert analyzer.extract_document_data_streaming(moved) is None
+
+    data = analyzer.extract_document_data(io.BytesIO(moved.getvalue()))
+    print(f"\nFallback comments: {[(c['text'], c['associated_text']) for c in data['comments']]}")
+    assert [c['associated_text'] for c in data['comments']] == ['Johnny']
+    print("  ✅ PASSED")
+
+
+def test_compact_paragraph_model():
+    """Paragraphs share full_text and only build run dicts on request"""
+
+    analyzer = WordDocumentAnalyzer()
+    docx_bytes = build_docx_bytes(paragraphs=[['First ', 'run'], [], ['Third']])
+    data = analyzer.extract_document_data_streaming(io.BytesIO(docx_bytes))
+    paragraphs = data['paragraphs']
+
+    assert paragraphs.full_text is data['full_text']
+    assert len(paragraphs) == 3
+    assert paragraphs[0]['text'] == 'First run'
+    assert paragraphs[0]['runs'] == [{'text': 'First '}, {'text': 'run'}]
+    assert paragraphs[1]['text'] == '' and paragraphs[1]['runs'] == []
+    assert paragraphs[-1].index == 2
+    assert [p.text for p in paragraphs] == ['First run', '', 'Third']
+    print("\n  ✅ PASSED (compact paragraphs)")
+
+
+if __name__ == "__main__":
+    test_streaming_matches_python_docx()
+    test_comment_anchors()
+    test_context_uses_anchor()
+    test_comment_in_table_has_no_anchor()
+    test_in_memory_python_docx_fallback()
+    test_compact_paragraph_model()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the original-to-revised alignment used for revised comment context
+"""
+
+import sys
+import os
+import random
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import WordDocumentAnalyzer, TextAlignment
+
+
+def test_alignment_is_monotone_and_exact_on_shared_text():
+    """Unchanged text maps exactly; the map never runs backwards"""
+
+    rng = random.Random(5)
+    words = [f'word{rng.randrange(5000)}' for _ in range(20000)]
+    original_text = ' '.join(words)
+
+    # Insert a paragraph near the start, delete a stretch in the middle and edit words
+    revised_words = words[:100] + ['inserted'] * 50 + words[100:9000] + words[9500:]
+    for i in range(0, len(revised_words), 997):
+        revised_words[i] = 'edited'
+    revised_text = ' '.join(revised_words)
+
+    alignment = TextAlignment(original_text, revised_text)
+
+    print("🧪 Testing Text Alignment")
+    print("=" * 50)
+    print(f"Anchors: {len(alignment.original_offsets)} over {len(words)} words")
+
+    assert list(alignment.original_offsets) == sorted(alignment.original_offsets)
+    assert list(alignment.revised_offsets) == sorted(alignment.revised_offsets)
+
+    mapped = [alignment.map(position) for position in range(0, len(original_text), 101)]
+    assert mapped == sorted(mapped)
+
+    # A word after the insertion lands on the same word in the revised text
+    position = original_text.index(' '.join(words[5000:5004]))
+    assert revised_text[alignment.map(position):].startswith(' '.join(words[5000:5004]))
+    print("  ✅ PASSED")
+
+
+def test_increasing_chain():
+    chain = TextAlignment.increasing_chain([3, 1, 4, 1, 5, 9, 2, 6])
+    values = [[3, 1, 4, 1, 5, 9, 2, 6][i] for i in chain]
+    assert len(chain) == 4 and values == sorted(values)
+    assert TextAlignment.increasing_chain([]) == []
+    print("\n  ✅ PASSED (increasing chain)")
+
+
+def test_revised_context_follows_the_commented_occurrence():
+    """The revised context comes from the commented paragraph, not the first similar text"""
+
+    analyzer = WordDocumentAnalyzer()
+    filler = [f"Paragraph {i} says the weather was nice and calm." for i in range(50)]
+    original_text = '\n'.join(filler + ["Later the weather was nice and sunny."] + filler)
+    revised_text = '\n'.join(filler + ["Later the weather was excellent and sunny."] + filler)
+
+    comment = {
+        'text': 'change nice to excellent',
+        'associated_text': 'nice',
+        'anchor_offset': original_text.index('nice and sunny'),
+    }
+    context = analyzer.extract_comment_context(comment, original_text, revised_text)
+
+    print(f"\nRevised context: '{context['revised_context']}'")
+    assert 'excellent and sunny' in context['revised_context']
+
+    result = analyzer.validate_local_change_with_context(comment, {}, original_text, revised_text)
+    assert result['validation']['status'] == 'correctly_applied'
+    print("  ✅ PASSED (commented occurrence)")
+
+
+if __name__ == "__main__":
+    test_alignment_is_monotone_and_exact_on_shared_text()
+    test_increasing_chain()
+    test_revised_context_follows_the_commented_occurrence()